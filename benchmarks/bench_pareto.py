@@ -0,0 +1,124 @@
+"""
+Benchmark ParetoHelper updates and parent selection at large scale.
+
+Compares the array-backed ParetoHelper with the original set-based
+implementation (kept below as LegacyParetoHelper) on the same synthetic
+score matrix.
+
+Usage:
+    uv run python -m benchmarks.bench_pareto --sentences 10000 --candidates 1000
+"""
+import argparse
+import random
+import time
+import numpy as np
+from src.pareto_helper import ParetoHelper
+
+
+class LegacyParetoHelper:
+    """The original list-of-sets ParetoHelper, kept as a reference point."""
+
+    def __init__(self, base_prompt, sentences, base_subscores, rng):
+        self.prompt_candidates = [base_prompt]
+        self.per_prompt_scores = [sum(base_subscores) / len(base_subscores)]
+        self.prompt_at_pareto_front_sentences = [{0} for _ in range(len(sentences))]
+        self.pareto_front_sentences = list(base_subscores)
+        self.rng = rng
+
+    def update_with_new_prompt(self, new_prompt, subscores):
+        new_prompt_idx = len(self.prompt_candidates)
+        self.prompt_candidates.append(new_prompt)
+        self.per_prompt_scores.append(sum(subscores) / len(subscores))
+        for sentence_idx, (old_score, new_score) in enumerate(zip(self.pareto_front_sentences, subscores)):
+            if new_score > old_score:
+                self.pareto_front_sentences[sentence_idx] = new_score
+                self.prompt_at_pareto_front_sentences[sentence_idx] = {new_prompt_idx}
+            elif new_score == old_score:
+                self.prompt_at_pareto_front_sentences[sentence_idx].add(new_prompt_idx)
+
+    def select_pareto_candidate(self):
+        prompt_frequency = {}
+        for sentence_pareto_front in self.prompt_at_pareto_front_sentences:
+            for prompt_idx in sentence_pareto_front:
+                if prompt_idx not in prompt_frequency:
+                    prompt_frequency[prompt_idx] = 0
+                prompt_frequency[prompt_idx] += 1
+        sampling_list = [prompt_idx for prompt_idx, freq in prompt_frequency.items() for _ in range(freq)]
+        parent_idx = self.rng.choice(sampling_list)
+        return parent_idx, self.prompt_candidates[parent_idx]
+
+
+def make_scores(num_candidates: int, num_sentences: int, seed: int) -> list[list[float]]:
+    """
+    Judge-like scores (multiples of 0.1) for candidates that slowly improve,
+    so fronts contain many ties as they do in real runs.
+    """
+    generator = np.random.default_rng(seed)
+    scores = []
+    for candidate in range(num_candidates):
+        quality = 0.3 + 0.6 * candidate / max(1, num_candidates - 1)
+        perfect = generator.random(num_sentences) < quality
+        partial = np.round(generator.random(num_sentences) * 10) / 10
+        scores.append(np.where(perfect, 1.0, partial).tolist())
+    return scores
+
+
+def run(helper_factory, scores, num_selects):
+    """Time building the fronts from scores and selecting parents."""
+    start = time.perf_counter()
+    helper = helper_factory(scores[0])
+    for idx, row in enumerate(scores[1:], start=1):
+        helper.update_with_new_prompt(f"prompt {idx}", row)
+    update_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(num_selects):
+        helper.select_pareto_candidate()
+    select_seconds = time.perf_counter() - start
+
+    return update_seconds, select_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ParetoHelper")
+    parser.add_argument("--sentences", type=int, default=10_000)
+    parser.add_argument("--candidates", type=int, default=1_000)
+    parser.add_argument("--selects", type=int, default=20, help="Selections timed after all updates")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only benchmark the current implementation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating scores: {args.candidates} candidates x {args.sentences} sentences...")
+    scores = make_scores(args.candidates, args.sentences, args.seed)
+    sentences = range(args.sentences)
+
+    implementations = [("array", lambda base: ParetoHelper("base", sentences, base, rng=random.Random(args.seed)))]
+    if not args.skip_legacy:
+        implementations.append(
+            ("legacy", lambda base: LegacyParetoHelper("base", sentences, base, rng=random.Random(args.seed)))
+        )
+
+    print(f"{'implementation':<16}{'updates (s)':>14}{'per update (ms)':>18}{'per select (ms)':>18}")
+    for name, factory in implementations:
+        # Selections are interleaved with updates in real runs, so time the first
+        # selection after an update (no cache) as well as repeated ones
+        update_seconds, select_seconds = run(factory, scores, args.selects)
+        per_update = 1000 * update_seconds / max(1, args.candidates - 1)
+        per_select = 1000 * select_seconds / max(1, args.selects)
+        print(f"{name:<16}{update_seconds:>14.2f}{per_update:>18.3f}{per_select:>18.3f}")
+
+        # Worst case for the array version: every selection follows an update
+        if name == "array":
+            helper = factory(scores[0])
+            for idx, row in enumerate(scores[1:], start=1):
+                helper.update_with_new_prompt(f"prompt {idx}", row)
+            start = time.perf_counter()
+            for _ in range(args.selects):
+                helper._sampling_cache = None
+                helper.select_pareto_candidate()
+            uncached = 1000 * (time.perf_counter() - start) / max(1, args.selects)
+            print(f"{'array (uncached)':<16}{'':>14}{'':>18}{uncached:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
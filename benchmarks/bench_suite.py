@@ -0,0 +1,223 @@
+"""
+Offline benchmark suite running on the simulated LLM backend.
+
+Needs no network access or API key, so the numbers are a reproducible
+baseline for performance changes. Three benchmarks are run:
+
+- optimizer: end-to-end GepaOptimizer.optimize() throughput (rollouts/s, LLM calls/s)
+- pareto: ParetoHelper update and parent selection cost as the candidate pool grows
+- evaluator: Evaluator throughput across dataset sizes and concurrency levels
+
+Usage:
+    uv run python -m benchmarks.bench_suite
+    uv run python -m benchmarks.bench_suite --only evaluator --latency 0.05 --json baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+from benchmarks.bench_pareto import make_scores
+from src.evaluator import Evaluator
+from src.gepa_optimizer import GepaOptimizer
+from src.merger import Merger
+from src.model import Model
+from src.mutator import Mutator
+from src.pareto_helper import ParetoHelper
+from src.prompts import original_prompt
+from src.simulated_llm import SimulatedLLMClient
+
+FIRST_NAMES = ["John", "Sarah", "Robert", "Emily", "David", "Maria", "James", "Linda", "Kevin", "Nancy"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Garcia", "Martinez", "Lee", "Walker", "Hall", "Young"]
+TEMPLATES = [
+    "My name is {name} and my email is {email}",
+    "Please contact {name} at {phone} for more information",
+    "{name} was born on {date} and lives at {address}",
+    "You can reach me at {email} or call {phone}",
+    "{name}, DOB {date}, needs to update the account",
+    "Send the invoice for order {order} to {address}",
+]
+
+
+def make_sentences(count: int, seed: int = 0) -> list[str]:
+    """Generate distinct PII-bearing sentences shaped like the project's dataset."""
+    rng = random.Random(seed)
+    sentences = []
+    for idx in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        sentences.append(rng.choice(TEMPLATES).format(
+            name=f"{first} {last}",
+            email=f"{first.lower()}.{last.lower()}{idx}@example.com",
+            phone=f"555-{rng.randrange(100, 1000)}-{rng.randrange(1000, 10000)}",
+            date=f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1950, 2005)}",
+            address=f"{rng.randint(1, 9999)} {rng.choice(['Main', 'Oak', 'Pine'])} Street",
+            order=idx,
+        ))
+    return sentences
+
+
+def make_client(args, seed: int = 0) -> SimulatedLLMClient:
+    return SimulatedLLMClient(
+        seed=seed,
+        latency=args.latency,
+        latency_distribution=args.latency_distribution,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+    )
+
+
+def total_calls(client: SimulatedLLMClient) -> int:
+    return sum(client.stats()["calls"].values())
+
+
+def bench_optimizer(args) -> list[dict]:
+    """Time complete optimization runs at each level of rollout parallelism."""
+    train_sentences = make_sentences(args.train_size, seed=args.seed)
+    val_sentences = make_sentences(args.val_size, seed=args.seed + 1)
+
+    results = []
+    for parallel_rollouts in args.parallel_rollouts:
+        client = make_client(args, seed=args.seed)
+        model = Model(client)
+        evaluator = Evaluator(
+            model,
+            client,
+            max_concurrency=args.concurrency[-1],
+            judge_batch_size=args.batch_size,
+            model_batch_size=args.batch_size,
+        )
+        optimizer = GepaOptimizer(
+            max_merges=args.rollouts // 4,
+            minibatch_size=5,
+            parallel_rollouts=parallel_rollouts,
+            seed=args.seed,
+        )
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            best_prompt = optimizer.optimize(
+                base_prompt=original_prompt,
+                train_sentences=train_sentences,
+                val_sentences=val_sentences,
+                evaluator=evaluator,
+                mutator=Mutator(client),
+                merger=Merger(client),
+                rollouts_budget=args.rollouts,
+            )
+        seconds = time.perf_counter() - start
+
+        calls = total_calls(client)
+        with contextlib.redirect_stdout(io.StringIO()):
+            best_score = sum(evaluator.evaluate_per_sentence(best_prompt, val_sentences, desc="validation"))
+        results.append({
+            "parallel_rollouts": parallel_rollouts,
+            "seconds": seconds,
+            "rollouts_per_second": args.rollouts / seconds,
+            "calls": calls,
+            "calls_per_second": calls / seconds,
+            "best_score": best_score / len(val_sentences),
+        })
+    return results
+
+
+def bench_pareto(args) -> list[dict]:
+    """Time ParetoHelper updates and selections for growing candidate pools."""
+    results = []
+    for num_candidates in args.pareto_candidates:
+        scores = make_scores(num_candidates, args.pareto_sentences, args.seed)
+        helper = ParetoHelper("base", range(args.pareto_sentences), scores[0], rng=random.Random(args.seed))
+
+        start = time.perf_counter()
+        for idx, row in enumerate(scores[1:], start=1):
+            helper.update_with_new_prompt(f"prompt {idx}", row)
+            helper.select_pareto_candidate()
+        seconds = time.perf_counter() - start
+
+        results.append({
+            "candidates": num_candidates,
+            "sentences": args.pareto_sentences,
+            "seconds": seconds,
+            "ms_per_rollout": 1000 * seconds / max(1, num_candidates - 1),
+        })
+    return results
+
+
+def bench_evaluator(args) -> list[dict]:
+    """Time a full evaluation for each dataset size and concurrency level."""
+    results = []
+    for size in args.sizes:
+        sentences = make_sentences(size, seed=args.seed)
+        for concurrency in args.concurrency:
+            client = make_client(args, seed=args.seed)
+            evaluator = Evaluator(
+                Model(client),
+                client,
+                max_concurrency=concurrency,
+                judge_batch_size=args.batch_size,
+                model_batch_size=args.batch_size,
+            )
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                evaluator.evaluate_per_sentence(original_prompt, sentences, desc="benchmark")
+            seconds = time.perf_counter() - start
+
+            results.append({
+                "sentences": size,
+                "concurrency": concurrency,
+                "seconds": seconds,
+                "sentences_per_second": size / seconds,
+                "calls": total_calls(client),
+            })
+    return results
+
+
+def print_table(title: str, rows: list[dict]):
+    print(f"\n{title}")
+    if not rows:
+        return
+    columns = list(rows[0])
+    print("".join(f"{column:>22}" for column in columns))
+    for row in rows:
+        print("".join(f"{value:>22.3f}" if isinstance(value, float) else f"{value:>22}" for value in row.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline GEPA benchmarks on a simulated LLM backend")
+    parser.add_argument("--only", choices=["optimizer", "pareto", "evaluator"], action="append",
+                        help="Run only these benchmarks (repeatable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean simulated LLM latency in seconds")
+    parser.add_argument("--latency-distribution", default="lognormal",
+                        choices=["constant", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of calls failing with 429/503")
+    parser.add_argument("--malformed-rate", type=float, default=0.02, help="Fraction of malformed JSON responses")
+    parser.add_argument("--batch-size", type=int, default=5, help="Model and judge batch size")
+    parser.add_argument("--rollouts", type=int, default=12, help="Optimizer rollouts budget")
+    parser.add_argument("--parallel-rollouts", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--train-size", type=int, default=100)
+    parser.add_argument("--val-size", type=int, default=30)
+    parser.add_argument("--pareto-candidates", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--pareto-sentences", type=int, default=2_000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200], help="Evaluator dataset sizes")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Evaluator concurrency levels")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    benchmarks = {"optimizer": bench_optimizer, "pareto": bench_pareto, "evaluator": bench_evaluator}
+    results = {"config": {key: value for key, value in vars(args).items() if key not in ("only", "json")}}
+    for name, bench in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = bench(args)
+        print_table(name, results[name])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for exercising the
+transport layer without network access or an API key.
+
+It injects 429 responses (at random, and whenever more than --capacity
+requests are in flight) and adds latency to every response.
+
+Usage:
+    uv run python -m benchmarks.fake_openai_server --port 8089 --rate-limit-prob 0.1 --capacity 8
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8089/v1 uv run python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.05, jitter=0.02, rate_limit_prob=0.0, capacity=None,
+                 retry_after=None, respond=None):
+        """
+        Args:
+            address: (host, port) to listen on; port 0 picks a free port
+            latency: Mean response latency in seconds
+            jitter: Uniform latency jitter in seconds
+            rate_limit_prob: Probability of answering a request with a 429
+            capacity: Maximum concurrent requests before answering with 429s
+            retry_after: Retry-After header value sent with 429s, if any
+            respond: Optional callable mapping the request messages to the reply text
+        """
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_prob = rate_limit_prob
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.respond = respond or (lambda messages: json.dumps({"text": "[REDACTED]"}))
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.seen_systems = set()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        with server.lock:
+            overloaded = server.capacity is not None and server.in_flight >= server.capacity
+            if overloaded or random.random() < server.rate_limit_prob:
+                server.rejected += 1
+                reject = True
+            else:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                reject = False
+
+        if reject:
+            headers = {"Retry-After": str(server.retry_after)} if server.retry_after is not None else None
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}}, headers)
+            return
+
+        try:
+            time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+            content = server.respond(request.get("messages", []))
+            messages = request.get("messages", [])
+            prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+            completion_tokens = len(content) // 4
+
+            # Report a repeated system message as a prompt prefix cache hit
+            system = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+            with server.lock:
+                cached_tokens = len(system) // 4 if system in server.seen_systems else 0
+                if system:
+                    server.seen_systems.add(system)
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                },
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+                server.completed += 1
+
+
+def start_server(**kwargs) -> FakeOpenAIServer:
+    """Start a fake server on a background thread and return it."""
+    kwargs.setdefault("address", ("127.0.0.1", 0))
+    server = FakeOpenAIServer(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0)
+    parser.add_argument("--capacity", type=int, help="Concurrent requests served before answering 429")
+    parser.add_argument("--retry-after", type=float)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit_prob=args.rate_limit_prob,
+        capacity=args.capacity,
+        retry_after=args.retry_after,
+    )
+    print(f"Serving fake OpenAI API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,302 @@
+import argparse
+import functools
 import json
+import os
 from src.llm_client import LLMClient
+from src.llm_cache import CachedLLMClient
+from src.simulated_llm import SimulatedLLMClient
+from src.transcript import RecordingLLMClient, ReplayLLMClient
+from src.transport import Transport
+from src.instrumentation import Instrumentation, get_instrumentation, set_instrumentation
+from src.dataset import load_dataset
+from src.distributed import DistributedBackend, make_evaluator
 from src.model import Model
 from src.evaluator import Evaluator
+from src.score_store import ScoreStore
+from src.prejudge import PreJudge
+from src.trace_store import TraceStore
 from src.mutator import Mutator
 from src.merger import Merger
-from src.gepa_optimizer import GepaOptimizer
+from src.gepa_optimizer import COST_OBJECTIVES, GepaOptimizer
+from src.budget import Budget
+from src.compressor import PromptCompressor
 from src.prompts import original_prompt
 
 
-def load_sentences(file_path: str) -> list[str]:
-    """Load sentences from JSON file."""
-    with open(file_path, 'r') as f:
-        sentences = json.load(f)
-    return sentences
+def parse_args():
+    parser = argparse.ArgumentParser(description="Optimize a PII stripping prompt with GEPA")
+    parser.add_argument(
+        "--train",
+        default="data/PII_train.json",
+        help="Training sentences: a JSON list, or JSONL files read lazily (path or glob of shards)",
+    )
+    parser.add_argument(
+        "--val",
+        default="data/PII_dev.json",
+        help="Validation sentences: a JSON list, or JSONL files read lazily (path or glob of shards)",
+    )
+    parser.add_argument(
+        "--index-dir",
+        metavar="DIR",
+        help="Store the line-offset indexes of JSONL datasets here instead of next to the data",
+    )
+    parser.add_argument("--cache", metavar="PATH", help="Cache LLM responses in this SQLite file")
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help="Sample at temperature 0 and reuse cached responses from previous runs",
+    )
+    parser.add_argument(
+        "--rollouts",
+        type=int,
+        help="Number of rollouts (default: 5, or until the budget is spent when one is given)",
+    )
+    parser.add_argument("--max-calls", type=int, help="Stop before exceeding this many LLM calls")
+    parser.add_argument("--max-tokens", type=int, help="Stop before exceeding this many LLM tokens")
+    parser.add_argument("--max-cost", type=float, help="Stop before exceeding this spend in dollars")
+    parser.add_argument("--max-seconds", type=float, help="Stop before exceeding this wall-clock duration")
+    parser.add_argument(
+        "--parallel-rollouts",
+        type=int,
+        default=1,
+        help="Number of rollouts run at the same time (default: 1)",
+    )
+    parser.add_argument(
+        "--model-batch-size",
+        type=int,
+        default=1,
+        help="Number of sentences sanitized per model call (default: 1)",
+    )
+    parser.add_argument(
+        "--judge-batch-size",
+        type=int,
+        default=1,
+        help="Number of (original, sanitized) pairs scored per judge call (default: 1)",
+    )
+    parser.add_argument(
+        "--validation-chunk-size",
+        type=int,
+        help="Validate mutated prompts in chunks and stop once they are out of the running",
+    )
+    parser.add_argument(
+        "--racing-confidence",
+        type=float,
+        help="Use a statistical stopping rule at this confidence level (e.g. 0.95)",
+    )
+    parser.add_argument(
+        "--mutation-fanout",
+        type=int,
+        default=1,
+        help="Children proposed per mutation and raced on the minibatch (default: 1)",
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        help="Reject mutated or merged prompts this similar to an evaluated one (e.g. 0.9)",
+    )
+    parser.add_argument(
+        "--objectives",
+        nargs="+",
+        choices=COST_OBJECTIVES,
+        default=[],
+        help="Candidate costs kept on the Pareto front besides the score",
+    )
+    parser.add_argument("--max-prompt-tokens", type=int, help="Only pick prompts of at most this many tokens")
+    parser.add_argument(
+        "--prompt-token-weight",
+        type=float,
+        help="Score penalty per prompt token when picking the best prompt (e.g. 0.0005)",
+    )
+    parser.add_argument(
+        "--output-token-weight",
+        type=float,
+        help="Score penalty per output token per sentence when picking the best prompt",
+    )
+    parser.add_argument(
+        "--latency-weight",
+        type=float,
+        help="Score penalty per second of sanitize latency when picking the best prompt (varies between runs)",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Shorten the best prompt afterwards, writing best_prompt_compressed.txt and a report",
+    )
+    parser.add_argument(
+        "--compress-tolerance",
+        type=float,
+        default=0.0,
+        help="Largest validation score drop accepted by --compress (default: 0.0)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default="gepa_checkpoint.json",
+        help="Checkpoint file written after every rollout (default: gepa_checkpoint.json)",
+    )
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint file if it exists")
+    parser.add_argument("--requests-per-minute", type=float, help="Request quota of the API key")
+    parser.add_argument("--tokens-per-minute", type=float, help="Token quota of the API key")
+    parser.add_argument(
+        "--metrics-dir",
+        help="Record per-stage timing, token and cache metrics and write metrics.json/metrics.prom here",
+    )
+    parser.add_argument(
+        "--prejudge",
+        action="store_true",
+        help="Settle certain failures with local regex checks before the LLM judge",
+    )
+    parser.add_argument(
+        "--prejudge-audit-rate",
+        type=float,
+        default=0.05,
+        help="Fraction of locally settled pairs also sent to the LLM judge (default: 0.05)",
+    )
+    parser.add_argument(
+        "--trace-dir",
+        help="Append every evaluation trace to a store in this directory and show the parent's "
+             "worst past traces to the mutator",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="Use the offline simulated LLM backend instead of the OpenAI API (no API key needed)",
+    )
+    parser.add_argument("--record", metavar="PATH", help="Record every LLM request and response to this transcript")
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="Serve LLM responses from a recorded transcript instead of calling the API",
+    )
+    parser.add_argument(
+        "--replay-mode",
+        choices=["key", "order"],
+        default="key",
+        help="Match replayed responses by request (default) or serve them in recording order",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Evaluate in this many worker processes instead of in the main process",
+    )
+    parser.add_argument(
+        "--broker-address",
+        metavar="HOST:PORT",
+        help="Serve evaluation jobs on this address so workers on other machines can join "
+             "(python -m src.distributed --address HOST:PORT)",
+    )
+    parser.add_argument("--authkey", default="gepa", help="Authentication key shared with remote workers")
+    args = parser.parse_args()
+    if (args.record or args.replay) and (args.workers or args.broker_address):
+        parser.error("--record and --replay cover the main process only and cannot be used with evaluation workers")
+    return args
 
 
 def main():
+    args = parse_args()
+
+    if args.metrics_dir:
+        set_instrumentation(Instrumentation())
+
     # Load datasets
     print("Loading datasets...")
-    train_sentences = load_sentences('data/PII_train.json')
-    val_sentences = load_sentences('data/PII_dev.json')[:10]  # Use only first 10 for testing
+    train_sentences = load_dataset(args.train, index_dir=args.index_dir)
+    val_sentences = load_dataset(args.val, index_dir=args.index_dir)[:10]  # Use only first 10 for testing
 
     print(f"Train set: {len(train_sentences)} sentences")
     print(f"Validation set: {len(val_sentences)} sentences")
 
     # Initialize LLM client (using gpt-4o-mini for all components)
     print("\nInitializing LLM client...")
-    llm_client = LLMClient(model="gpt-4o-mini")
+    transport = Transport(requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute)
+    if args.replay:
+        api_client = ReplayLLMClient(args.replay, mode=args.replay_mode)
+    elif args.simulate:
+        api_client = SimulatedLLMClient(transport=transport)
+    else:
+        api_client = LLMClient(
+            model="gpt-4o-mini",
+            temperature=0.0 if args.deterministic else 0.7,
+            transport=transport,
+        )
+    llm_client = api_client
+    if args.cache:
+        llm_client = CachedLLMClient(api_client, path=args.cache, deterministic=args.deterministic)
+    if args.record:
+        # Outermost, so the transcript holds every request of the run, cached or not
+        llm_client = RecordingLLMClient(llm_client, args.record)
 
     # Initialize components
     print("Initializing components...")
     model = Model(llm_client)
-    evaluator = Evaluator(model, llm_client)
-    mutator = Mutator(llm_client)
+    backend = None
+    if args.workers or args.broker_address:
+        host, port = (args.broker_address or "127.0.0.1:0").rsplit(":", 1)
+        backend = DistributedBackend(
+            functools.partial(
+                make_evaluator,
+                simulate=args.simulate,
+                temperature=0.0 if args.deterministic else 0.7,
+                judge_batch_size=args.judge_batch_size,
+                model_batch_size=args.model_batch_size,
+                prejudge_audit_rate=args.prejudge_audit_rate if args.prejudge else None,
+            ),
+            processes=args.workers,
+            address=(host, int(port)),
+            authkey=args.authkey.encode("utf-8"),
+        )
+        print(f"Evaluation broker listening on {backend.address[0]}:{backend.address[1]}")
+    trace_store = TraceStore(args.trace_dir) if args.trace_dir else None
+    prejudge = PreJudge(audit_rate=args.prejudge_audit_rate) if args.prejudge else None
+    evaluator = Evaluator(
+        model,
+        llm_client,
+        max_concurrency=8,
+        score_store=ScoreStore(),
+        judge_batch_size=args.judge_batch_size,
+        model_batch_size=args.model_batch_size,
+        backend=backend,
+        trace_store=trace_store,
+        prejudge=prejudge,
+        track_output_tokens="output_tokens" in args.objectives or args.output_token_weight is not None,
+    )
+    mutator = Mutator(llm_client, trace_store=trace_store, history_examples=3 if trace_store else 0)
     merger = Merger(llm_client)
 
     # Initialize optimizer
-    optimizer = GepaOptimizer(max_merges=3, minibatch_size=5)
+    optimizer = GepaOptimizer(
+        max_merges=3,
+        minibatch_size=5,
+        parallel_rollouts=args.parallel_rollouts,
+        validation_chunk_size=args.validation_chunk_size,
+        racing_confidence=args.racing_confidence,
+        checkpoint_path=args.checkpoint,
+        dedup_threshold=args.dedup_threshold,
+        mutation_fanout=args.mutation_fanout,
+        objectives=args.objectives,
+        objective_limits={"prompt_tokens": args.max_prompt_tokens} if args.max_prompt_tokens else None,
+        objective_weights={
+            name: weight
+            for name, weight in (
+                ("prompt_tokens", args.prompt_token_weight),
+                ("output_tokens", args.output_token_weight),
+                ("latency", args.latency_weight),
+            )
+            if weight is not None
+        },
+    )
+
+    budget = None
+    rollouts = args.rollouts
+    if any(limit is not None for limit in (args.max_calls, args.max_tokens, args.max_cost, args.max_seconds)):
+        budget = Budget(
+            max_calls=args.max_calls,
+            max_tokens=args.max_tokens,
+            max_cost=args.max_cost,
+            max_seconds=args.max_seconds,
+        )
+    elif rollouts is None:
+        rollouts = 5
 
     # Run optimization
     print(f"\nStarting optimization with base prompt...")
@@ -49,7 +309,9 @@ def main():
         evaluator=evaluator,
         mutator=mutator,
         merger=merger,
-        rollouts_budget=5,
+        rollouts_budget=rollouts,
+        resume=args.resume,
+        budget=budget,
     )
 
     print("\n" + "="*80)
@@ -64,6 +326,40 @@ def main():
         f.write(best_prompt)
     print("\nBest prompt saved to best_prompt.txt")
 
+    if args.compress:
+        compressor = PromptCompressor(
+            llm_client,
+            tolerance=args.compress_tolerance,
+            chunk_size=args.validation_chunk_size,
+        )
+        compressed_prompt, report = compressor.compress(best_prompt, val_sentences, evaluator)
+        with open('best_prompt_compressed.txt', 'w') as f:
+            f.write(compressed_prompt)
+        with open('best_prompt_compression.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        print("Compressed prompt saved to best_prompt_compressed.txt, report to best_prompt_compression.json")
+
+    print(f"Transport stats: {transport.stats()}")
+    if backend is not None:
+        print(f"Evaluation workers: {backend.stats()}")
+        backend.close()
+    print(f"LLM usage (prompt prefix cache): {api_client.stats()}")
+    if args.metrics_dir:
+        os.makedirs(args.metrics_dir, exist_ok=True)
+        get_instrumentation().export_json(os.path.join(args.metrics_dir, "metrics.json"))
+        get_instrumentation().export_prometheus(os.path.join(args.metrics_dir, "metrics.prom"))
+        print(f"Metrics written to {args.metrics_dir}")
+    if args.cache:
+        print(f"LLM cache stats: {llm_client.stats()}")
+    if args.record:
+        llm_client.close()
+        print(f"Transcript written to {args.record}")
+    if prejudge is not None:
+        print(f"Pre-judge: {prejudge.stats()}")
+    if trace_store is not None:
+        print(f"Trace store: {trace_store.stats()}")
+        trace_store.close()
+
 
 if __name__ == "__main__":
     main()
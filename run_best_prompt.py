@@ -1,43 +1,128 @@
-import json
+import argparse
+import sys
+from src.batch_sanitizer import BatchSanitizer, read_records
 from src.llm_client import LLMClient
+from src.llm_cache import CachedLLMClient
+from src.dataset import load_dataset
 from src.model import Model
+from src.simulated_llm import SimulatedLLMClient
+from src.transport import Transport
 
 
-def load_sentences(file_path: str) -> list[str]:
-    """Load sentences from JSON file."""
-    with open(file_path, 'r') as f:
-        sentences = json.load(f)
-    return sentences
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the optimized PII stripping prompt")
+    parser.add_argument("--cache", metavar="PATH", help="Cache LLM responses in this SQLite file")
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help="Sample at temperature 0 and reuse cached responses from previous runs",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Number of sentences sanitized per LLM call (default: 1)",
+    )
+    parser.add_argument("--prompt", default="best_prompt.txt", help="Prompt file (default: best_prompt.txt)")
+    parser.add_argument(
+        "--input",
+        metavar="PATH",
+        help="Sanitize every record of this JSONL or CSV file ('-' for stdin) instead of the demo sentences",
+    )
+    parser.add_argument("--output", default="-", metavar="PATH", help="JSONL output file (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from the file extension)")
+    parser.add_argument("--field", default="text", help="Input field holding the text (default: text)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Batches sanitized at the same time (default: 8)")
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        help="Batches submitted ahead of the oldest unwritten one (default: 4 * concurrency)",
+    )
+    parser.add_argument("--progress", metavar="PATH", help="Progress file (default: OUTPUT.progress.json)")
+    parser.add_argument("--resume", action="store_true", help="Skip the records already written to --output")
+    parser.add_argument("--requests-per-minute", type=float, help="Request quota of the API key")
+    parser.add_argument("--tokens-per-minute", type=float, help="Token quota of the API key")
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="Use the offline simulated LLM backend instead of the OpenAI API (no API key needed)",
+    )
+    return parser.parse_args()
+
+
+def sanitize_file(args, model, prompt: str):
+    """Stream --input through the prompt and write the sanitized records to --output."""
+    progress_path = args.progress
+    if progress_path is None and args.output != "-":
+        progress_path = f"{args.output}.progress.json"
+
+    sanitizer = BatchSanitizer(
+        model,
+        prompt,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        max_in_flight=args.max_in_flight,
+    )
+    stats = sanitizer.run(
+        read_records(args.input, input_format=args.format, text_field=args.field),
+        args.output,
+        progress_path=progress_path,
+        resume=args.resume,
+        input_path=None if args.input == "-" else args.input,
+    )
+    print(
+        f"Sanitized {stats['records_written']} records in {stats['seconds']:.1f}s "
+        f"({stats['records_per_second']:.1f} records/s, {stats['records_skipped']} skipped on resume)",
+        file=sys.stderr,
+    )
 
 
 def main():
-    # Load best prompt
-    print("Loading best prompt...")
-    with open('best_prompt.txt', 'r') as f:
+    args = parse_args()
+
+    with open(args.prompt, 'r') as f:
         best_prompt = f.read()
 
+    transport = Transport(requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute)
+    if args.simulate:
+        llm_client = SimulatedLLMClient(transport=transport)
+    else:
+        llm_client = LLMClient(
+            model="gpt-4o-mini",
+            temperature=0.0 if args.deterministic else 0.7,
+            transport=transport,
+        )
+    if args.cache:
+        llm_client = CachedLLMClient(llm_client, path=args.cache, deterministic=args.deterministic)
+    model = Model(llm_client)
+
+    if args.input:
+        sanitize_file(args, model, best_prompt)
+        return
+
     print(f"\nBest prompt:\n{best_prompt}\n")
     print("=" * 80)
 
-    # Initialize LLM client and model
-    print("\nInitializing LLM client...")
-    llm_client = LLMClient(model="gpt-4o-mini")
-    model = Model(llm_client)
-
     # Load validation sentences (use first 10 for demo)
     print("Loading validation sentences...")
-    val_sentences = load_sentences('data/PII_dev.json')[:10]
+    val_sentences = load_dataset('data/PII_dev.json')[:10]
     print(f"Running on {len(val_sentences)} validation sentences\n")
     print("=" * 80)
 
-    # Run best prompt on each sentence
-    for i, sentence in enumerate(val_sentences):
-        print(f"\nSentence {i + 1}:")
-        print(f"  Original: {sentence}")
+    # Run best prompt on the sentences, several per LLM call
+    for start in range(0, len(val_sentences), args.batch_size):
+        batch = val_sentences[start:start + args.batch_size]
 
         # Run PII stripper
-        sanitized = model.run(best_prompt, sentence)
-        print(f"  Sanitized: {sanitized}")
+        sanitized_batch = model.run_batch(best_prompt, batch)
+
+        for i, (sentence, sanitized) in enumerate(zip(batch, sanitized_batch), start=start):
+            print(f"\nSentence {i + 1}:")
+            print(f"  Original: {sentence}")
+            print(f"  Sanitized: {sanitized}")
+
+    if args.cache:
+        print(f"\nLLM cache stats: {llm_client.stats()}")
 
 
 if __name__ == "__main__":
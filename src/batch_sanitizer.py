@@ -0,0 +1,235 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+from tqdm import tqdm
+from src.checkpoint import load_checkpoint, save_checkpoint
+
+
+def read_records(path: str, input_format: str = None, text_field: str = "text") -> Iterator[tuple[dict, str]]:
+    """
+    Stream records from a JSONL or CSV file, or from stdin.
+
+    Args:
+        path: Input file path, or "-" for stdin
+        input_format: "jsonl" or "csv" (default: guessed from the file extension, jsonl for stdin)
+        text_field: Field holding the text to sanitize. JSONL lines may also be bare strings
+
+    Yields:
+        (record, text) pairs, in input order
+    """
+    if input_format is None:
+        input_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+    if input_format not in ("jsonl", "csv"):
+        raise ValueError(f"Unknown input format: {input_format}")
+
+    f = sys.stdin if path == "-" else open(path, "r", newline="" if input_format == "csv" else None)
+    try:
+        if input_format == "csv":
+            for row in csv.DictReader(f):
+                yield row, row[text_field]
+            return
+
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {text_field: record}
+            if not isinstance(record, dict) or not isinstance(record.get(text_field), str):
+                raise ValueError(f"Line {line_number} has no string field '{text_field}'")
+            yield record, record[text_field]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class BatchSanitizer:
+    """
+    Sanitizes a stream of records with a prompt, concurrently and in order.
+
+    Records are grouped into batches of batch_size sentences (one model.run_batch()
+    call each). At most max_in_flight batches are submitted ahead of the oldest
+    unfinished one, so memory use stays flat however large the input is. Results
+    are written as JSONL in input order as soon as they are ready. With a progress
+    file, the number of records written and the output size are saved regularly,
+    so an interrupted job resumes after the last saved record. The progress file
+    also identifies the input file (path, size and modification time), and a job
+    is only resumed from the same, unchanged input.
+    """
+
+    def __init__(
+        self,
+        model,
+        prompt: str,
+        batch_size: int = 5,
+        concurrency: int = 8,
+        max_in_flight: int = None,
+        output_field: str = "sanitized",
+        progress_every: int = 10,
+    ):
+        """
+        Args:
+            model: Model instance with a run_batch(prompt, sentences) method
+            prompt: The PII stripping prompt
+            batch_size: Sentences sanitized per LLM call (default: 5)
+            concurrency: Batches sanitized at the same time (default: 8)
+            max_in_flight: Batches submitted but not yet written (default: 4 * concurrency)
+            output_field: Field of the output records holding the sanitized text
+            progress_every: Save progress every this many written batches
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.model = model
+        self.prompt = prompt
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_in_flight = max(max_in_flight or 4 * concurrency, concurrency)
+        self.output_field = output_field
+        self.progress_every = progress_every
+
+    @staticmethod
+    def _input_identity(input_path: str):
+        """Path, size and modification time of an input file, or None without one."""
+        if input_path is None:
+            return None
+        stat = os.stat(input_path)
+        return {"path": os.path.abspath(input_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _progress_state(self, input_identity, records_done: int, output_offset: int) -> dict:
+        return {
+            "prompt_hash": hashlib.sha256(self.prompt.encode("utf-8")).hexdigest(),
+            "output_field": self.output_field,
+            "input": input_identity,
+            "records_done": records_done,
+            "output_offset": output_offset,
+        }
+
+    def _sanitize_batch(self, batch: list[tuple[dict, str]]) -> bytes:
+        """Sanitize one batch and return its serialized output lines."""
+        sanitized = self.model.run_batch(self.prompt, [text for _, text in batch])
+        lines = [
+            json.dumps({**record, self.output_field: text}, ensure_ascii=False) + "\n"
+            for (record, _), text in zip(batch, sanitized)
+        ]
+        return "".join(lines).encode("utf-8")
+
+    def run(
+        self,
+        records,
+        output_path: str,
+        progress_path: str = None,
+        resume: bool = False,
+        input_path: str = None,
+    ) -> dict:
+        """
+        Sanitize records and write them to a JSONL file (or stdout).
+
+        Args:
+            records: Iterable of (record, text) pairs, e.g. from read_records()
+            output_path: Output file path, or "-" for stdout
+            progress_path: Optional file recording how far the job got
+            resume: Skip the records already written according to progress_path
+            input_path: File the records are read from. Its identity is saved with
+                the progress, and resuming with another or a modified file is refused
+
+        Returns:
+            Dict with records written in this run, records skipped, elapsed seconds
+            and records per second
+        """
+        if resume and (progress_path is None or output_path == "-" or input_path is None):
+            raise ValueError("Resuming needs an input file, a progress file and an output file")
+
+        input_identity = self._input_identity(input_path)
+        records_done, output_offset = 0, 0
+        if resume:
+            progress = load_checkpoint(progress_path)
+            if progress is not None:
+                if progress.get("input") != input_identity:
+                    raise ValueError(
+                        f"Progress file was written for another input file, or {input_path} changed since"
+                    )
+                expected = self._progress_state(input_identity, progress["records_done"], progress["output_offset"])
+                if progress != expected:
+                    raise ValueError("Progress file was written with a different prompt or output field")
+                records_done, output_offset = progress["records_done"], progress["output_offset"]
+
+        if output_path == "-":
+            output = sys.stdout.buffer
+        elif records_done:
+            # Drop anything written after the last saved progress
+            output = open(output_path, "r+b")
+            output.truncate(output_offset)
+            output.seek(output_offset)
+        else:
+            output = open(output_path, "wb")
+
+        skipped = records_done
+        records = itertools.islice(iter(records), records_done, None)
+        batches = iter(lambda: list(itertools.islice(records, self.batch_size)), [])
+
+        written = 0
+        start = time.perf_counter()
+        progress_bar = tqdm(desc="Sanitizing", unit="records", initial=records_done, file=sys.stderr)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                in_flight = deque()
+                batches_written = 0
+                for batch in itertools.chain(batches, [None]):
+                    if batch is not None:
+                        in_flight.append((len(batch), executor.submit(self._sanitize_batch, batch)))
+
+                    # Write finished batches in order; block on the oldest when the window is full
+                    while in_flight and (
+                        batch is None or len(in_flight) >= self.max_in_flight or in_flight[0][1].done()
+                    ):
+                        count, future = in_flight.popleft()
+                        data = future.result()
+                        output.write(data)
+                        output_offset += len(data)
+                        records_done += count
+                        written += count
+                        batches_written += 1
+                        progress_bar.update(count)
+
+                        if progress_path and output_path != "-" and batches_written % self.progress_every == 0:
+                            self._save_progress(output, progress_path, input_identity, records_done, output_offset)
+        finally:
+            progress_bar.close()
+            if progress_path and output_path != "-":
+                self._save_progress(output, progress_path, input_identity, records_done, output_offset)
+            if output is not sys.stdout.buffer:
+                output.close()
+            else:
+                output.flush()
+
+        seconds = time.perf_counter() - start
+        return {
+            "records_written": written,
+            "records_skipped": skipped,
+            "seconds": seconds,
+            "records_per_second": written / seconds if seconds > 0 else 0.0,
+        }
+
+    def _save_progress(
+        self,
+        output: io.BufferedIOBase,
+        progress_path: str,
+        input_identity,
+        records_done: int,
+        output_offset: int,
+    ):
+        """Make the output durable, then record how much of it is complete."""
+        output.flush()
+        os.fsync(output.fileno())
+        save_checkpoint(progress_path, self._progress_state(input_identity, records_done, output_offset))
@@ -0,0 +1,209 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from src.instrumentation import get_instrumentation, tags
+
+LIMITS = ("calls", "tokens", "cost", "seconds")
+
+
+class Budget:
+    """
+    Spend limit of an optimization run in LLM calls, tokens, dollars and wall-clock seconds.
+
+    The budget listens to the process-wide instrumentation, so every LLM call is
+    accounted for as it completes (responses served from the cache are free).
+    Optimizer steps run inside phases; the spend of finished phases gives the
+    estimates used to refuse steps the remaining budget cannot cover. Steps that
+    run concurrently reserve their estimated spend so they cannot jointly
+    overrun the budget.
+
+    Calls made in other processes (e.g. DistributedBackend workers) are not seen.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = None,
+        max_tokens: int = None,
+        max_cost: float = None,
+        max_seconds: float = None,
+        prompt_price: float = 0.15,
+        cached_price: float = 0.075,
+        completion_price: float = 0.60,
+    ):
+        """
+        Args:
+            max_calls: Maximum number of LLM calls, None for unlimited
+            max_tokens: Maximum prompt + completion tokens, None for unlimited
+            max_cost: Maximum spend in dollars, None for unlimited
+            max_seconds: Maximum wall-clock duration in seconds, None for unlimited
+            prompt_price: Dollars per million uncached prompt tokens (default: gpt-4o-mini)
+            cached_price: Dollars per million cached prompt tokens
+            completion_price: Dollars per million completion tokens
+        """
+        self.limits = {"calls": max_calls, "tokens": max_tokens, "cost": max_cost, "seconds": max_seconds}
+        self.prompt_price = prompt_price
+        self.cached_price = cached_price
+        self.completion_price = completion_price
+
+        self._lock = threading.Lock()
+        self._spent = {"calls": 0, "tokens": 0, "cost": 0.0}
+        self._reserved = {"calls": 0, "tokens": 0, "cost": 0.0}
+        self._seconds_before = 0.0
+        self._started = None
+        self._phase_ids = itertools.count()
+        self._phases = {}
+        self._samples = {}
+
+    def start(self):
+        """Start accounting for LLM calls and wall-clock time."""
+        if self._started is None:
+            self._started = time.monotonic()
+            get_instrumentation().add_listener(self._on_call)
+
+    def stop(self):
+        """Stop accounting; a later start() continues from the current spend."""
+        if self._started is not None:
+            get_instrumentation().remove_listener(self._on_call)
+            self._seconds_before += time.monotonic() - self._started
+            self._started = None
+
+    def _call_cost(self, record: dict) -> float:
+        cached = record["cached_tokens"]
+        return (
+            (record["prompt_tokens"] - cached) * self.prompt_price
+            + cached * self.cached_price
+            + record["completion_tokens"] * self.completion_price
+        ) / 1_000_000
+
+    def _on_call(self, record: dict):
+        if record["cache_hit"]:
+            return
+
+        spend = {
+            "calls": 1,
+            "tokens": record["prompt_tokens"] + record["completion_tokens"],
+            "cost": self._call_cost(record),
+        }
+        with self._lock:
+            targets = [self._spent]
+            if record.get("budget_phase") in self._phases:
+                targets.append(self._phases[record["budget_phase"]])
+            for target in targets:
+                for key, value in spend.items():
+                    target[key] += value
+
+    def _seconds(self) -> float:
+        running = time.monotonic() - self._started if self._started is not None else 0.0
+        return self._seconds_before + running
+
+    def spent(self) -> dict:
+        """Calls, tokens, dollars and seconds spent so far."""
+        with self._lock:
+            return {**self._spent, "seconds": self._seconds()}
+
+    def exhausted(self) -> bool:
+        """Whether any limit has been reached."""
+        spent = self.spent()
+        return any(limit is not None and spent[key] >= limit for key, limit in self.limits.items())
+
+    def estimate(self, name: str):
+        """Mean spend of the finished phases with this name, or None if there are none."""
+        with self._lock:
+            samples = self._samples.get(name)
+            if not samples:
+                return None
+            return {key: sum(sample[key] for sample in samples) / len(samples) for key in LIMITS}
+
+    def _fits(self, estimate: dict) -> bool:
+        """Must hold the lock."""
+        seconds = self._seconds()
+        for key, limit in self.limits.items():
+            if limit is None:
+                continue
+            if key == "seconds":
+                # Concurrent phases share the clock, so time is not reserved
+                used = seconds
+            else:
+                used = self._spent[key] + self._reserved[key]
+            if used + estimate.get(key, 0) > limit:
+                return False
+        return True
+
+    def can_afford(self, name: str) -> bool:
+        """Whether the remaining budget covers the estimated spend of a phase."""
+        estimate = self.estimate(name) or {}
+        with self._lock:
+            return self._fits(estimate)
+
+    def reserve(self, name: str):
+        """
+        Reserve the estimated spend of a phase about to start.
+
+        Returns:
+            Reservation to pass to phase(), or None if the budget cannot cover it
+        """
+        estimate = self.estimate(name) or {}
+        with self._lock:
+            if not self._fits(estimate):
+                return None
+            reservation = {key: estimate.get(key, 0) for key in self._reserved}
+            for key, value in reservation.items():
+                self._reserved[key] += value
+            return reservation
+
+    def release(self, reservation: dict):
+        """Give back a reservation that will not be used by a phase."""
+        with self._lock:
+            for key, value in reservation.items():
+                self._reserved[key] -= value
+
+    @contextmanager
+    def phase(self, name: str, reservation: dict = None):
+        """
+        Account the calls made inside the block to a phase and learn its cost.
+
+        Args:
+            name: Phase name, e.g. "validation"
+            reservation: Reservation from reserve(), released when the block exits
+        """
+        phase_id = next(self._phase_ids)
+        with self._lock:
+            self._phases[phase_id] = {"calls": 0, "tokens": 0, "cost": 0.0}
+        start = time.monotonic()
+        try:
+            with tags(budget_phase=phase_id):
+                yield
+        finally:
+            with self._lock:
+                sample = {**self._phases.pop(phase_id), "seconds": time.monotonic() - start}
+                self._samples.setdefault(name, []).append(sample)
+            if reservation:
+                self.release(reservation)
+
+    def state_dict(self) -> dict:
+        """Spend and phase costs, for checkpoints."""
+        spent = self.spent()
+        estimates = {name: self.estimate(name) for name in list(self._samples)}
+        return {"spent": spent, "estimates": estimates}
+
+    def load_state_dict(self, state: dict):
+        """Continue from the spend recorded by state_dict()."""
+        with self._lock:
+            for key in self._spent:
+                self._spent[key] = state["spent"][key]
+            self._seconds_before = state["spent"]["seconds"]
+            if self._started is not None:
+                self._started = time.monotonic()
+            self._samples = {name: [estimate] for name, estimate in state["estimates"].items() if estimate}
+
+    def describe(self) -> str:
+        """Human-readable spend against the limits."""
+        spent = self.spent()
+        parts = []
+        for key, fmt in (("calls", "{:.0f}"), ("tokens", "{:.0f}"), ("cost", "${:.4f}"), ("seconds", "{:.0f}s")):
+            text = f"{key} {fmt.format(spent[key])}"
+            if self.limits[key] is not None:
+                text += f"/{fmt.format(self.limits[key])}"
+            parts.append(text)
+        return ", ".join(parts)
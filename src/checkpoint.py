@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path: str, state: dict):
+    """
+    Atomically write optimizer state to a JSON checkpoint file.
+
+    The state is written to a temporary file in the same directory, flushed to
+    disk and renamed over the previous checkpoint, so a crash never leaves a
+    truncated file behind.
+
+    Args:
+        path: Checkpoint file path
+        state: JSON-serializable optimizer state
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".checkpoint-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": CHECKPOINT_VERSION, "state": state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(path: str):
+    """
+    Load optimizer state written by save_checkpoint().
+
+    Args:
+        path: Checkpoint file path
+
+    Returns:
+        The saved state dict, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {checkpoint.get('version')}")
+
+    return checkpoint["state"]
@@ -0,0 +1,172 @@
+from collections.abc import Sequence
+from src.instrumentation import get_instrumentation, tags
+from src.merger import extract_prompt
+from src.prompts import COMPRESSION_PROMPT
+from src.transport import estimate_tokens
+
+
+class PromptCompressor:
+    """
+    Shortens an optimized prompt without losing validation score.
+
+    Each round proposes shorter variants of the current prompt: an LLM rewrite,
+    then ablations dropping one section (blank-line separated block) or one line,
+    largest savings first. Variants are validated in order and the first one
+    whose score stays within the tolerance of the original prompt's score is
+    kept. Rounds continue from the kept variant until none passes, so the result
+    is the shortest prompt found within the tolerance. Variants are always
+    compared with the original's per-sentence scores, so drops do not add up
+    over rounds.
+    """
+
+    def __init__(
+        self,
+        llm_client,
+        tolerance: float = 0.0,
+        max_rounds: int = 10,
+        max_ablations: int = 8,
+        chunk_size: int = None,
+    ):
+        """
+        Args:
+            llm_client: LLM client with a generate(prompt: str) -> str method
+            tolerance: Largest accepted drop of the mean validation score
+                (default: 0.0, a variant must score at least as well)
+            max_rounds: Maximum number of accepted variants
+            max_ablations: Ablations validated per round, besides the LLM rewrite
+            chunk_size: Validate variants in chunks of this many sentences and stop
+                once a variant cannot reach the required score even with perfect
+                scores on the rest. None validates on the whole set at once (default)
+        """
+        if tolerance < 0.0:
+            raise ValueError("tolerance must not be negative")
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        self.llm_client = llm_client
+        self.tolerance = tolerance
+        self.max_rounds = max_rounds
+        self.max_ablations = max_ablations
+        self.chunk_size = chunk_size
+
+    def _rewrite(self, prompt: str) -> str:
+        """Ask the LLM for a shorter version of the prompt."""
+        with tags(stage="compress"):
+            response = self.llm_client.generate(COMPRESSION_PROMPT.format(prompt=prompt))
+        return extract_prompt(response)
+
+    @staticmethod
+    def _ablations(prompt: str) -> list[str]:
+        """Variants of the prompt without one section or one line, shortest first."""
+        variants = []
+        blocks = prompt.split("\n\n")
+        if len(blocks) > 1:
+            variants.extend("\n\n".join(blocks[:i] + blocks[i + 1:]) for i in range(len(blocks)))
+        lines = prompt.split("\n")
+        if len(lines) > 1:
+            variants.extend("\n".join(lines[:i] + lines[i + 1:]) for i, line in enumerate(lines) if line.strip())
+
+        variants = [variant.strip() for variant in variants]
+        unique = {variant: None for variant in variants if variant and variant != prompt.strip()}
+        return sorted(unique, key=estimate_tokens)
+
+    def _validate(self, evaluator, prompt: str, sentences: Sequence[str], required_total: float):
+        """
+        Score a variant, stopping early once it cannot reach required_total.
+
+        Returns:
+            List of per-sentence scores, or None if the variant fell short
+        """
+        if self.chunk_size is None:
+            subscores = evaluator.evaluate_per_sentence(prompt, sentences, desc="compression")
+            return subscores if sum(subscores) >= required_total else None
+
+        subscores = []
+        for start in range(0, len(sentences), self.chunk_size):
+            chunk = [sentences[idx] for idx in range(start, min(start + self.chunk_size, len(sentences)))]
+            subscores.extend(evaluator.evaluate_per_sentence(prompt, chunk, desc="compression chunk"))
+            # Scores are at most 1.0 per sentence
+            if sum(subscores) + (len(sentences) - len(subscores)) < required_total:
+                return None
+        return subscores
+
+    def compress(self, prompt: str, sentences: Sequence[str], evaluator, reference_subscores=None):
+        """
+        Find the shortest variant of a prompt that keeps its validation score.
+
+        Args:
+            prompt: Prompt to compress, e.g. the result of GepaOptimizer.optimize()
+            sentences: Validation sentences
+            evaluator: Evaluator with evaluate_per_sentence() (and sanitize_latency()
+                for the latency report)
+            reference_subscores: Per-sentence scores of prompt on sentences. The
+                prompt is evaluated when None
+
+        Returns:
+            Tuple of (compressed prompt, report dict with the before/after score,
+            tokens and sanitize latency per sentence)
+        """
+        instrumentation = get_instrumentation()
+        print(f"\n  ✂️  Compressing prompt ({estimate_tokens(prompt)} tokens)...")
+
+        if reference_subscores is None:
+            with instrumentation.span("compression"):
+                reference_subscores = evaluator.evaluate_per_sentence(prompt, sentences, desc="compression")
+        reference_total = sum(reference_subscores)
+        # Small epsilon so float sums equal to the reference are not rejected
+        required_total = reference_total - self.tolerance * len(sentences) - 1e-9
+
+        current, current_subscores = prompt, reference_subscores
+        tried = {prompt.strip()}
+        variants_tested = 0
+        for round_idx in range(1, self.max_rounds + 1):
+            with instrumentation.span("compression"):
+                rewrite = self._rewrite(current)
+            candidates = [rewrite] if rewrite and estimate_tokens(rewrite) < estimate_tokens(current) else []
+            candidates += self._ablations(current)[:self.max_ablations]
+
+            accepted = None
+            for candidate in candidates:
+                if candidate in tried:
+                    continue
+                tried.add(candidate)
+                variants_tested += 1
+                with instrumentation.span("compression"):
+                    subscores = self._validate(evaluator, candidate, sentences, required_total)
+                if subscores is not None:
+                    accepted = candidate, subscores
+                    break
+
+            if accepted is None:
+                print(f"  ✓ Round {round_idx}: no shorter variant within tolerance")
+                break
+            current, current_subscores = accepted
+            print(
+                f"  ✓ Round {round_idx}: {estimate_tokens(current)} tokens, "
+                f"score {sum(current_subscores) / len(current_subscores):.3f}"
+            )
+
+        latency = getattr(evaluator, "sanitize_latency", lambda _: None)
+        report = {
+            "original": {
+                "tokens": estimate_tokens(prompt),
+                "score": reference_total / len(reference_subscores),
+                "latency": latency(prompt),
+            },
+            "compressed": {
+                "tokens": estimate_tokens(current),
+                "score": sum(current_subscores) / len(current_subscores),
+                "latency": latency(current),
+            },
+            "regressed_sentences": sum(
+                new < old for new, old in zip(current_subscores, reference_subscores)
+            ),
+            "variants_tested": variants_tested,
+            "tolerance": self.tolerance,
+        }
+        print(
+            f"  ✓ Compressed from {report['original']['tokens']} to {report['compressed']['tokens']} tokens "
+            f"after {variants_tested} variants (score {report['original']['score']:.3f} -> "
+            f"{report['compressed']['score']:.3f})"
+        )
+        return current, report
@@ -0,0 +1,235 @@
+import glob
+import hashlib
+import json
+import mmap
+import os
+from collections.abc import Sequence
+import numpy as np
+
+# Bytes read at a time while building a line-offset index
+INDEX_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def _index_path(path: str, index_dir: str = None) -> str:
+    """Index file of a JSONL file: next to it, or in index_dir under a name unique to its path."""
+    if index_dir is None:
+        return path + ".idx.npy"
+    digest = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(index_dir, f"{os.path.basename(path)}-{digest}.idx.npy")
+
+
+def _file_identity(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_line_index(path: str) -> np.ndarray:
+    """
+    Scan a JSONL file and return the (start, end) byte offsets of its non-blank lines.
+
+    Args:
+        path: JSONL file path
+
+    Returns:
+        uint64 array of shape (num_lines, 2)
+    """
+    starts, ends = [], []
+    line_start = 0
+    offset = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(INDEX_CHUNK_SIZE)
+            if not chunk:
+                break
+            newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n")) + offset
+            chunk_starts = np.concatenate(([line_start], newlines[:-1] + 1)) if len(newlines) else np.empty(0)
+            starts.append(chunk_starts)
+            ends.append(newlines)
+            if len(newlines):
+                line_start = int(newlines[-1]) + 1
+            offset += len(chunk)
+
+    # Last line without a trailing newline
+    if line_start < offset:
+        starts.append(np.array([line_start]))
+        ends.append(np.array([offset]))
+
+    if not starts:
+        return np.empty((0, 2), dtype=np.uint64)
+
+    index = np.stack([np.concatenate(starts), np.concatenate(ends)], axis=1).astype(np.uint64)
+
+    # Blank lines (including a lone "\r" in CRLF files) are not records
+    lengths = index[:, 1] - index[:, 0]
+    keep = lengths > 0
+    single = np.flatnonzero(lengths == 1)
+    if len(single):
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        keep[single] = data[index[single, 0]] != ord("\r")
+    return index[keep]
+
+
+def load_line_index(path: str, rebuild: bool = False, index_dir: str = None) -> np.ndarray:
+    """
+    Return the line-offset index of a JSONL file, memory-mapped from disk.
+
+    The index is stored next to the file as <path>.idx.npy, or in index_dir, with
+    the file's size and modification time in its first row, and is rebuilt when
+    the file changes. Loading an existing index takes constant time whatever the
+    file size. When the index cannot be written (e.g. the data lives on a
+    read-only mount), the index built in memory is returned instead.
+
+    Args:
+        path: JSONL file path
+        rebuild: Ignore any existing index
+        index_dir: Directory holding the index files (default: next to the data)
+
+    Returns:
+        uint64 array of shape (num_lines, 2) with the start and end offset of each line
+    """
+    index_path = _index_path(path, index_dir)
+    identity = _file_identity(path)
+
+    if not rebuild and os.path.exists(index_path):
+        try:
+            stored = np.load(index_path, mmap_mode="r")
+        except (OSError, ValueError):
+            # Unreadable or truncated index: rebuild it
+            stored = None
+        valid_shape = stored is not None and stored.ndim == 2 and stored.shape[1] == 2 and len(stored) > 0
+        if valid_shape and tuple(int(value) for value in stored[0]) == identity:
+            return stored[1:]
+
+    index = build_line_index(path)
+    header = np.array([identity], dtype=np.uint64)
+    tmp_path = index_path + ".tmp"
+    try:
+        if index_dir is not None:
+            os.makedirs(index_dir, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.concatenate([header, index]))
+        os.replace(tmp_path, index_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return index
+    return np.load(index_path, mmap_mode="r")[1:]
+
+
+def _decode(line: bytes, text_field: str) -> str:
+    record = json.loads(line)
+    if isinstance(record, dict):
+        return record[text_field]
+    return record
+
+
+class JsonlDataset(Sequence):
+    """
+    Sentences stored in one or more JSONL files, read on demand.
+
+    Each line holds a JSON string or an object with the sentence in text_field.
+    Lines are located through memory-mapped offset indexes, so random access is
+    O(1), opening a dataset with existing indexes takes constant time, and only
+    the sentences actually used are read into memory. Shards are concatenated
+    in the given order.
+    """
+
+    def __init__(self, paths, text_field: str = "text", index_dir: str = None):
+        """
+        Args:
+            paths: JSONL file path, glob pattern (e.g. "data/train-*.jsonl") or list of them
+            text_field: Field holding the sentence when lines are JSON objects
+            index_dir: Directory for the line-offset indexes, e.g. when the data
+                directory is read-only (default: next to each file)
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+
+        self.paths = []
+        for pattern in paths:
+            matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            if not matches:
+                raise FileNotFoundError(f"No files match {pattern}")
+            self.paths.extend(matches)
+
+        self.text_field = text_field
+        self._indexes = [load_line_index(path, index_dir=index_dir) for path in self.paths]
+        self._maps = [None] * len(self.paths)
+        self._offsets = np.cumsum([0] + [len(index) for index in self._indexes])
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def _map(self, shard: int):
+        if self._maps[shard] is None:
+            with open(self.paths[shard], "rb") as f:
+                self._maps[shard] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[shard]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return DatasetView(self, range(len(self))[idx])
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("dataset index out of range")
+
+        shard = int(np.searchsorted(self._offsets, idx, side="right")) - 1
+        start, end = self._indexes[shard][idx - self._offsets[shard]]
+        return _decode(self._map(shard)[int(start):int(end)], self.text_field)
+
+    def __iter__(self):
+        # Sequential reads are cheaper than going through the index
+        for path in self.paths:
+            with open(path, "rb") as f:
+                for line in f:
+                    if line.rstrip(b"\r\n"):
+                        yield _decode(line, self.text_field)
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the shard paths, sizes and modification times, computed without reading the data."""
+        identity = [(os.path.abspath(path), *_file_identity(path)) for path in self.paths]
+        return hashlib.sha256(json.dumps([self.text_field, identity]).encode("utf-8")).hexdigest()
+
+
+class DatasetView(Sequence):
+    """A lazily read range of a dataset, as returned by slicing a JsonlDataset."""
+
+    def __init__(self, dataset, indices: range):
+        self.dataset = dataset
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return DatasetView(self.dataset, self.indices[idx])
+        return self.dataset[self.indices[idx]]
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the parent dataset and the selected range."""
+        payload = [self.dataset.fingerprint, self.indices.start, self.indices.stop, self.indices.step]
+        return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+
+def load_dataset(path: str, text_field: str = "text", index_dir: str = None):
+    """
+    Load sentences from a JSON array file, or open JSONL files lazily.
+
+    Args:
+        path: JSON file holding a list of sentences, or a JSONL file / glob pattern
+        text_field: Field holding the sentence when records are JSON objects
+        index_dir: Directory for the line-offset indexes of JSONL files
+
+    Returns:
+        A list for JSON files, a JsonlDataset otherwise
+    """
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            records = json.load(f)
+        return [record[text_field] if isinstance(record, dict) else record for record in records]
+    return JsonlDataset(path, text_field=text_field, index_dir=index_dir)
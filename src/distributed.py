@@ -0,0 +1,450 @@
+"""
+Distributed evaluation: (prompt, sentences) jobs served by a pool of worker processes.
+
+The coordinator runs a small queue broker (multiprocessing.managers) holding a
+task board and a result queue. Local worker processes are started by
+DistributedBackend; workers on other machines join the same broker with:
+
+    uv run python -m src.distributed --address HOST:PORT --authkey KEY
+
+Each worker builds its own Evaluator (LLM client, model, judge) and evaluates the
+sentences of a job with its local sanitize -> judge pipeline, so response parsing
+and bookkeeping run in the workers. Jobs of workers that die, fail or time out
+are resubmitted.
+"""
+import argparse
+import functools
+import itertools
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Iterator
+
+
+class _TaskBoard:
+    """
+    Task queue remembering which worker took each job and when.
+
+    Taking a job records the claim in the broker in the same call, so a worker
+    dying right after taking a job still leaves a claim to detect. Retired jobs
+    (completed, failed or cancelled) are skipped when a stale copy is taken.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._claims = {}
+        self._retired = set()
+
+    def put(self, job):
+        """Queue a (job_id, prompt, items) job, or None to stop one worker."""
+        self._queue.put(job)
+
+    def take(self, worker_id: str):
+        """Block until a live job (or a stop message) is available and claim it for worker_id."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return None
+            with self._lock:
+                if job[0] in self._retired:
+                    continue
+                self._claims[job[0]] = (worker_id, time.monotonic())
+            return job
+
+    def release(self, job_id: int):
+        """Forget the claim on a job about to be queued again."""
+        with self._lock:
+            self._claims.pop(job_id, None)
+
+    def retire(self, job_ids):
+        """Drop jobs that no longer need a result, so queued copies are skipped."""
+        with self._lock:
+            for job_id in job_ids:
+                self._retired.add(job_id)
+                self._claims.pop(job_id, None)
+
+    def claims(self) -> dict:
+        """Map job id to (worker id, seconds since the job was taken)."""
+        now = time.monotonic()
+        with self._lock:
+            return {job_id: (worker_id, now - taken) for job_id, (worker_id, taken) in self._claims.items()}
+
+
+_board = _TaskBoard()
+_results = queue.Queue()
+
+
+def _get_board():
+    return _board
+
+
+def _get_results():
+    return _results
+
+
+class _Broker(BaseManager):
+    """Serves the task board and the result queue to the coordinator and the workers."""
+
+
+_Broker.register("board", callable=_get_board)
+_Broker.register("results", callable=_get_results)
+
+
+def make_evaluator(
+    simulate: bool = False,
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.7,
+    max_concurrency: int = 8,
+    judge_batch_size: int = 1,
+    model_batch_size: int = 1,
+    prejudge_audit_rate: float = None,
+):
+    """
+    Build the Evaluator a worker uses to process its jobs.
+
+    Use functools.partial to pass the arguments when giving it to
+    DistributedBackend, as it is sent to spawned worker processes.
+
+    Args:
+        simulate: Use the offline simulated LLM backend instead of the OpenAI API
+        model: OpenAI model name
+        temperature: Sampling temperature
+        max_concurrency: Concurrency of the worker's sanitize and judge stages
+        judge_batch_size: Pairs scored per judge call
+        model_batch_size: Sentences sanitized per model call
+        prejudge_audit_rate: Settle clear cases with a local PreJudge auditing this
+            fraction of them. None sends every pair to the LLM judge
+
+    Returns:
+        Evaluator instance
+    """
+    from src.evaluator import Evaluator
+    from src.model import Model
+    from src.prejudge import PreJudge
+
+    if simulate:
+        from src.simulated_llm import SimulatedLLMClient
+        llm_client = SimulatedLLMClient()
+    else:
+        from src.llm_client import LLMClient
+        llm_client = LLMClient(model=model, temperature=temperature)
+
+    return Evaluator(
+        Model(llm_client),
+        llm_client,
+        max_concurrency=max_concurrency,
+        judge_batch_size=judge_batch_size,
+        model_batch_size=model_batch_size,
+        prejudge=PreJudge(audit_rate=prejudge_audit_rate) if prejudge_audit_rate is not None else None,
+    )
+
+
+def run_worker(address, authkey: bytes, evaluator_factory=make_evaluator, worker_id: str = None):
+    """
+    Process jobs from a broker until it sends a stop message or goes away.
+
+    Args:
+        address: (host, port) of the coordinator's broker
+        authkey: Broker authentication key
+        evaluator_factory: Zero-argument callable building the worker's Evaluator
+        worker_id: Name reported with results (default: hostname-pid)
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    broker = _Broker(address=address, authkey=authkey)
+    broker.connect()
+    board, results = broker.board(), broker.results()
+    evaluator = evaluator_factory()
+
+    while True:
+        try:
+            job = board.take(worker_id)
+        except (EOFError, ConnectionError):
+            return
+        if job is None:
+            return
+
+        job_id, prompt, items = job
+        try:
+            sentences = [sentence for _, sentence in items]
+            traces = [(items[local_idx][0], trace) for local_idx, trace in evaluator.iter_traces(prompt, sentences)]
+        except Exception as e:
+            results.put(("failed", job_id, worker_id, f"{type(e).__name__}: {e}"))
+        else:
+            results.put(("done", job_id, worker_id, traces))
+
+
+class DistributedBackend:
+    """
+    Evaluation backend spreading jobs over worker processes through a queue broker.
+
+    Sentences are split into jobs of chunk_size sentences. A collector thread
+    routes results back to the evaluation that submitted them, so concurrent
+    evaluations (e.g. parallel rollouts) share the workers. A job is resubmitted
+    when its worker reports a failure, when the local process that took it dies,
+    or when it was taken longer than job_timeout ago (e.g. by a lost remote
+    worker); after max_attempts it fails the evaluation. Duplicate results are
+    ignored, and workers skip queued copies of jobs that no longer need one.
+    """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(
+        self,
+        evaluator_factory=make_evaluator,
+        processes: int = 4,
+        address: tuple = ("127.0.0.1", 0),
+        authkey: bytes = b"gepa",
+        chunk_size: int = 5,
+        max_jobs_in_flight: int = 64,
+        job_timeout: float = 600.0,
+        max_attempts: int = 3,
+    ):
+        """
+        Args:
+            evaluator_factory: Picklable zero-argument callable building the Evaluator
+                of each local worker (default: make_evaluator with its defaults)
+            processes: Local worker processes to start; 0 to rely on remote workers only
+            address: Address the broker listens on. Bind to a public interface and
+                a fixed port to let workers on other machines join
+            authkey: Broker authentication key shared with the workers
+            chunk_size: Sentences per job
+            max_jobs_in_flight: Jobs one evaluation keeps queued or running
+            job_timeout: Seconds after a worker took a job before it is resubmitted
+            max_attempts: Attempts per job before the evaluation fails
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        self.evaluator_factory = evaluator_factory
+        self.processes = processes
+        self.authkey = authkey
+        self.chunk_size = chunk_size
+        self.max_jobs_in_flight = max_jobs_in_flight
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+
+        self._context = multiprocessing.get_context("spawn")
+        self._broker = _Broker(address=address, authkey=authkey, ctx=self._context)
+        self._broker.start()
+        self.address = self._broker.address
+        self._board = self._broker.board()
+        self._results = self._broker.results()
+
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._jobs = {}
+        self._workers = {}
+        self._worker_ids = itertools.count()
+        self._closed = False
+        # Why the collector thread stopped, raised by the evaluations waiting on it
+        self._collector_error = None
+        self.resubmitted = 0
+        self.restarts = 0
+
+        for _ in range(processes):
+            self._start_worker()
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _start_worker(self):
+        worker_id = f"local-{next(self._worker_ids)}"
+        process = self._context.Process(
+            target=run_worker,
+            args=(self.address, self.authkey, self.evaluator_factory, worker_id),
+            daemon=True,
+        )
+        process.start()
+        self._workers[worker_id] = process
+
+    def _resubmit(self, job_id: int, reason: str):
+        """Queue a job again, or fail its evaluation after max_attempts. Must hold the lock."""
+        job = self._jobs[job_id]
+        job["attempts"] += 1
+        if job["attempts"] >= self.max_attempts:
+            del self._jobs[job_id]
+            self._board.retire([job_id])
+            error = RuntimeError(f"Evaluation job failed {job['attempts']} times: {reason}")
+            job["owner"].put(("error", job_id, error))
+            return
+
+        print(f"  ⚠️  Resubmitting evaluation job {job_id}: {reason}")
+        self.resubmitted += 1
+        self._board.release(job_id)
+        self._board.put((job_id, job["prompt"], job["items"]))
+
+    def _handle(self, message):
+        kind, job_id, worker_id, payload = message
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                # Cancelled, or already completed by another attempt
+                return
+            if kind == "done":
+                del self._jobs[job_id]
+                self._board.retire([job_id])
+                job["owner"].put(("done", job_id, payload))
+            elif kind == "failed":
+                self._resubmit(job_id, f"worker {worker_id} raised {payload}")
+
+    def _check_jobs(self):
+        """Restart dead local workers and resubmit their jobs and timed-out jobs."""
+        claims = self._board.claims()
+        with self._lock:
+            for worker_id, process in list(self._workers.items()):
+                if process.exitcode is None:
+                    continue
+                del self._workers[worker_id]
+                for job_id, (claimer, _) in list(claims.items()):
+                    if claimer == worker_id and job_id in self._jobs:
+                        del claims[job_id]
+                        self._resubmit(job_id, f"worker {worker_id} exited with code {process.exitcode}")
+                if self.restarts < self.max_attempts * max(1, self.processes):
+                    self.restarts += 1
+                    self._start_worker()
+                elif not self._workers:
+                    self._board.retire(list(self._jobs))
+                    for job_id in list(self._jobs):
+                        error = RuntimeError("Evaluation workers keep dying")
+                        self._jobs.pop(job_id)["owner"].put(("error", job_id, error))
+
+            for job_id, (worker_id, age) in claims.items():
+                if job_id in self._jobs and age > self.job_timeout:
+                    self._resubmit(job_id, f"no result from worker {worker_id} after {self.job_timeout:.0f}s")
+
+    def _collect(self):
+        try:
+            while not self._closed:
+                try:
+                    message = self._results.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    message = None
+                if message is not None:
+                    self._handle(message)
+                self._check_jobs()
+        except (EOFError, ConnectionError) as e:
+            if not self._closed:
+                self._collector_error = RuntimeError(f"Lost the connection to the evaluation broker: {e!r}")
+        except BaseException as e:
+            self._collector_error = e
+
+    def _next_message(self, owner: queue.Queue):
+        """Wait for a message of an evaluation, raising if the collector thread stopped."""
+        while True:
+            try:
+                return owner.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                # A message put just before the collector stopped is still delivered
+                if self._collector.is_alive() or not owner.empty():
+                    continue
+                raise self._collector_error or RuntimeError("The evaluation result collector stopped")
+
+    def _submit(self, prompt: str, items: list, owner: queue.Queue) -> int:
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._jobs[job_id] = {
+                "prompt": prompt,
+                "items": items,
+                "owner": owner,
+                "attempts": 0,
+            }
+        self._board.put((job_id, prompt, items))
+        return job_id
+
+    def evaluate(self, prompt: str, items) -> Iterator[tuple[int, dict]]:
+        """
+        Evaluate (index, sentence) pairs on the workers.
+
+        Closing the generator early cancels the jobs that have not completed. If
+        the collector thread stops (e.g. because the broker died), the evaluation
+        raises its error instead of waiting for results forever.
+
+        Args:
+            prompt: The PII stripping prompt to evaluate
+            items: Sequence of (index, sentence) pairs supporting len() and slicing
+
+        Yields:
+            (index, trace) tuples, in job completion order
+        """
+        if self._closed:
+            raise RuntimeError("DistributedBackend is closed")
+
+        owner = queue.Queue()
+        starts = iter(range(0, len(items), self.chunk_size))
+        submitted = set()
+        try:
+            for start in itertools.islice(starts, self.max_jobs_in_flight):
+                submitted.add(self._submit(prompt, list(items[start:start + self.chunk_size]), owner))
+
+            while submitted:
+                kind, job_id, payload = self._next_message(owner)
+                if kind == "error":
+                    raise payload
+
+                # Other jobs may have completed already, but their results are still queued
+                submitted.discard(job_id)
+                yield from payload
+                for start in itertools.islice(starts, self.max_jobs_in_flight - len(submitted)):
+                    submitted.add(self._submit(prompt, list(items[start:start + self.chunk_size]), owner))
+        finally:
+            with self._lock:
+                for job_id in submitted:
+                    self._jobs.pop(job_id, None)
+            if submitted and self._collector_error is None:
+                # Queued copies of cancelled jobs would still take worker time
+                self._board.retire(list(submitted))
+
+    def stats(self) -> dict:
+        """Return worker and resubmission counters."""
+        with self._lock:
+            return {
+                "local_workers": len(self._workers),
+                "restarts": self.restarts,
+                "resubmitted_jobs": self.resubmitted,
+                "jobs_in_flight": len(self._jobs),
+            }
+
+    def close(self):
+        """Stop the local workers and the broker."""
+        if self._closed:
+            return
+        self._closed = True
+        self._collector.join()
+        if self._collector_error is None:
+            for _ in self._workers:
+                self._board.put(None)
+        for process in self._workers.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._broker.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join a distributed evaluation broker as a worker")
+    parser.add_argument("--address", required=True, help="Broker address as HOST:PORT")
+    parser.add_argument("--authkey", default="gepa", help="Broker authentication key")
+    parser.add_argument("--simulate", action="store_true", help="Use the offline simulated LLM backend")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    host, port = args.address.rsplit(":", 1)
+    factory = functools.partial(
+        make_evaluator,
+        simulate=args.simulate,
+        model=args.model,
+        temperature=args.temperature,
+        max_concurrency=args.max_concurrency,
+    )
+    run_worker((host, int(port)), args.authkey.encode("utf-8"), factory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Sequence
+from src.instrumentation import bind_context
+
+
+class _Failure:
+    """Wraps an exception raised inside a pipeline stage for one item, or for the whole run if fatal."""
+
+    def __init__(self, error: BaseException, fatal: bool = False):
+        self.error = error
+        self.fatal = fatal
+
+
+class EvaluationPipeline:
+    """
+    Two-stage producer/consumer pipeline: sanitize -> bounded queue -> judge.
+
+    Each stage runs on its own thread pool with its own concurrency limit, so
+    the stripper model and the judge stay busy even when their latencies or
+    rate limits differ. Results are yielded as soon as they are judged.
+
+    Sanitize chunks and judge batches are made of consecutive items in input
+    order, whatever order the calls complete in, so the same items always
+    produce the same requests (which response caches and transcript replay
+    rely on). A judge batch waits for the items before it to be sanitized.
+    """
+
+    # How often blocked stages wake up to check whether the run was stopped
+    POLL_INTERVAL = 0.1
+
+    def __init__(
+        self,
+        sanitize: Callable[[list[str]], list[str]],
+        judge: Callable[[list[tuple[str, str]]], list[dict]],
+        sanitize_concurrency: int = 1,
+        judge_concurrency: int = 1,
+        sanitize_batch_size: int = 1,
+        judge_batch_size: int = 1,
+        queue_size: int = None,
+        prejudge: Callable[[str, str], dict] = None,
+    ):
+        """
+        Args:
+            sanitize: Maps a chunk of sentences to their sanitized outputs
+            judge: Maps a chunk of (original, sanitized) pairs to evaluation results
+            sanitize_concurrency: Maximum number of sanitize calls in flight
+            judge_concurrency: Maximum number of judge calls in flight
+            sanitize_batch_size: Number of sentences per sanitize call
+            judge_batch_size: Number of pairs per judge call
+            queue_size: Capacity of the queue between the stages. Sanitize workers
+                block when it is full (default: two rounds of judge work)
+            prejudge: Optional local check mapping an (original, sanitized) pair to
+                an evaluation result, or to None to send the pair to the judge.
+                Settled pairs skip the judge stage
+        """
+        self.sanitize = sanitize
+        self.judge = judge
+        self.sanitize_concurrency = sanitize_concurrency
+        self.judge_concurrency = judge_concurrency
+        self.sanitize_batch_size = sanitize_batch_size
+        self.judge_batch_size = judge_batch_size
+        self.queue_size = queue_size or 2 * judge_concurrency * judge_batch_size
+        self.prejudge = prejudge
+
+    def _put(self, target: queue.Queue, item, stop: threading.Event) -> bool:
+        """Put item on a bounded queue, giving up if the run is stopped."""
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self, items: Sequence[tuple[int, str]]) -> Iterator[tuple[int, str, dict]]:
+        """
+        Sanitize and judge sentences, yielding results in completion order.
+
+        Closing the generator early stops scheduling new calls; calls already in
+        flight finish in the background and their results are dropped. A failed
+        call is raised once the results of the other items have been yielded, so
+        a consumer that stops early on those never sees the failure of a call it
+        did not need (e.g. one that a replayed transcript never recorded, because
+        the recorded run had stopped before making it).
+
+        Args:
+            items: Sequence of (index, sentence) pairs to evaluate. Only len() and
+                slicing are used, so it can read sentences lazily
+
+        Yields:
+            (index, sanitized_output, eval_result) tuples
+        """
+        if not items:
+            return
+
+        stop = threading.Event()
+        handoff = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+        judge_slots = threading.Semaphore(self.judge_concurrency)
+        sanitize_pool = ThreadPoolExecutor(max_workers=self.sanitize_concurrency)
+        judge_pool = ThreadPoolExecutor(max_workers=self.judge_concurrency)
+
+        # Stage workers run with the caller's instrumentation tags
+        @bind_context
+        def sanitize_chunk(start):
+            if stop.is_set():
+                return
+            try:
+                # Sliced here so that a lazily read sequence only loads sentences about to be sanitized
+                chunk = items[start:start + self.sanitize_batch_size]
+                outputs = self.sanitize([sentence for _, sentence in chunk])
+            except BaseException as e:
+                # Every item of the chunk still takes its turn in the judge stage
+                for position in range(start, min(start + self.sanitize_batch_size, len(items))):
+                    if not self._put(handoff, (position, None, None, None, _Failure(e)), stop):
+                        return
+                return
+            for position, ((idx, sentence), sanitized) in enumerate(zip(chunk, outputs), start=start):
+                try:
+                    verdict = self.prejudge(sentence, sanitized) if self.prejudge is not None else None
+                except BaseException as e:
+                    verdict = _Failure(e)
+                if not self._put(handoff, (position, idx, sentence, sanitized, verdict), stop):
+                    return
+
+        @bind_context
+        def judge_chunk(batch):
+            try:
+                if stop.is_set():
+                    return
+                eval_results = self.judge([(sentence, sanitized) for _, _, sentence, sanitized, _ in batch])
+                for (_, idx, _, sanitized, _), eval_result in zip(batch, eval_results):
+                    results.put((idx, sanitized, eval_result))
+            except BaseException as e:
+                for _ in batch:
+                    results.put(_Failure(e))
+            finally:
+                judge_slots.release()
+
+        def dispatch():
+            """Group sanitized outputs into judge batches in input order."""
+            try:
+                for start in range(0, len(items), self.sanitize_batch_size):
+                    sanitize_pool.submit(sanitize_chunk, start)
+
+                # Escalated items by position until all the items before them have arrived
+                arrived = {}
+                next_position = 0
+                batch = []
+                while next_position < len(items) and not stop.is_set():
+                    try:
+                        position, idx, sentence, sanitized, verdict = handoff.get(timeout=self.POLL_INTERVAL)
+                    except queue.Empty:
+                        continue
+
+                    if isinstance(verdict, _Failure):
+                        results.put(verdict)
+                        arrived[position] = None
+                    elif verdict is not None:
+                        # Settled pairs need no judge call, so they don't wait for their turn
+                        results.put((idx, sanitized, verdict))
+                        arrived[position] = None
+                    else:
+                        arrived[position] = (position, idx, sentence, sanitized, verdict)
+
+                    while next_position in arrived:
+                        item = arrived.pop(next_position)
+                        next_position += 1
+                        if item is not None:
+                            batch.append(item)
+
+                        if batch and (len(batch) == self.judge_batch_size or next_position == len(items)):
+                            while not judge_slots.acquire(timeout=self.POLL_INTERVAL):
+                                if stop.is_set():
+                                    return
+                            judge_pool.submit(judge_chunk, batch)
+                            batch = []
+            except BaseException as e:
+                results.put(_Failure(e, fatal=True))
+
+        dispatcher = threading.Thread(target=dispatch, daemon=True)
+        dispatcher.start()
+
+        try:
+            error = None
+            for _ in range(len(items)):
+                result = results.get()
+                if isinstance(result, _Failure):
+                    if result.fatal:
+                        raise result.error
+                    if error is None:
+                        error = result.error
+                    continue
+                yield result
+            if error is not None:
+                raise error
+        finally:
+            stop.set()
+            dispatcher.join()
+            sanitize_pool.shutdown(wait=False, cancel_futures=True)
+            judge_pool.shutdown(wait=False, cancel_futures=True)
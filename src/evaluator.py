@@ -1,26 +1,125 @@
 import json
-from typing import Any
+import threading
+import time
+from array import array
+from collections.abc import Sequence
+from typing import Any, Iterator
 from json_repair import repair_json
 from tqdm import tqdm
-from src.prompts import EVALUATION_PROMPT
+from src.eval_pipeline import EvaluationPipeline
+from src.instrumentation import prompt_id, tags
+from src.prompts import EVALUATION_PROMPT, EVALUATION_INPUT, EVALUATION_BATCH_PROMPT, EVALUATION_BATCH_ITEM
+from src.transport import estimate_tokens
+
+
+class _PendingSentences(Sequence):
+    """(index, sentence) pairs for the given indices, read from sentences only when sliced."""
+
+    def __init__(self, sentences, indices):
+        self.sentences = sentences
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [(i, self.sentences[i]) for i in self.indices[idx]]
+        i = self.indices[idx]
+        return i, self.sentences[i]
 
 
 class Evaluator:
     """Evaluates PII stripping prompts using an LLM as the judge."""
 
-    def __init__(self, model, llm_client):
+    def __init__(
+        self,
+        model,
+        llm_client,
+        max_concurrency: int = 1,
+        score_store=None,
+        judge_batch_size: int = 1,
+        model_batch_size: int = 1,
+        sanitize_concurrency: int = None,
+        judge_concurrency: int = None,
+        queue_size: int = None,
+        backend=None,
+        trace_store=None,
+        prejudge=None,
+        track_output_tokens: bool = False,
+    ):
         """
         Args:
             model: Model instance with run(prompt, sentence) method
-            llm_client: LLM client with a generate(prompt: str) -> str method for evaluation
+            llm_client: LLM client with a generate(prompt: str, system: str = None) -> str
+                method for evaluation. Judge instructions are sent as the system message
+            max_concurrency: Default concurrency limit of each pipeline stage
+                (sanitize and judge) when no stage-specific limit is given (default: 1)
+            score_store: Optional ScoreStore consulted before evaluating a
+                (prompt, sentence) pair and filled with every new trace
+            judge_batch_size: Number of (original, sanitized) pairs scored by a
+                single judge call. Pairs missing from a malformed batch response are
+                re-judged one at a time (default: 1, one judge call per sentence)
+            model_batch_size: Number of sentences sanitized by a single call to
+                model.run_batch() (default: 1, one model call per sentence)
+            sanitize_concurrency: Maximum number of model calls in flight
+                (default: max_concurrency)
+            judge_concurrency: Maximum number of judge calls in flight
+                (default: max_concurrency)
+            queue_size: Capacity of the queue between the sanitize and judge stages
+                (default: two rounds of judge work)
+            backend: Optional evaluation backend with an evaluate(prompt, items) method
+                yielding (index, trace) pairs, e.g. a DistributedBackend spreading the
+                work over worker processes. The in-process pipeline is used when None
+            trace_store: Optional TraceStore every new trace is appended to, so
+                later mutations can reflect on past evaluations
+            prejudge: Optional PreJudge settling clear failures locally.
+                Only the pairs it cannot settle (and an audit sample) reach the judge
+            track_output_tokens: Keep the mean estimated length of each prompt's
+                sanitized outputs, for the output_tokens cost (default: False)
         """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if judge_batch_size < 1:
+            raise ValueError("judge_batch_size must be at least 1")
+        if model_batch_size < 1:
+            raise ValueError("model_batch_size must be at least 1")
+
         self.model = model
         self.llm_client = llm_client
+        self.max_concurrency = max_concurrency
+        self.score_store = score_store
+        self.judge_batch_size = judge_batch_size
+        self.model_batch_size = model_batch_size
+        self.sanitize_concurrency = sanitize_concurrency or max_concurrency
+        self.judge_concurrency = judge_concurrency or max_concurrency
+        self.queue_size = queue_size
+        self.backend = backend
+        self.trace_store = trace_store
+        self.prejudge = prejudge
+
+        # Sanitize time per prompt id: [total seconds, sentences]
+        self._latency_lock = threading.Lock()
+        self._sanitize_time = {}
+        # Estimated output tokens per prompt id: [total tokens, sentences]
+        self.track_output_tokens = track_output_tokens
+        self._output_tokens = {}
+
+    @staticmethod
+    def _parse_eval_result(eval_result: dict) -> dict:
+        """Normalize one judge verdict. Raises ValueError/TypeError if it has no usable score."""
+        return {
+            "score": float(eval_result["score"]),
+            "removed_pii": eval_result.get("removed_pii", []),
+            "missed_pii": eval_result.get("missed_pii", []),
+            "feedback": eval_result.get("feedback", "")
+        }
 
     def _evaluate_with_llm(self, original: str, sanitized: str) -> dict:
         """Use LLM to evaluate the sanitization quality."""
-        eval_prompt = EVALUATION_PROMPT.format(original=original, sanitized=sanitized)
-        response = self.llm_client.generate(eval_prompt)
+        eval_input = EVALUATION_INPUT.format(original=original, sanitized=sanitized)
+        with tags(stage="judge"):
+            response = self.llm_client.generate(eval_input, system=EVALUATION_PROMPT)
 
         # Parse evaluation response
         try:
@@ -32,7 +131,7 @@ class Evaluator:
                 "missed_pii": eval_result.get("missed_pii", []),
                 "feedback": eval_result.get("feedback", "")
             }
-        except (json.JSONDecodeError, KeyError, ValueError):
+        except (json.JSONDecodeError, KeyError, ValueError, AttributeError, TypeError):
             # If evaluation fails, return 0 score
             return {
                 "score": 0.0,
@@ -41,6 +140,229 @@ class Evaluator:
                 "feedback": "Failed to parse evaluation response"
             }
 
+    def _evaluate_batch_with_llm(self, pairs: list[tuple[str, str]]) -> list[dict]:
+        """
+        Use one LLM call to evaluate several (original, sanitized) pairs.
+
+        Items that are missing or malformed in the response are evaluated
+        again individually with _evaluate_with_llm.
+
+        Returns:
+            List of evaluation results in the same order as pairs
+        """
+        items = "\n".join(
+            EVALUATION_BATCH_ITEM.format(id=i + 1, original=original, sanitized=sanitized)
+            for i, (original, sanitized) in enumerate(pairs)
+        )
+        with tags(stage="judge"):
+            response = self.llm_client.generate(items, system=EVALUATION_BATCH_PROMPT)
+
+        results = [None] * len(pairs)
+        try:
+            entries = json.loads(repair_json(response))
+        except (json.JSONDecodeError, ValueError):
+            entries = []
+        if isinstance(entries, dict):
+            entries = [entries]
+        if not isinstance(entries, list):
+            entries = []
+
+        for position, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                continue
+            # Prefer the explicit id; fall back to the position when ids are absent
+            try:
+                idx = int(entry.get("id", position + 1)) - 1
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= idx < len(pairs) or results[idx] is not None:
+                continue
+            try:
+                results[idx] = self._parse_eval_result(entry)
+            except (KeyError, ValueError, TypeError):
+                continue
+
+        for idx, result in enumerate(results):
+            if result is None:
+                original, sanitized = pairs[idx]
+                results[idx] = self._evaluate_with_llm(original, sanitized)
+
+        return results
+
+    @staticmethod
+    def _build_trace(sentence: str, sanitized: str, eval_result: dict) -> dict:
+        """Build the trace of one evaluated sentence."""
+        return {
+            "input": sentence,
+            "sanitized_output": sanitized,
+            "score": eval_result["score"],
+            "removed_pii": eval_result["removed_pii"],
+            "missed_pii": eval_result["missed_pii"],
+            "feedback": eval_result["feedback"]
+        }
+
+    def _sanitize_chunk(self, prompt: str, sentences: list[str]) -> list[str]:
+        """Run the model on a chunk of sentences, timing the call."""
+        start = time.perf_counter()
+        if len(sentences) == 1:
+            sanitized = [self.model.run(prompt, sentences[0])]
+        else:
+            sanitized = self.model.run_batch(prompt, sentences)
+        elapsed = time.perf_counter() - start
+
+        with self._latency_lock:
+            measured = self._sanitize_time.setdefault(prompt_id(prompt), [0.0, 0])
+            measured[0] += elapsed
+            measured[1] += len(sentences)
+        return sanitized
+
+    def sanitize_latency(self, prompt: str):
+        """
+        Mean measured sanitize time per sentence of a prompt, in seconds.
+
+        Only sentences sanitized by the in-process pipeline are measured; results
+        reused from the score store or computed by a backend are not.
+
+        Returns:
+            Seconds per sentence, or None if no sentence was sanitized with the prompt
+        """
+        with self._latency_lock:
+            measured = self._sanitize_time.get(prompt_id(prompt))
+        if measured is None:
+            return None
+        return measured[0] / measured[1]
+
+    def _record_output_tokens(self, prompt: str, trace: dict):
+        """Add the estimated length of a prompt's sanitized output to its running total."""
+        tokens = estimate_tokens(trace["sanitized_output"])
+        with self._latency_lock:
+            measured = self._output_tokens.setdefault(prompt_id(prompt), [0, 0])
+            measured[0] += tokens
+            measured[1] += 1
+
+    def output_tokens(self, prompt: str):
+        """
+        Mean estimated output tokens per sentence of a prompt.
+
+        Every trace yielded for the prompt counts, including those reused from the
+        score store. Unlike the measured latency, this only depends on the model's
+        responses, so it is the same in every run that gets the same responses
+        (e.g. from a response cache or a replayed transcript).
+
+        Returns:
+            Tokens per sentence, or None if output tokens are not tracked or no
+            sentence was evaluated with the prompt
+        """
+        with self._latency_lock:
+            measured = self._output_tokens.get(prompt_id(prompt))
+        if measured is None:
+            return None
+        return measured[0] / measured[1]
+
+    def _judge_chunk(self, pairs: list[tuple[str, str]]) -> list[dict]:
+        """Judge a chunk of (original, sanitized) pairs."""
+        if len(pairs) == 1:
+            return [self._evaluate_with_llm(*pairs[0])]
+        return self._evaluate_batch_with_llm(pairs)
+
+    def iter_traces(self, prompt: str, sentences: list[str]) -> Iterator[tuple[int, dict]]:
+        """
+        Evaluate a prompt and yield traces as soon as they are available.
+
+        Stored traces are yielded first, then new sentences stream through the
+        sanitize -> judge pipeline (or the configured backend) and are yielded
+        in completion order. Closing the generator early stops scheduling
+        further LLM calls.
+
+        Args:
+            prompt: The PII stripping prompt to evaluate
+            sentences: Sentences containing PII. Any sequence works (e.g. a
+                JsonlDataset); sentences are read as they are scheduled
+
+        Yields:
+            (sentence_index, trace) tuples
+        """
+        if self.score_store is None:
+            pending = range(len(sentences))
+        else:
+            pending = array("q")
+            for idx, sentence in enumerate(sentences):
+                trace = self.score_store.get(prompt, sentence)
+                if trace is None:
+                    pending.append(idx)
+                else:
+                    if self.track_output_tokens:
+                        self._record_output_tokens(prompt, trace)
+                    yield idx, trace
+
+        items = _PendingSentences(sentences, pending)
+        if self.backend is not None:
+            results = self.backend.evaluate(prompt, items)
+        else:
+            results = self._pipeline_traces(prompt, items)
+        try:
+            for idx, trace in results:
+                if self.score_store is not None:
+                    self.score_store.put(prompt, sentences[idx], trace)
+                if self.trace_store is not None:
+                    self.trace_store.append(prompt, sentences[idx], trace)
+                if self.track_output_tokens:
+                    self._record_output_tokens(prompt, trace)
+                yield idx, trace
+        finally:
+            results.close()
+
+    def _pipeline_traces(self, prompt: str, items) -> Iterator[tuple[int, dict]]:
+        """Evaluate (index, sentence) pairs with the in-process sanitize -> judge pipeline."""
+        candidate = prompt_id(prompt)
+
+        def judge(pairs):
+            with tags(candidate=candidate):
+                eval_results = self._judge_chunk(pairs)
+            if self.prejudge is not None:
+                for (original, sanitized), eval_result in zip(pairs, eval_results):
+                    self.prejudge.record_judge(original, sanitized, eval_result)
+            return eval_results
+
+        pipeline = EvaluationPipeline(
+            sanitize=lambda chunk: self._sanitize_chunk(prompt, chunk),
+            judge=judge,
+            sanitize_concurrency=self.sanitize_concurrency,
+            judge_concurrency=self.judge_concurrency,
+            sanitize_batch_size=self.model_batch_size,
+            judge_batch_size=self.judge_batch_size,
+            queue_size=self.queue_size,
+            prejudge=self.prejudge.settle if self.prejudge is not None else None,
+        )
+        results = pipeline.run(items)
+        try:
+            for idx, sanitized, eval_result in results:
+                yield idx, self._build_trace(items.sentences[idx], sanitized, eval_result)
+        finally:
+            results.close()
+
+    def _evaluate_sentences(self, prompt: str, sentences: list[str], desc: str) -> list[dict]:
+        """
+        Evaluate all sentences and collect their traces.
+
+        Returns:
+            List of traces in the same order as sentences
+        """
+        traces = [None] * len(sentences)
+        total_score = 0.0
+
+        progress = tqdm(total=len(sentences), desc=f"  {desc.capitalize()}", leave=False)
+        try:
+            for done, (idx, trace) in enumerate(self.iter_traces(prompt, sentences), start=1):
+                traces[idx] = trace
+                total_score += trace["score"]
+                progress.set_postfix(score=f"{total_score / done:.3f}", refresh=False)
+                progress.update(1)
+        finally:
+            progress.close()
+
+        return traces
+
     def evaluate_per_sentence(self, prompt: str, sentences: list[str], desc: str = "validation") -> list[float]:
         """
         Evaluate a prompt on sentences and return per-sentence scores.
@@ -54,17 +376,8 @@ class Evaluator:
             List of scores (0.0 to 1.0) for each sentence
         """
         print(f"  Evaluating on {desc} set ({len(sentences)} sentences)...")
-        scores = []
-
-        for sentence in tqdm(sentences, desc=f"  {desc.capitalize()}", leave=False):
-            # Run PII stripper model
-            sanitized = self.model.run(prompt, sentence)
-
-            # Evaluate with LLM
-            eval_result = self._evaluate_with_llm(sentence, sanitized)
-            scores.append(eval_result["score"])
-
-        return scores
+        traces = self._evaluate_sentences(prompt, sentences, desc)
+        return [trace["score"] for trace in traces]
 
     def evaluate_with_traces(self, prompt: str, sentences: list[str], desc: str = "train") -> dict[str, Any]:
         """
@@ -79,28 +392,6 @@ class Evaluator:
             Dict with 'scores', 'traces' containing detailed execution info
         """
         print(f"  Evaluating on {desc} set ({len(sentences)} sentences with traces)...")
-        scores = []
-        traces = []
-
-        for sentence in tqdm(sentences, desc=f"  {desc.capitalize()}", leave=False):
-            # Run PII stripper model
-            sanitized = self.model.run(prompt, sentence)
-
-            # Evaluate with LLM
-            eval_result = self._evaluate_with_llm(sentence, sanitized)
-
-            score = eval_result["score"]
-            scores.append(score)
-
-            # Build trace with all information for reflection
-            trace = {
-                "input": sentence,
-                "sanitized_output": sanitized,
-                "score": score,
-                "removed_pii": eval_result["removed_pii"],
-                "missed_pii": eval_result["missed_pii"],
-                "feedback": eval_result["feedback"]
-            }
-            traces.append(trace)
-
+        traces = self._evaluate_sentences(prompt, sentences, desc)
+        scores = [trace["score"] for trace in traces]
         return {"scores": scores, "traces": traces}
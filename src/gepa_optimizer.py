@@ -1,118 +1,959 @@
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from src.checkpoint import load_checkpoint, save_checkpoint
+from src.instrumentation import bind_context, get_instrumentation, tags
 from src.pareto_helper import ParetoHelper
+from src.prompt_index import NearDuplicateIndex
+from src.transport import estimate_tokens
+from tqdm import tqdm
+import hashlib
+import json
+import math
 import random
 
+# Candidate costs that can be used as objectives, limits or weights
+COST_OBJECTIVES = ("prompt_tokens", "output_tokens", "latency")
+
 
 class GepaOptimizer:
-    def __init__(self, max_merges: int = 10, minibatch_size: int = 5):
+    def __init__(
+        self,
+        max_merges: int = 10,
+        minibatch_size: int = 5,
+        parallel_rollouts: int = 1,
+        seed: int = 42,
+        validation_chunk_size: int = None,
+        racing_confidence: float = None,
+        checkpoint_path: str = None,
+        checkpoint_every: int = 1,
+        dedup_threshold: float = None,
+        mutation_fanout: int = 1,
+        objectives: Sequence[str] = (),
+        objective_limits: dict = None,
+        objective_weights: dict = None,
+    ):
         """
         Args:
             max_merges: Maximum number of merge operations allowed
             minibatch_size: Number of train examples to use for mutation evaluation
+            parallel_rollouts: Number of rollouts run at the same time. Rollouts are
+                planned from the same Pareto state and their results are applied in
+                rollout order, so a run is reproducible for a given seed when the LLM
+                responses are deterministic (default: 1, sequential)
+            seed: Seed of the random generator used for parent selection and
+                minibatch sampling
+            validation_chunk_size: Validate mutated prompts in chunks of this many
+                sentences (in random order) and stop as soon as the prompt is out of
+                the running: it has not beaten the Pareto front on any evaluated
+                sentence and its validation score cannot beat the best candidate's.
+                None validates on the whole set at once (default)
+            racing_confidence: Confidence level of the statistical stopping rule, e.g.
+                0.95. The final score is bounded with a Hoeffding upper confidence
+                bound instead of the provable bound that assumes a perfect score on
+                every remaining sentence. None uses the provable bound (default)
+            checkpoint_path: File the full optimizer state is written to after
+                completed rollouts, for optimize(resume=True). None disables
+                checkpointing (default)
+            checkpoint_every: Write a checkpoint every this many waves of rollouts
+            dedup_threshold: Estimated Jaccard similarity (over word 3-grams) from
+                which a mutated or merged prompt counts as a near-duplicate of a
+                prompt already evaluated. Near-duplicates are rejected before any
+                evaluation, and merges of two near-duplicate parents are skipped.
+                None disables the check (default)
+            mutation_fanout: Number of children proposed per mutation. The children
+                share the parent's minibatch evaluation and are raced on the
+                minibatch with successive halving; only the winner is compared
+                with the parent and validated (default: 1, a single child)
+            objectives: Candidate costs optimized besides the validation score:
+                "prompt_tokens" (estimated prompt length), "output_tokens" (mean
+                estimated length of the sanitized outputs, tracked by an Evaluator
+                created with track_output_tokens=True) and "latency"
+                (measured mean sanitize time per sentence). Latency is wall-clock
+                time, so it differs between runs; output_tokens is a reproducible
+                proxy for it. Candidates on the score/cost trade-off front stay
+                selectable as parents (default: none)
+            objective_limits: Maximum cost values, e.g. {"prompt_tokens": 200}. The
+                best prompt and the parents are chosen among the candidates within
+                the limits, as long as there is one (default: no limits)
+            objective_weights: Score penalty per unit of cost used to choose the best
+                prompt, e.g. {"prompt_tokens": 0.0005} (default: the best score wins)
         """
+        if parallel_rollouts < 1:
+            raise ValueError("parallel_rollouts must be at least 1")
+        if validation_chunk_size is not None and validation_chunk_size < 1:
+            raise ValueError("validation_chunk_size must be at least 1")
+        if racing_confidence is not None and not 0.0 < racing_confidence < 1.0:
+            raise ValueError("racing_confidence must be between 0 and 1")
+        if checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be at least 1")
+        if dedup_threshold is not None and not 0.0 < dedup_threshold <= 1.0:
+            raise ValueError("dedup_threshold must be between 0 and 1")
+        if mutation_fanout < 1:
+            raise ValueError("mutation_fanout must be at least 1")
+        for name in [*objectives, *(objective_limits or {}), *(objective_weights or {})]:
+            if name not in COST_OBJECTIVES:
+                raise ValueError(f"Unknown objective {name!r}, expected one of {', '.join(COST_OBJECTIVES)}")
+
         self.max_merges = max_merges
         self.minibatch_size = minibatch_size
+        self.parallel_rollouts = parallel_rollouts
+        self.rng = random.Random(seed)
+        self.validation_chunk_size = validation_chunk_size
+        self.racing_confidence = racing_confidence
+        self.validations_stopped_early = 0
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
         self.total_merges_tested = 0
         self.merges_scheduled = 0
         self.last_mutation_succeeded = False
+        self.dedup_threshold = dedup_threshold
+        self.duplicate_mutations_skipped = 0
+        self.duplicate_merges_skipped = 0
+        self.mutation_fanout = mutation_fanout
+        self.children_generated = 0
+        self.objectives = tuple(objectives)
+        self.objective_limits = dict(objective_limits or {})
+        self.objective_weights = dict(objective_weights or {})
+        self._budget = None
+        self._prompt_index = None
 
     def optimize(
         self,
         base_prompt: str,
-        train_sentences: list[str],  # Training set for minibatch mutation
-        val_sentences: list[str],    # Validation set for Pareto fronts
+        train_sentences: Sequence[str],  # Training set for minibatch mutation
+        val_sentences: Sequence[str],    # Validation set for Pareto fronts
         evaluator,
         mutator,
         merger,
-        rollouts_budget: int,
+        rollouts_budget: int = None,
+        resume: bool = False,
+        budget=None,
     ) -> str:
         """
         Optimize a prompt using GEPA algorithm with mutation and merge.
 
         Args:
             base_prompt: Starting prompt string
-            train_sentences: Training sentences for minibatch-based mutation
-            val_sentences: Validation sentences for Pareto front tracking
+            train_sentences: Training sentences for minibatch-based mutation. Any
+                sequence with O(1) indexing works, e.g. a JsonlDataset
+            val_sentences: Validation sentences for Pareto front tracking (list or dataset)
             evaluator: Evaluator with evaluate_per_sentence() and evaluate_with_traces()
             mutator: Mutator with mutate() method
             merger: Merger with merge() method
-            rollouts_budget: Number of optimization iterations
+            rollouts_budget: Number of optimization iterations, None to run until
+                the budget is spent
+            resume: Continue from checkpoint_path if it exists. With deterministic
+                (e.g. cached) LLM responses, the result matches an uninterrupted run
+            budget: Optional Budget limiting LLM calls, tokens, dollars or seconds.
+                No rollout or validation is started when the remaining budget cannot
+                cover its estimated cost, and the best prompt found so far is returned.
+                Spend is restored from the checkpoint on resume
 
         Returns:
             Best prompt string found
         """
-        # Evaluate base prompt on validation set
+        if rollouts_budget is None and budget is None:
+            raise ValueError("optimize() needs a rollouts_budget, a budget or both")
+
         self._log_header("GEPA Prompt Optimization")
-        self._log_prompt("Starting with Base Prompt", base_prompt)
 
-        base_val_subscores = evaluator.evaluate_per_sentence(base_prompt, val_sentences, desc="validation")
-        base_score = sum(base_val_subscores) / len(base_val_subscores)
+        state = None
+        if resume:
+            if self.checkpoint_path is None:
+                raise ValueError("resume=True requires a checkpoint_path")
+            state = load_checkpoint(self.checkpoint_path)
+
+        self._budget = budget
+        if budget is not None:
+            if state is not None and state.get("budget") is not None:
+                budget.load_state_dict(state["budget"])
+            budget.start()
+
+        executor = ThreadPoolExecutor(max_workers=self.parallel_rollouts) if self.parallel_rollouts > 1 else None
+        try:
+            if state is not None:
+                pareto_helper = self._restore_state(state, base_prompt, val_sentences, evaluator)
+                rollout = state["rollouts_completed"]
+                self._log_info(f"Resumed from {self.checkpoint_path} after {rollout} completed rollouts")
+                self._log_pareto_front(pareto_helper)
+            else:
+                # Evaluate base prompt on validation set
+                self._log_prompt("Starting with Base Prompt", base_prompt)
+
+                with tags(rollout=0), get_instrumentation().span("validation"), self._budget_phase("validation"):
+                    base_val_subscores = evaluator.evaluate_per_sentence(base_prompt, val_sentences, desc="validation")
+                base_score = sum(base_val_subscores) / len(base_val_subscores)
+
+                # Initialize Pareto helper with evaluated base prompt
+                pareto_helper = ParetoHelper(
+                    base_prompt,
+                    val_sentences,
+                    base_val_subscores,
+                    rng=self.rng,
+                    base_costs=self._prompt_costs(base_prompt, evaluator),
+                    **self._pareto_options(),
+                )
+                rollout = 0
+
+                self._log_info(f"Base prompt validation score: {base_score:.3f}")
+                self._log_pareto_front(pareto_helper)
 
-        # Initialize Pareto helper with evaluated base prompt
-        pareto_helper = ParetoHelper(base_prompt, val_sentences, base_val_subscores)
+            if self.dedup_threshold is not None:
+                self._prompt_index = NearDuplicateIndex(threshold=self.dedup_threshold)
+                indexed = state.get("prompt_index") if state is not None else None
+                if indexed is None:
+                    indexed = [[idx, prompt] for idx, prompt in enumerate(pareto_helper.prompt_candidates)]
+                for key, prompt in indexed:
+                    self._prompt_index.add(prompt, key)
+
+            waves_completed = 0
+            checkpointed = rollout
+            while (rollouts_budget is None or rollout < rollouts_budget) and self._budget_allows_rollout():
+                if rollouts_budget is None:
+                    wave_size = self.parallel_rollouts
+                    total = ""
+                else:
+                    wave_size = min(self.parallel_rollouts, rollouts_budget - rollout)
+                    total = f"/{rollouts_budget}"
+                if wave_size == 1:
+                    self._log_section(f"Iteration {rollout + 1}{total}")
+                else:
+                    self._log_section(f"Iterations {rollout + 1}-{rollout + wave_size}{total} (parallel)")
+
+                # Plan every rollout of the wave from the current Pareto state
+                plans = self._plan_rollouts(pareto_helper, train_sentences, rollout, wave_size)
+
+                # Run the LLM-heavy part of the rollouts concurrently
+                run = lambda plan: self._execute_rollout(plan, evaluator, mutator, merger, val_sentences)
+                outcomes = [run(plans[0])] if executor is None else list(executor.map(bind_context(run), plans))
+
+                # Apply the results one by one, in rollout order
+                for plan, outcome in zip(plans, outcomes):
+                    self._commit_rollout(plan, outcome, pareto_helper)
+
+                rollout += wave_size
+                waves_completed += 1
+
+                if self.checkpoint_path is not None and (
+                    waves_completed % self.checkpoint_every == 0 or rollout == rollouts_budget
+                ):
+                    save_checkpoint(self.checkpoint_path, self._state_dict(pareto_helper, rollout, val_sentences, evaluator))
+                    checkpointed = rollout
+
+            if self.checkpoint_path is not None and checkpointed != rollout:
+                # Stopped by the budget between two checkpoints
+                save_checkpoint(self.checkpoint_path, self._state_dict(pareto_helper, rollout, val_sentences, evaluator))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if budget is not None:
+                budget.stop()
+            self._budget = None
 
-        self._log_info(f"Base prompt validation score: {base_score:.3f}")
-        self._log_pareto_front(pareto_helper)
+        # Final summary
+        best_idx = pareto_helper.best_index()
+        best_prompt = pareto_helper.prompt_candidates[best_idx]
+        best_score = pareto_helper.per_prompt_scores[best_idx]
+        self._log_header("Optimization Complete")
+        self._log_prompt("Best Prompt Found", best_prompt, best_score)
+        if self._cost_names():
+            self._log_info(f"Best prompt costs: {self._describe_costs(pareto_helper.costs[best_idx])}")
+        self._log_info(f"Total prompts explored: {len(pareto_helper.prompt_candidates)}")
+        self._log_info(f"Total merges performed: {self.total_merges_tested}")
+        if self.validation_chunk_size is not None:
+            self._log_info(f"Validations stopped early: {self.validations_stopped_early}")
+        if budget is not None:
+            self._log_info(f"Budget spent: {budget.describe()}")
+        if self.dedup_threshold is not None:
+            self._log_info(
+                f"Near-duplicates skipped: {self.duplicate_mutations_skipped} mutations, "
+                f"{self.duplicate_merges_skipped} merges"
+            )
+        if self.mutation_fanout > 1:
+            self._log_info(f"Mutated prompts generated: {self.children_generated} ({self.mutation_fanout} per mutation)")
+
+        score_store = getattr(evaluator, "score_store", None)
+        if score_store is not None:
+            stats = score_store.stats()
+            self._log_info(
+                f"Score store: {stats['hits']} reused evaluations "
+                f"({stats['model_calls_saved']} model calls, {stats['judge_calls_saved']} judge calls saved)"
+            )
+
+        return best_prompt
+
+    @staticmethod
+    def _fingerprint(base_prompt, val_sentences):
+        """Hash identifying the problem a checkpoint belongs to."""
+        # Large datasets identify themselves without being read
+        sentences = getattr(val_sentences, "fingerprint", None) or list(val_sentences)
+        payload = json.dumps([base_prompt, sentences], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _state_dict(self, pareto_helper, rollouts_completed, val_sentences, evaluator):
+        """Full optimizer state after a completed wave of rollouts, with the evaluator's score store."""
+        version, internal_state, gauss_next = self.rng.getstate()
+        score_store = getattr(evaluator, "score_store", None)
+        return {
+            "fingerprint": self._fingerprint(pareto_helper.prompt_candidates[0], val_sentences),
+            "rollouts_completed": rollouts_completed,
+            "total_merges_tested": self.total_merges_tested,
+            "merges_scheduled": self.merges_scheduled,
+            "last_mutation_succeeded": self.last_mutation_succeeded,
+            "validations_stopped_early": self.validations_stopped_early,
+            "rng_state": [version, list(internal_state), gauss_next],
+            "pareto_helper": pareto_helper.state_dict(),
+            "budget": self._budget.state_dict() if self._budget is not None else None,
+            "duplicate_mutations_skipped": self.duplicate_mutations_skipped,
+            "duplicate_merges_skipped": self.duplicate_merges_skipped,
+            "children_generated": self.children_generated,
+            "prompt_index": (
+                [list(entry) for entry in zip(self._prompt_index.keys, self._prompt_index.prompts)]
+                if self._prompt_index is not None else None
+            ),
+            # Reused traces decide which sentences are evaluated and so how requests are batched
+            "score_store": score_store.state_dict() if score_store is not None else None,
+        }
+
+    def _restore_state(self, state, base_prompt, val_sentences, evaluator):
+        """Restore the optimizer and the evaluator's score store from _state_dict() output and return its ParetoHelper."""
+        if state["fingerprint"] != self._fingerprint(base_prompt, val_sentences):
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} was written for a different base prompt or validation set"
+            )
+
+        version, internal_state, gauss_next = state["rng_state"]
+        self.rng.setstate((version, tuple(internal_state), gauss_next))
+        self.total_merges_tested = state["total_merges_tested"]
+        self.merges_scheduled = state["merges_scheduled"]
+        self.last_mutation_succeeded = state["last_mutation_succeeded"]
+        self.validations_stopped_early = state["validations_stopped_early"]
+        self.duplicate_mutations_skipped = state.get("duplicate_mutations_skipped", 0)
+        self.duplicate_merges_skipped = state.get("duplicate_merges_skipped", 0)
+        self.children_generated = state.get("children_generated", 0)
+
+        score_store = getattr(evaluator, "score_store", None)
+        if score_store is not None and state.get("score_store") is not None:
+            score_store.load_state_dict(state["score_store"])
+
+        return ParetoHelper.from_state_dict(
+            state["pareto_helper"], val_sentences, rng=self.rng, **self._pareto_options()
+        )
+
+    def _pareto_options(self):
+        """Cost settings of the ParetoHelper."""
+        return {
+            "objectives": self.objectives,
+            "cost_limits": self.objective_limits,
+            "cost_weights": self.objective_weights,
+        }
+
+    def _cost_names(self):
+        """Names of the costs used as objectives, limits or weights, in COST_OBJECTIVES order."""
+        used = {*self.objectives, *self.objective_limits, *self.objective_weights}
+        return [name for name in COST_OBJECTIVES if name in used]
+
+    def _prompt_costs(self, prompt, evaluator):
+        """
+        Costs of a validated prompt.
+
+        Returns:
+            Dict with the used costs; output_tokens and latency are None when the
+            evaluator did not measure them
+        """
+        costs = {}
+        for name in self._cost_names():
+            if name == "prompt_tokens":
+                costs[name] = estimate_tokens(prompt)
+            elif name == "output_tokens":
+                measure = getattr(evaluator, "output_tokens", None)
+                costs[name] = measure(prompt) if measure is not None else None
+            elif name == "latency":
+                measure = getattr(evaluator, "sanitize_latency", None)
+                costs[name] = measure(prompt) if measure is not None else None
+        return costs
+
+    @staticmethod
+    def _describe_costs(costs):
+        parts = []
+        if costs.get("prompt_tokens") is not None:
+            parts.append(f"{costs['prompt_tokens']} tokens")
+        if costs.get("output_tokens") is not None:
+            parts.append(f"{costs['output_tokens']:.1f} output tokens/sentence")
+        if costs.get("latency") is not None:
+            parts.append(f"{costs['latency'] * 1000:.1f} ms/sentence")
+        return ", ".join(parts) or "unknown"
+
+    def _budget_phase(self, name, reservation=None):
+        """Account the LLM calls of the block to a budget phase, if a budget is set."""
+        if self._budget is None:
+            return nullcontext()
+        return self._budget.phase(name, reservation)
+
+    def _reserve_budget(self, name, tag, description):
+        """
+        Reserve the estimated cost of a budget phase before starting it.
+
+        Returns:
+            Reservation for _budget_phase(), or None if the remaining budget cannot cover it
+        """
+        if self._budget is None:
+            return {}
+        reservation = self._budget.reserve(name)
+        if reservation is None:
+            self._log_info(f"{tag}💸 {description} skipped (not enough budget left)")
+        return reservation
+
+    def _budget_allows_rollout(self):
+        """Whether the budget can cover the minibatch part of another rollout."""
+        if self._budget is None:
+            return True
+        if self._budget.exhausted():
+            self._log_info(f"💸 Budget exhausted ({self._budget.describe()})")
+            return False
+        if not self._budget.can_afford("minibatch"):
+            self._log_info(f"💸 Remaining budget cannot cover another rollout ({self._budget.describe()})")
+            return False
+        return True
+
+    def _plan_rollouts(self, pareto_helper, train_sentences, first_rollout, wave_size):
+        """
+        Decide what each rollout of a wave does, without calling the LLM.
+
+        All random choices are made here, on the calling thread and in rollout
+        order, which keeps parallel runs reproducible.
+
+        Returns:
+            List of rollout plans
+        """
+        # Merge bookkeeping as it would be if every planned merge succeeded
+        schedule = {
+            "merges_scheduled": self.merges_scheduled,
+            "last_mutation_succeeded": self.last_mutation_succeeded,
+            "total_merges_tested": self.total_merges_tested,
+        }
+
+        plans = []
+        for rollout in range(first_rollout, first_rollout + wave_size):
+            tag = f"[rollout {rollout + 1}] " if wave_size > 1 else ""
 
-        for rollout in range(rollouts_budget):
-            self._log_section(f"Iteration {rollout + 1}/{rollouts_budget}")
             # Step 1: Try merge first if scheduled and last mutation succeeded
-            if self._merge_prompts_if_relevant(pareto_helper, evaluator, merger, val_sentences):
-                continue  # Skip mutation this iteration
+            plan = self._merge_prompts_if_relevant(pareto_helper, schedule, tag)
+            if plan is not None:
+                # Keep a mutation ready in case the merge produces nothing
+                plan["fallback"] = self._plan_mutation(pareto_helper, train_sentences, tag)
+            else:
+                # Step 2: Mutation. Its outcome is unknown until it runs, so no
+                # merge is planned after it in the same wave
+                schedule["last_mutation_succeeded"] = False
+                plan = self._plan_mutation(pareto_helper, train_sentences, tag)
+
+            plan["rollout"] = rollout
+            plan["wave"] = first_rollout
+            plans.append(plan)
+
+        return plans
+
+    def _plan_mutation(self, pareto_helper, train_sentences, tag):
+        """Select a parent and sample the training minibatch for a mutation."""
+        parent_idx, parent_prompt = pareto_helper.select_pareto_candidate()
+        self._log_info(f"{tag}Selected parent prompt [{parent_idx}] from Pareto front")
+
+        # Sample MINIBATCH from TRAIN set
+        minibatch = self.rng.sample(train_sentences, min(self.minibatch_size, len(train_sentences)))
+        self._log_info(f"{tag}Sampled {len(minibatch)} training examples for mutation")
+
+        plan = {
+            "kind": "mutation",
+            "tag": tag,
+            "parent_idx": parent_idx,
+            "parent_prompt": parent_prompt,
+            "minibatch": minibatch,
+        }
+
+        if self.validation_chunk_size is not None:
+            # Racing compares against the Pareto state the rollout was planned from
+            num_val = len(pareto_helper.pareto_front_sentences)
+            plan["validation_order"] = self.rng.sample(range(num_val), num_val)
+            plan["front_scores"] = list(pareto_helper.pareto_front_sentences)
+            plan["best_score"] = pareto_helper.per_prompt_scores[pareto_helper.best_index()]
+            if self.objectives:
+                plan["candidate_costs"] = list(zip(pareto_helper.per_prompt_scores, pareto_helper.costs))
+
+        return plan
+
+    def _merge_prompts_if_relevant(self, pareto_helper, schedule, tag):
+        """
+        Plan a merge of two prompts from the Pareto front if conditions are met.
 
-            # Reset flag before mutation
-            self.last_mutation_succeeded = False
+        Args:
+            pareto_helper: Current Pareto state
+            schedule: Merge bookkeeping of the wave being planned, updated in place
+            tag: Prefix for log messages
 
-            # Step 2: Mutation
-            parent_idx, parent_prompt = pareto_helper.select_pareto_candidate()
-            self._log_info(f"Selected parent prompt [{parent_idx}] from Pareto front")
+        Returns:
+            Merge plan, or None if no merge should be attempted
+        """
+        if not (schedule["merges_scheduled"] > 0 and
+                schedule["last_mutation_succeeded"] and
+                schedule["total_merges_tested"] < self.max_merges):
+            return None
 
-            # Sample MINIBATCH from TRAIN set
-            minibatch = random.sample(train_sentences, min(self.minibatch_size, len(train_sentences)))
-            self._log_info(f"Sampled {len(minibatch)} training examples for mutation")
+        self._log_info(f"{tag}🔀 Attempting merge...")
 
+        # Get two candidates from Pareto front
+        prompt1_idx, prompt1 = pareto_helper.select_pareto_candidate()
+        prompt2_idx, prompt2 = pareto_helper.select_pareto_candidate()
+
+        if prompt1_idx == prompt2_idx:
+            self._log_info(f"{tag}❌ Merge skipped (same prompt selected twice)")
+            return None
+
+        if self._prompt_index is not None:
+            similarity = self._prompt_index.similarity(prompt1, prompt2)
+            if similarity >= self.dedup_threshold:
+                self.duplicate_merges_skipped += 1
+                self._log_info(
+                    f"{tag}❌ Merge skipped (prompts [{prompt1_idx}] and [{prompt2_idx}] "
+                    f"are near-duplicates, similarity {similarity:.2f})"
+                )
+                return None
+
+        self._log_info(f"{tag}Merging prompts [{prompt1_idx}] and [{prompt2_idx}]")
+        schedule["merges_scheduled"] -= 1
+        schedule["total_merges_tested"] += 1
+
+        return {
+            "kind": "merge",
+            "tag": tag,
+            "prompt1": prompt1,
+            "prompt2": prompt2,
+        }
+
+    def _execute_rollout(self, plan, evaluator, mutator, merger, val_sentences):
+        """
+        Run the LLM calls of a planned rollout. Does not touch shared state.
+
+        Returns:
+            Outcome dict consumed by _commit_rollout()
+        """
+        # The wave tag lets a shared ScoreStore hide results of concurrent rollouts
+        with tags(rollout=plan["rollout"] + 1, wave=plan["wave"] + 1):
+            if plan["kind"] == "merge":
+                return self._execute_merge(plan, evaluator, mutator, merger, val_sentences)
+            return self._execute_mutation(plan, evaluator, mutator, val_sentences)
+
+    def _execute_merge(self, plan, evaluator, mutator, merger, val_sentences):
+        """Merge the planned prompts and validate the result, or fall back to a mutation."""
+        tag = plan["tag"]
+        instrumentation = get_instrumentation()
+
+        # A merged prompt is only worth generating if it can be validated
+        reservation = self._reserve_budget("validation", tag, "Merge")
+        if reservation is None:
+            return self._execute_mutation(plan["fallback"], evaluator, mutator, val_sentences)
+
+        # Merge the two prompts
+        print(f"  {tag}Generating merged prompt using LLM...")
+        with instrumentation.span("merge"), self._budget_phase("merge"):
+            merged_prompt = merger.merge(plan["prompt1"], plan["prompt2"])
+
+        duplicate = self._find_duplicate(merged_prompt) if merged_prompt is not None else None
+        if duplicate is not None:
+            self._log_info(f"{tag}❌ Merged prompt rejected (near-duplicate of {self._describe_duplicate(duplicate)})")
+        elif merged_prompt is not None:
+            # Evaluate merged prompt on VALIDATION set
+            with instrumentation.span("validation"), self._budget_phase("validation", reservation):
+                merged_subscores = evaluator.evaluate_per_sentence(merged_prompt, val_sentences, desc="validation")
+            return {
+                "kind": "merge",
+                "prompt": merged_prompt,
+                "subscores": merged_subscores,
+                "costs": self._prompt_costs(merged_prompt, evaluator),
+            }
+
+        if self._budget is not None:
+            self._budget.release(reservation)
+
+        if duplicate is None:
+            self._log_info(f"{tag}❌ Merge failed (prompts too similar)")
+        outcome = self._execute_mutation(plan["fallback"], evaluator, mutator, val_sentences)
+        outcome["merge_failed"] = True
+        outcome["merge_duplicate"] = duplicate is not None
+        return outcome
+
+    def _execute_mutation(self, plan, evaluator, mutator, val_sentences):
+        """Mutate the planned parent, test the child on the minibatch and validate it if it wins."""
+        tag = plan["tag"]
+        instrumentation = get_instrumentation()
+        parent_prompt = plan["parent_prompt"]
+        minibatch = plan["minibatch"]
+
+        reservation = self._reserve_budget("minibatch", tag, "Rollout")
+        if reservation is None:
+            return {"kind": "mutation", "prompt": None, "subscores": None, "budget_skipped": True}
+
+        with self._budget_phase("minibatch", reservation):
             # Evaluate parent on minibatch with traces
-            parent_eval = evaluator.evaluate_with_traces(parent_prompt, minibatch, desc="train minibatch")
+            with instrumentation.span("minibatch_evaluation"):
+                parent_eval = evaluator.evaluate_with_traces(parent_prompt, minibatch, desc="train minibatch")
             parent_minibatch_score = sum(parent_eval['scores'])
 
-            # Mutate based on evaluation results
-            self._log_info("Generating mutated prompt")
-            child_prompt = mutator.mutate(parent_prompt, parent_eval)
-            self._log_info("Mutated prompt generated!")
+            if self.mutation_fanout > 1:
+                raced = self._race_children(plan, evaluator, mutator, parent_eval, parent_minibatch_score)
+                if "prompt" not in raced:
+                    return {"kind": "mutation", "prompt": None, "subscores": None, **raced}
+                child_prompt = raced["prompt"]
+                child_minibatch_score, num_evaluated = raced["score"], raced["num_evaluated"]
+            else:
+                # Mutate based on evaluation results
+                self._log_info(f"{tag}Generating mutated prompt")
+                with instrumentation.span("mutation"):
+                    child_prompt = mutator.mutate(parent_prompt, parent_eval)
+                self._log_info(f"{tag}Mutated prompt generated!")
+
+                # A near-verbatim rewrite would only repeat evaluations already paid for
+                duplicate = self._find_duplicate(child_prompt)
+                if duplicate is not None:
+                    return {
+                        "kind": "mutation",
+                        "prompt": child_prompt,
+                        "subscores": None,
+                        "duplicate_of": duplicate,
+                        "children": 1,
+                    }
+
+                # Evaluate child on SAME minibatch (quick check)
+                with instrumentation.span("minibatch_evaluation"):
+                    child_minibatch_score, num_evaluated = self._evaluate_child_on_minibatch(
+                        evaluator, child_prompt, minibatch, parent_minibatch_score
+                    )
+                raced = {"children": 1}
+
+        if num_evaluated < len(minibatch):
+            self._log_info(
+                f"{tag}Minibatch scores - Parent: {parent_minibatch_score:.3f}, "
+                f"Child: {child_minibatch_score:.3f} after {num_evaluated}/{len(minibatch)} sentences "
+                "(cannot catch up, stopped early)"
+            )
+        else:
+            self._log_info(
+                f"{tag}Minibatch scores - Parent: {parent_minibatch_score:.3f}, Child: {child_minibatch_score:.3f}"
+            )
+
+        outcome = {"kind": "mutation", "prompt": child_prompt, "subscores": None, "children": raced["children"]}
+        if raced.get("losers"):
+            outcome["losers"] = raced["losers"]
+
+        # Check if mutation improved on minibatch
+        if child_minibatch_score > parent_minibatch_score:
+            # SUCCESS on minibatch! Now do full VALIDATION evaluation
+            reservation = self._reserve_budget("validation", tag, "Validation")
+            if reservation is None:
+                outcome["budget_skipped"] = True
+                return outcome
+
+            self._log_info(f"{tag}✨ Mutation improved on minibatch! Evaluating on validation set...")
+            with instrumentation.span("validation"), self._budget_phase("validation", reservation):
+                if self.validation_chunk_size is None:
+                    outcome["subscores"] = evaluator.evaluate_per_sentence(
+                        child_prompt, val_sentences, desc="validation"
+                    )
+                else:
+                    outcome["subscores"], outcome["partial_subscores"] = self._race_validation(
+                        plan, evaluator, child_prompt, val_sentences
+                    )
+            if outcome["subscores"] is not None:
+                outcome["costs"] = self._prompt_costs(child_prompt, evaluator)
+
+        return outcome
+
+    def _race_children(self, plan, evaluator, mutator, parent_eval, parent_minibatch_score):
+        """
+        Propose mutation_fanout children and race them on the parent's minibatch.
 
-            # Evaluate child on SAME minibatch (quick check)
-            child_eval = evaluator.evaluate_with_traces(child_prompt, minibatch, desc="train minibatch")
-            child_minibatch_score = sum(child_eval['scores'])
+        Successive halving: in each round the surviving children are scored on
+        the next chunk of minibatch sentences and the better half (by total score
+        so far) moves on. Children that can no longer beat the parent even with
+        perfect scores on the rest are dropped. The last child standing finishes
+        the minibatch.
 
-            self._log_info(f"Minibatch scores - Parent: {parent_minibatch_score:.3f}, Child: {child_minibatch_score:.3f}")
+        Returns:
+            Dict with the winner's prompt, score and num_evaluated, the losing
+            prompts and the number of children; or, when no child is worth
+            evaluating, a dict with duplicate_of (or an empty one) and no prompt
+        """
+        tag = plan["tag"]
+        minibatch = plan["minibatch"]
+        instrumentation = get_instrumentation()
+
+        self._log_info(f"{tag}Generating {self.mutation_fanout} mutated prompts")
+        with instrumentation.span("mutation"):
+            proposals = mutator.mutate_many(plan["parent_prompt"], parent_eval, self.mutation_fanout)
+
+        # Drop exact copies and near-duplicates of already evaluated prompts
+        children, duplicate = [], None
+        for proposal in proposals:
+            found = self._find_duplicate(proposal)
+            if found is not None:
+                duplicate = duplicate or found
+            elif proposal not in children:
+                children.append(proposal)
+        self._log_info(f"{tag}{len(children)} distinct mutated prompts generated!")
+        if not children:
+            return {"duplicate_of": duplicate, "children": len(proposals)}
+
+        scores = [0.0] * len(children)
+        alive = list(range(len(children)))
+        evaluated = 0
+        rounds = math.ceil(math.log2(len(children)))
+        chunk_size = max(1, len(minibatch) // (rounds + 1)) if rounds else 0
+
+        def score_chunk(child_idx, chunk):
+            traces = evaluator.evaluate_with_traces(children[child_idx], chunk, desc="train minibatch race")
+            return sum(traces["scores"])
+
+        with instrumentation.span("minibatch_evaluation"), ThreadPoolExecutor(max_workers=len(children)) as pool:
+            while len(alive) > 1 and evaluated < len(minibatch):
+                chunk = minibatch[evaluated:evaluated + chunk_size]
+                for child_idx, score in zip(alive, pool.map(bind_context(lambda idx: score_chunk(idx, chunk)), alive)):
+                    scores[child_idx] += score
+                evaluated += len(chunk)
+
+                remaining = len(minibatch) - evaluated
+                contenders = [idx for idx in alive if scores[idx] + remaining > parent_minibatch_score]
+                ranked = sorted(contenders, key=lambda idx: -scores[idx])
+                alive = ranked[:max(1, math.ceil(len(alive) / 2))] if ranked else []
+                self._log_info(
+                    f"{tag}🏇 Race after {evaluated}/{len(minibatch)} sentences: "
+                    f"{len(alive)} of {len(children)} children left"
+                )
+
+        losers = [children[idx] for idx in range(len(children)) if idx not in alive[:1]]
+        if not alive:
+            # Every child fell too far behind the parent
+            best = max(range(len(children)), key=lambda idx: scores[idx])
+            losers.remove(children[best])
+            return {"prompt": children[best], "score": scores[best], "num_evaluated": evaluated,
+                    "losers": losers, "children": len(proposals)}
+
+        winner = alive[0]
+        with instrumentation.span("minibatch_evaluation"):
+            rest_score, rest_evaluated = self._evaluate_child_on_minibatch(
+                evaluator, children[winner], minibatch[evaluated:], parent_minibatch_score - scores[winner]
+            ) if evaluated < len(minibatch) else (0.0, 0)
+
+        return {
+            "prompt": children[winner],
+            "score": scores[winner] + rest_score,
+            "num_evaluated": evaluated + rest_evaluated,
+            "losers": losers,
+            "children": len(proposals),
+        }
+
+    def _find_duplicate(self, prompt):
+        """
+        Look up an already evaluated prompt that prompt is a near-duplicate of.
 
-            # Check if mutation improved on minibatch
-            if child_minibatch_score > parent_minibatch_score:
-                # SUCCESS on minibatch! Now do full VALIDATION evaluation
-                self._log_info("✨ Mutation improved on minibatch! Evaluating on validation set...")
-                child_val_subscores = evaluator.evaluate_per_sentence(child_prompt, val_sentences, desc="validation")
-                child_val_score = sum(child_val_subscores) / len(child_val_subscores)
+        Returns:
+            Tuple of (candidate index or None for a rejected prompt, similarity),
+            or None if deduplication is off or nothing similar was evaluated
+        """
+        if self._prompt_index is None:
+            return None
+        return self._prompt_index.find(prompt)
+
+    @staticmethod
+    def _describe_duplicate(duplicate):
+        key, similarity = duplicate
+        target = f"prompt [{key}]" if key is not None else "a rejected prompt"
+        return f"{target}, similarity {similarity:.2f}"
+
+    def _index_prompt(self, prompt, key=None):
+        """Remember an evaluated prompt for near-duplicate detection."""
+        if self._prompt_index is not None:
+            self._prompt_index.add(prompt, key)
+
+    def _race_validation(self, plan, evaluator, prompt, val_sentences):
+        """
+        Validate a prompt chunk by chunk, stopping once it is out of the running.
 
-                pareto_helper.update_with_new_prompt(child_prompt, child_val_subscores)
-                self._log_prompt("Accepted New Prompt", child_prompt, child_val_score)
-                self._log_pareto_front(pareto_helper)
+        A prompt stays in the race while it beats the Pareto front on an evaluated
+        sentence, or while an upper bound on its final validation score is at
+        least the best candidate's score. Ties alone don't keep it in the race: a
+        prompt that only ties is dominated on every front it would join.
 
-                # Schedule merge for next iteration
-                self.last_mutation_succeeded = True
-                if self.total_merges_tested < self.max_merges:
-                    self.merges_scheduled += 1
-                    self._log_info("📅 Merge scheduled for next iteration")
-            else:
-                self._log_info("❌ Mutation rejected (no improvement on minibatch)")
+        Returns:
+            Tuple of (full subscores or None, {sentence_idx: score} if stopped early or None)
+        """
+        order = plan["validation_order"]
+        front_scores = plan["front_scores"]
+        best_score = self._race_best_score(plan, prompt)
+        num_val = len(order)
+
+        partial = {}
+        beats_front = False
+        for start in range(0, num_val, self.validation_chunk_size):
+            chunk = order[start:start + self.validation_chunk_size]
+            chunk_scores = evaluator.evaluate_per_sentence(
+                prompt, [val_sentences[idx] for idx in chunk], desc="validation chunk"
+            )
+            for idx, score in zip(chunk, chunk_scores):
+                partial[idx] = score
+                beats_front = beats_front or score > front_scores[idx]
+
+            remaining = num_val - len(partial)
+            if beats_front or remaining == 0:
+                continue
+
+            if self._validation_upper_bound(partial, remaining) < best_score:
+                self._log_info(
+                    f"{plan['tag']}🏁 Validation stopped after {len(partial)}/{num_val} sentences "
+                    f"(partial score {sum(partial.values()) / len(partial):.3f}, best {best_score:.3f})"
+                )
+                return None, partial
+
+        return [partial[idx] for idx in range(num_val)], None
+
+    def _race_best_score(self, plan, prompt):
+        """
+        Score a validated prompt must be able to beat to stay in the race.
 
-        # Final summary
-        best_prompt = pareto_helper.best_candidate()
-        best_score = max(pareto_helper.per_prompt_scores)
-        self._log_header("Optimization Complete")
-        self._log_prompt("Best Prompt Found", best_prompt, best_score)
-        self._log_info(f"Total prompts explored: {len(pareto_helper.prompt_candidates)}")
-        self._log_info(f"Total merges performed: {self.total_merges_tested}")
+        With cost objectives, a prompt that cannot beat the best score may still
+        be on the score/cost trade-off front, so only candidates costing no more
+        on every objective are compared with. A cost that is not known before
+        validation (output tokens, latency) makes every candidate incomparable.
+        """
+        if not self.objectives:
+            return plan["best_score"]
+
+        costs = {"prompt_tokens": estimate_tokens(prompt)}
+        if any(costs.get(name) is None for name in self.objectives):
+            return -math.inf
+        cheaper = [
+            score for score, candidate_costs in plan["candidate_costs"]
+            if all(candidate_costs.get(name) is not None and candidate_costs[name] <= costs[name]
+                   for name in self.objectives)
+        ]
+        return max(cheaper, default=-math.inf)
+
+    def _validation_upper_bound(self, partial, remaining):
+        """Upper bound on the final mean validation score given the evaluated sentences."""
+        evaluated = len(partial)
+        total = sum(partial.values())
+
+        if self.racing_confidence is None:
+            # Provable: every remaining sentence scores the maximum of 1.0
+            remaining_mean = 1.0
+        else:
+            # Hoeffding bound on the mean score of the unevaluated sentences
+            slack = math.sqrt(math.log(1.0 / (1.0 - self.racing_confidence)) / (2 * evaluated))
+            remaining_mean = min(1.0, total / evaluated + slack)
+
+        return (total + remaining * remaining_mean) / (evaluated + remaining)
+
+    def _commit_rollout(self, plan, outcome, pareto_helper):
+        """Apply the outcome of a rollout to the Pareto fronts and the merge schedule."""
+        tag = plan["tag"]
+
+        if outcome["kind"] == "merge":
+            merged_prompt = outcome["prompt"]
+            merged_subscores = outcome["subscores"]
+            merged_score = sum(merged_subscores) / len(merged_subscores)
+
+            # Update Pareto fronts with merged prompt
+            pareto_helper.update_with_new_prompt(merged_prompt, merged_subscores, costs=outcome.get("costs"))
+            self._index_prompt(merged_prompt, pareto_helper.num_candidates - 1)
+            self.merges_scheduled -= 1
+            self.total_merges_tested += 1
+
+            self._log_prompt(f"{tag}✨ Merged Prompt Accepted", merged_prompt, merged_score)
+            self._log_pareto_front(pareto_helper)
+            return
+
+        # Reset flag before mutation
+        self.last_mutation_succeeded = False
 
-        return best_prompt
+        if outcome.get("merge_duplicate"):
+            self.duplicate_merges_skipped += 1
+
+        self.children_generated += outcome.get("children", 0)
+        for loser in outcome.get("losers", ()):
+            self._index_prompt(loser)
+
+        if outcome.get("duplicate_of") is not None:
+            self.duplicate_mutations_skipped += 1
+            self._log_info(
+                f"{tag}❌ Mutation rejected (near-duplicate of {self._describe_duplicate(outcome['duplicate_of'])})"
+            )
+            return
+
+        if outcome.get("partial_subscores") is not None:
+            # Record what was paid for without letting it into the Pareto fronts
+            pareto_helper.record_partial_prompt(outcome["prompt"], outcome["partial_subscores"])
+            self._index_prompt(outcome["prompt"])
+            self.validations_stopped_early += 1
+            self._log_info(f"{tag}❌ Mutation rejected (out of the running on validation)")
+            return
+
+        if outcome.get("budget_skipped"):
+            self._log_info(f"{tag}❌ Mutation not validated (budget exhausted)")
+            return
+
+        if outcome["subscores"] is None:
+            self._index_prompt(outcome["prompt"])
+            self._log_info(f"{tag}❌ Mutation rejected (no improvement on minibatch)")
+            return
+
+        child_prompt = outcome["prompt"]
+        child_val_subscores = outcome["subscores"]
+        child_val_score = sum(child_val_subscores) / len(child_val_subscores)
+
+        pareto_helper.update_with_new_prompt(child_prompt, child_val_subscores, costs=outcome.get("costs"))
+        self._index_prompt(child_prompt, pareto_helper.num_candidates - 1)
+        self._log_prompt(f"{tag}Accepted New Prompt", child_prompt, child_val_score)
+        self._log_pareto_front(pareto_helper)
+
+        # Schedule merge for next iteration
+        self.last_mutation_succeeded = True
+        if self.total_merges_tested < self.max_merges:
+            self.merges_scheduled += 1
+            self._log_info(f"{tag}📅 Merge scheduled for next iteration")
+
+    def _evaluate_child_on_minibatch(self, evaluator, child_prompt, minibatch, parent_minibatch_score):
+        """
+        Score the child on the minibatch, streaming results as they are judged.
+
+        Scores are at most 1.0 per sentence, so evaluation stops as soon as the
+        child cannot beat the parent even with perfect scores on the rest.
+
+        Returns:
+            Tuple of (child score on the evaluated sentences, number of evaluated sentences)
+        """
+        if not hasattr(evaluator, "iter_traces"):
+            child_eval = evaluator.evaluate_with_traces(child_prompt, minibatch, desc="train minibatch")
+            return sum(child_eval['scores']), len(minibatch)
+
+        print(f"  Evaluating on train minibatch set ({len(minibatch)} sentences with traces)...")
+        child_score = 0.0
+        num_evaluated = 0
+        progress = tqdm(total=len(minibatch), desc="  Train minibatch", leave=False)
+        traces = evaluator.iter_traces(child_prompt, minibatch)
+        try:
+            for _, trace in traces:
+                child_score += trace["score"]
+                num_evaluated += 1
+                progress.set_postfix(parent=f"{parent_minibatch_score:.3f}", child=f"{child_score:.3f}", refresh=False)
+                progress.update(1)
+
+                if child_score + (len(minibatch) - num_evaluated) <= parent_minibatch_score:
+                    break
+        finally:
+            traces.close()
+            progress.close()
+
+        return child_score, num_evaluated
 
     def _log_header(self, text: str):
         """Print a header log."""
@@ -140,54 +981,16 @@ class GepaOptimizer:
     def _log_pareto_front(self, pareto_helper):
         """Log the current Pareto front."""
         print(f"\n  🏆 Current Pareto Front ({len(pareto_helper.prompt_candidates)} prompts):")
+        show_costs = bool(self._cost_names())
         for idx, score in enumerate(pareto_helper.per_prompt_scores):
             # Find which sentences this prompt is Pareto-optimal on
-            pareto_sentences = [i for i, front in enumerate(pareto_helper.prompt_at_pareto_front_sentences) if idx in front]
+            pareto_sentences = pareto_helper.front_sentences(idx)
             num_sentences = len(pareto_sentences)
+            costs = f" | {self._describe_costs(pareto_helper.costs[idx])}" if show_costs else ""
 
             if num_sentences > 0:
                 sentences_str = str(pareto_sentences) if num_sentences <= 10 else f"{pareto_sentences[:10]}..."
-                print(f"     [{idx}] Score: {score:.3f} | Pareto on {num_sentences} sentences: {sentences_str}")
+                print(f"     [{idx}] Score: {score:.3f}{costs} | Pareto on {num_sentences} sentences: {sentences_str}")
             else:
-                print(f"     [{idx}] Score: {score:.3f} | Pareto on 0 sentences")
-
-    def _merge_prompts_if_relevant(self, pareto_helper, evaluator, merger, val_sentences):
-        """Try to merge two prompts from Pareto front if conditions are met."""
-        if not (self.merges_scheduled > 0 and
-                self.last_mutation_succeeded and
-                self.total_merges_tested < self.max_merges):
-            return False
-
-        self._log_info("🔀 Attempting merge...")
-
-        # Get two candidates from Pareto front
-        prompt1_idx, prompt1 = pareto_helper.select_pareto_candidate()
-        prompt2_idx, prompt2 = pareto_helper.select_pareto_candidate()
-
-        if prompt1_idx == prompt2_idx:
-            self._log_info("❌ Merge skipped (same prompt selected twice)")
-            return False
-
-        self._log_info(f"Merging prompts [{prompt1_idx}] and [{prompt2_idx}]")
-        print(f"  Generating merged prompt using LLM...")
-
-        # Merge the two prompts
-        merged_prompt = merger.merge(prompt1, prompt2)
-
-        if merged_prompt is None:
-            self._log_info("❌ Merge failed (prompts too similar)")
-            return False
-
-        # Evaluate merged prompt on VALIDATION set
-        merged_subscores = evaluator.evaluate_per_sentence(merged_prompt, val_sentences, desc="validation")
-        merged_score = sum(merged_subscores) / len(merged_subscores)
-
-        # Update Pareto fronts with merged prompt
-        pareto_helper.update_with_new_prompt(merged_prompt, merged_subscores)
-        self.merges_scheduled -= 1
-        self.total_merges_tested += 1
-
-        self._log_prompt("✨ Merged Prompt Accepted", merged_prompt, merged_score)
-        self._log_pareto_front(pareto_helper)
+                print(f"     [{idx}] Score: {score:.3f}{costs} | Pareto on 0 sentences")
 
-        return True
\ No newline at end of file
@@ -0,0 +1,266 @@
+import contextvars
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the call latency histogram, in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_tags = contextvars.ContextVar("instrumentation_tags", default={})
+
+
+def prompt_id(prompt: str) -> str:
+    """Short stable identifier of a prompt, used as candidate id."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+@contextmanager
+def tags(**values):
+    """Attach tags (stage, rollout, candidate, ...) to every call recorded inside the block."""
+    token = _tags.set({**_tags.get(), **values})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags() -> dict:
+    """Tags active in the current context."""
+    return _tags.get()
+
+
+def bind_context(func):
+    """
+    Wrap func so it runs with the caller's tags when executed on another thread.
+
+    Each call runs in its own copy of the context, so the wrapper can be used
+    for many concurrent tasks.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+
+def _new_stats() -> dict:
+    return {
+        "calls": 0,
+        "cache_hits": 0,
+        "errors": 0,
+        "retries": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "latency_seconds": 0.0,
+        "max_latency_seconds": 0.0,
+        "latency_buckets": [0] * len(LATENCY_BUCKETS),
+    }
+
+
+class Instrumentation:
+    """
+    Records per-call latency, tokens, cache hits and retries of LLM calls.
+
+    Calls are aggregated by stage (model/judge/mutate/merge), rollout and
+    candidate, taken from the tags active when the call is recorded. Spans
+    measure the wall time of optimizer steps.
+    """
+
+    enabled = True
+
+    def __init__(self, keep_records: bool = False):
+        """
+        Args:
+            keep_records: Also keep every individual call record in memory
+        """
+        self.keep_records = keep_records
+        self.records = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._by_dimension = {"stage": {}, "rollout": {}, "candidate": {}}
+        self._totals = _new_stats()
+        self._spans = {}
+
+    def add_listener(self, listener):
+        """Call listener(record) for every recorded call."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def _notify(self, record: dict):
+        for listener in list(self._listeners):
+            listener(record)
+
+    def record_call(
+        self,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0,
+        retries: int = 0,
+        cache_hit: bool = False,
+        error: bool = False,
+        model: str = None,
+    ):
+        """Record one LLM call (or cache hit) under the current tags."""
+        if not self.enabled and not self._listeners:
+            return
+
+        record = {
+            **current_tags(),
+            "latency": latency,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "retries": retries,
+            "cache_hit": cache_hit,
+            "error": error,
+            "model": model,
+        }
+
+        if not self.enabled:
+            self._notify(record)
+            return
+
+        with self._lock:
+            self._accumulate(self._totals, record)
+            for dimension, groups in self._by_dimension.items():
+                key = str(record.get(dimension, "none"))
+                self._accumulate(groups.setdefault(key, _new_stats()), record)
+            if self.keep_records:
+                self.records.append(record)
+
+        self._notify(record)
+
+    @staticmethod
+    def _accumulate(stats: dict, record: dict):
+        stats["calls"] += 1
+        stats["cache_hits"] += int(record["cache_hit"])
+        stats["errors"] += int(record["error"])
+        stats["retries"] += record["retries"]
+        stats["prompt_tokens"] += record["prompt_tokens"]
+        stats["completion_tokens"] += record["completion_tokens"]
+        stats["cached_tokens"] += record["cached_tokens"]
+        stats["latency_seconds"] += record["latency"]
+        stats["max_latency_seconds"] = max(stats["max_latency_seconds"], record["latency"])
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if record["latency"] <= bound:
+                stats["latency_buckets"][i] += 1
+                break
+
+    @contextmanager
+    def span(self, name: str):
+        """Measure the wall time of a block under the given name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                span = self._spans.setdefault(name, {"count": 0, "seconds": 0.0})
+                span["count"] += 1
+                span["seconds"] += elapsed
+
+    def summary(self) -> dict:
+        """Aggregated statistics as a JSON-serializable dict."""
+        with self._lock:
+            return json.loads(json.dumps({
+                "wall_seconds": time.time() - self.started,
+                "totals": self._totals,
+                "by_stage": self._by_dimension["stage"],
+                "by_rollout": self._by_dimension["rollout"],
+                "by_candidate": self._by_dimension["candidate"],
+                "spans": self._spans,
+                "latency_bucket_bounds": list(LATENCY_BUCKETS),
+            }))
+
+    def export_json(self, path: str):
+        """Write summary() to a JSON file."""
+        _atomic_write(path, json.dumps(self.summary(), indent=2))
+
+    def export_prometheus(self, path: str, prefix: str = "gepa"):
+        """Write per-stage metrics in the Prometheus textfile exposition format."""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+        stages = summary["by_stage"].items()
+        metric("llm_calls_total", "counter", "LLM calls, including cache hits",
+               [({"stage": stage}, stats["calls"]) for stage, stats in stages])
+        metric("llm_cache_hits_total", "counter", "LLM calls served from the response cache",
+               [({"stage": stage}, stats["cache_hits"]) for stage, stats in stages])
+        metric("llm_errors_total", "counter", "LLM calls that failed after retries",
+               [({"stage": stage}, stats["errors"]) for stage, stats in stages])
+        metric("llm_retries_total", "counter", "Retried LLM requests",
+               [({"stage": stage}, stats["retries"]) for stage, stats in stages])
+        metric("llm_tokens_total", "counter", "LLM tokens by kind",
+               [({"stage": stage, "kind": kind}, stats[f"{kind}_tokens"])
+                for stage, stats in stages for kind in ("prompt", "completion", "cached")])
+
+        histogram = []
+        for stage, stats in stages:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats["latency_buckets"]):
+                cumulative += count
+                histogram.append(({"stage": stage, "le": bound}, cumulative))
+            histogram.append(({"stage": stage, "le": "+Inf"}, stats["calls"]))
+        lines.append(f"# HELP {prefix}_llm_latency_seconds LLM call latency")
+        lines.append(f"# TYPE {prefix}_llm_latency_seconds histogram")
+        for labels, value in histogram:
+            lines.append(f'{prefix}_llm_latency_seconds_bucket{{stage="{labels["stage"]}",le="{labels["le"]}"}} {value}')
+        for stage, stats in stages:
+            lines.append(f'{prefix}_llm_latency_seconds_sum{{stage="{stage}"}} {stats["latency_seconds"]}')
+            lines.append(f'{prefix}_llm_latency_seconds_count{{stage="{stage}"}} {stats["calls"]}')
+
+        metric("span_seconds_total", "counter", "Wall time spent in optimizer steps",
+               [({"span": name}, span["seconds"]) for name, span in summary["spans"].items()])
+        metric("span_count_total", "counter", "Number of optimizer steps",
+               [({"span": name}, span["count"]) for name, span in summary["spans"].items()])
+        metric("run_wall_seconds", "gauge", "Wall time since instrumentation started",
+               [({}, summary["wall_seconds"])])
+
+        _atomic_write(path, "\n".join(lines) + "\n")
+
+
+class NullInstrumentation(Instrumentation):
+    """Instrumentation that keeps nothing; only registered listeners see calls."""
+
+    enabled = False
+
+    @contextmanager
+    def span(self, name: str):
+        yield
+
+
+def _atomic_write(path: str, text: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".metrics-", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+_instrumentation = NullInstrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    """The process-wide instrumentation (a no-op one unless set_instrumentation() was called)."""
+    return _instrumentation
+
+
+def set_instrumentation(instrumentation: Instrumentation):
+    """Install the process-wide instrumentation."""
+    global _instrumentation
+    _instrumentation = instrumentation
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from src.instrumentation import get_instrumentation
+
+
+class CachedLLMClient:
+    """LLM client wrapper that stores responses in a persistent SQLite cache."""
+
+    def __init__(
+        self,
+        llm_client,
+        path: str = ".llm_cache.sqlite",
+        max_entries: int = 100_000,
+        deterministic: bool = False,
+    ):
+        """
+        Args:
+            llm_client: LLM client with a generate(prompt: str, system: str = None) -> str method
+            path: Path of the SQLite cache file (created if missing)
+            max_entries: Maximum number of cached responses. The least recently
+                used entries are evicted once the cache grows past this size
+            deterministic: Reuse entries written by previous runs. Only enable this
+                when responses are reproducible (e.g. temperature 0), otherwise a
+                cached response stands in for a fresh sample. When disabled, only
+                entries written by this client instance are reused
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.llm_client = llm_client
+        self.path = path
+        self.max_entries = max_entries
+        self.deterministic = deterministic
+        self.run_id = uuid.uuid4().hex
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def model(self):
+        return getattr(self.llm_client, "model", None)
+
+    @property
+    def temperature(self):
+        return getattr(self.llm_client, "temperature", None)
+
+    def _make_key(self, prompt: str, system: str = None) -> str:
+        """Content address of a request: model, temperature, system message and prompt text."""
+        # Requests without a system message keep the keys of older cache files
+        request = [self.model, self.temperature, prompt]
+        if system is not None:
+            request.insert(2, system)
+        payload = json.dumps(request, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str):
+        """Return the cached response for key, or None. Must hold the lock."""
+        if self.deterministic:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        else:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND run_id = ?", (key, self.run_id)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def _store(self, key: str, response: str):
+        """Insert a response and evict least recently used entries. Must hold the lock."""
+        now = time.time()
+        exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, run_id, response, created, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, self.run_id, response, now, now),
+        )
+        if exists is None:
+            self._size += 1
+
+        if self._size > self.max_entries:
+            # Evict down to 90% of capacity so eviction isn't paid on every insert
+            excess = self._size - int(self.max_entries * 0.9)
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+            self._size -= excess
+
+    def generate(self, prompt: str, system: str = None) -> str:
+        """
+        Generate a response, serving it from the cache when possible.
+
+        Concurrent requests for the same key wait for the first one instead of
+        calling the LLM again.
+
+        Args:
+            prompt: Input prompt string
+            system: Optional system message, passed on to the wrapped client
+
+        Returns:
+            Generated text response
+        """
+        key = self._make_key(prompt, system)
+        start = time.perf_counter()
+
+        while True:
+            with self._lock:
+                cached = self._lookup(key)
+                if cached is not None:
+                    self.hits += 1
+                    get_instrumentation().record_call(time.perf_counter() - start, cache_hit=True, model=self.model)
+                    return cached
+
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    self.misses += 1
+                    self._in_flight[key] = threading.Event()
+                    break
+
+            # Another thread is already fetching this prompt; wait and look again
+            pending.wait()
+
+        try:
+            response = self.llm_client.generate(prompt, system=system)
+            with self._lock:
+                self._store(key, response)
+            return response
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def stats(self) -> dict:
+        """Return cache hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._size,
+            }
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -1,17 +1,36 @@
 import os
-from openai import OpenAI
+import threading
+import time
 from dotenv import load_dotenv
+from src.instrumentation import get_instrumentation
+from src.transport import Transport, estimate_tokens, get_shared_client
 
 
 class LLMClient:
     """Client for connecting to OpenAI LLM."""
 
-    def __init__(self, model: str = "gpt-4o-mini"):
+    # Completion tokens reserved from the token bucket before the response is known
+    EXPECTED_COMPLETION_TOKENS = 256
+
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        transport: Transport = None,
+        base_url: str = None,
+        timeout: float = 60.0,
+    ):
         """
         Initialize OpenAI client.
 
         Args:
             model: OpenAI model name to use (default: gpt-4o-mini)
+            temperature: Sampling temperature (default: 0.7)
+            transport: Transport applying rate limits, adaptive concurrency and
+                retries. Share one instance between clients that share a quota
+                (default: a new Transport with no rate limits)
+            base_url: API endpoint (default: OPENAI_BASE_URL or the OpenAI API)
+            timeout: Per-request timeout in seconds
         """
         # Load environment variables from .env file
         load_dotenv()
@@ -20,22 +39,75 @@ class LLMClient:
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
 
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_shared_client(api_key, base_url=base_url, timeout=timeout)
+        self.transport = transport if transport is not None else Transport()
         self.model = model
+        self.temperature = temperature
+
+        self._lock = threading.Lock()
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
 
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: str, system: str = None) -> str:
         """
         Generate a response from the LLM.
 
         Args:
-            prompt: Input prompt string
+            prompt: Input prompt string, sent as the user message
+            system: Optional system message sent before the prompt. Keep it
+                identical across calls that share instructions so the provider
+                can serve it from its prompt prefix cache
 
         Returns:
             Generated text response
         """
-        response = self.client.chat.completions.create(
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+
+        instrumentation = get_instrumentation()
+        start = time.perf_counter()
+        try:
+            response = self.transport.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                ),
+                estimated_tokens=(
+                    estimate_tokens(prompt) + estimate_tokens(system or "") + self.EXPECTED_COMPLETION_TOKENS
+                ),
+                count_tokens=lambda response: response.usage.total_tokens if response.usage else None,
+            )
+        except Exception:
+            instrumentation.record_call(
+                time.perf_counter() - start, retries=self.transport.last_retries, error=True, model=self.model
+            )
+            raise
+
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+        instrumentation.record_call(
+            time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=cached_tokens,
+            retries=self.transport.last_retries,
             model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
         )
         return response.choices[0].message.content
+
+    def stats(self) -> dict:
+        """Return prompt token counts and the fraction served from the provider's prefix cache."""
+        with self._lock:
+            return {
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "prompt_cache_hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
@@ -1,6 +1,24 @@
+from src.instrumentation import tags
 from src.prompts import MERGE_PROMPT
 
 
+def extract_prompt(response: str) -> str:
+    """Extract a prompt from an LLM response (within ``` blocks)."""
+    # Find content between ``` blocks
+    if "```" in response:
+        parts = response.split("```")
+        if len(parts) >= 3:
+            # Get the content between first pair of ```
+            prompt = parts[1].strip()
+            # Remove language identifier if present
+            if prompt.startswith(("json", "python", "text")):
+                prompt = "\n".join(prompt.split("\n")[1:]).strip()
+            return prompt
+
+    # If no ``` blocks found, return the whole response
+    return response.strip()
+
+
 class Merger:
     """Merges two prompts by combining their best aspects using an LLM."""
 
@@ -30,25 +48,10 @@ class Merger:
         merge_prompt = MERGE_PROMPT.format(prompt1=prompt1, prompt2=prompt2)
 
         # Get LLM response
-        response = self.llm_client.generate(merge_prompt)
+        with tags(stage="merge"):
+            response = self.llm_client.generate(merge_prompt)
 
         # Extract merged prompt from response
-        merged = self._extract_prompt(response)
+        merged = extract_prompt(response)
 
         return merged
-
-    def _extract_prompt(self, response: str) -> str:
-        """Extract prompt from LLM response (within ``` blocks)."""
-        # Find content between ``` blocks
-        if "```" in response:
-            parts = response.split("```")
-            if len(parts) >= 3:
-                # Get the content between first pair of ```
-                merged_prompt = parts[1].strip()
-                # Remove language identifier if present
-                if merged_prompt.startswith(("json", "python", "text")):
-                    merged_prompt = "\n".join(merged_prompt.split("\n")[1:]).strip()
-                return merged_prompt
-
-        # If no ``` blocks found, return the whole response
-        return response.strip()
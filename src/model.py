@@ -1,5 +1,7 @@
 import json
 from json_repair import repair_json
+from src.instrumentation import prompt_id, tags
+from src.prompts import BATCH_INPUT_ITEM, BATCH_INPUT_PROMPT, INPUT_SENTENCE
 
 
 class Model:
@@ -8,7 +10,7 @@ class Model:
     def __init__(self, llm_client):
         """
         Args:
-            llm_client: LLM client with a generate(prompt: str) -> str method
+            llm_client: LLM client with a generate(prompt: str, system: str = None) -> str method
         """
         self.llm_client = llm_client
 
@@ -23,13 +25,75 @@ class Model:
         Returns:
             Sanitized sentence with PII removed
         """
-        full_prompt = f"{prompt}\n\nInput sentence: {sentence}"
-        response = self.llm_client.generate(full_prompt)
+        # The prompt is sent as the system message so that every call made with
+        # it shares a cacheable prefix
+        with tags(stage="model", candidate=prompt_id(prompt)):
+            response = self.llm_client.generate(INPUT_SENTENCE.format(sentence=sentence), system=prompt)
 
         try:
             repaired = repair_json(response)
             result = json.loads(repaired)
             sanitized = result.get("text", "")
             return sanitized
-        except (json.JSONDecodeError, KeyError):
+        except (json.JSONDecodeError, KeyError, AttributeError):
             return response
+
+    def run_batch(self, prompt: str, sentences: list[str]) -> list[str]:
+        """
+        Run the PII stripping prompt on several sentences with a single LLM call.
+
+        The sentences are numbered and the model is asked for a JSON array of
+        {"id", "text"} objects. Sentences whose output is missing or malformed
+        are sent again one at a time with run().
+
+        Args:
+            prompt: The PII stripping prompt
+            sentences: Input sentences containing PII
+
+        Returns:
+            Sanitized sentences, in the same order as the input
+        """
+        if len(sentences) <= 1:
+            return [self.run(prompt, sentence) for sentence in sentences]
+
+        inputs = "\n".join(BATCH_INPUT_ITEM.format(id=i + 1, sentence=sentence) for i, sentence in enumerate(sentences))
+        with tags(stage="model", candidate=prompt_id(prompt)):
+            response = self.llm_client.generate(inputs, system=BATCH_INPUT_PROMPT.format(prompt=prompt))
+
+        outputs = [None] * len(sentences)
+        for idx, text in self._parse_batch_response(response, len(sentences)).items():
+            outputs[idx] = text
+
+        for idx, sentence in enumerate(sentences):
+            if outputs[idx] is None:
+                outputs[idx] = self.run(prompt, sentence)
+
+        return outputs
+
+    @staticmethod
+    def _parse_batch_response(response: str, count: int) -> dict[int, str]:
+        """Map input positions to the sanitized texts found in a batch response."""
+        try:
+            entries = json.loads(repair_json(response))
+        except (json.JSONDecodeError, ValueError):
+            return {}
+
+        # Accept an array wrapped in an object, e.g. {"results": [...]}
+        if isinstance(entries, dict):
+            entries = next((value for value in entries.values() if isinstance(value, list)), [entries])
+        if not isinstance(entries, list):
+            return {}
+
+        parsed = {}
+        for position, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not isinstance(entry.get("text"), str):
+                continue
+            # Prefer the explicit id; fall back to the position when ids are absent
+            try:
+                idx = int(entry.get("id", position + 1)) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= idx < count and idx not in parsed:
+                parsed[idx] = entry["text"]
+
+        return parsed
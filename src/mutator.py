@@ -1,18 +1,28 @@
-from src.prompts import MUTATION_PROMPT
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from src.instrumentation import bind_context, prompt_id, tags
+from src.merger import extract_prompt
+from src.prompts import MUTATION_PROMPT, MUTATION_VARIANT
 
 
 class Mutator:
     """Mutates prompts based on feedback from evaluation traces."""
 
-    def __init__(self, llm_client):
+    def __init__(self, llm_client, trace_store=None, history_examples: int = 0):
         """
         Args:
             llm_client: LLM client with a generate(prompt: str) -> str method
+            trace_store: Optional TraceStore holding traces of past evaluations
+            history_examples: Number of the parent's worst past traces shown to the
+                LLM besides the current minibatch (default: 0). Sentences of the
+                minibatch are not repeated
         """
         self.llm_client = llm_client
+        self.trace_store = trace_store
+        self.history_examples = history_examples
 
-    def _format_feedback_examples(self, traces: list[dict]) -> str:
-        """Format traces into feedback examples for the mutation prompt."""
+    def _format_feedback_examples(self, traces) -> str:
+        """Format traces (any iterable, consumed once) into feedback examples for the mutation prompt."""
         examples = []
 
         for i, trace in enumerate(traces):
@@ -40,6 +50,30 @@ class Mutator:
 
         return "\n\n".join(examples)
 
+    def _mutation_prompt(self, current_prompt: str, eval_results: dict) -> str:
+        """Build the mutation prompt from the current prompt and its evaluation feedback."""
+        # Format feedback examples from traces, followed by the worst stored ones
+        traces = eval_results['traces']
+        if self.trace_store is not None and self.history_examples > 0:
+            history = self.trace_store.worst_traces(
+                current_prompt, self.history_examples, exclude=[trace['input'] for trace in traces]
+            )
+            traces = itertools.chain(traces, history)
+        feedback_text = self._format_feedback_examples(traces)
+
+        return MUTATION_PROMPT.format(
+            current_instruction=current_prompt,
+            inputs_outputs_feedback=feedback_text
+        )
+
+    def _generate(self, current_prompt: str, mutation_prompt: str) -> str:
+        """Ask the LLM for a new instruction."""
+        with tags(stage="mutate", candidate=prompt_id(current_prompt)):
+            response = self.llm_client.generate(mutation_prompt)
+
+        # The mutation prompt asks for the new instruction within ``` blocks
+        return extract_prompt(response)
+
     def mutate(self, current_prompt: str, eval_results: dict) -> str:
         """
         Mutate a prompt based on evaluation feedback.
@@ -51,16 +85,30 @@ class Mutator:
         Returns:
             New mutated prompt string
         """
-        # Format feedback examples from traces
-        feedback_text = self._format_feedback_examples(eval_results['traces'])
+        return self._generate(current_prompt, self._mutation_prompt(current_prompt, eval_results))
 
-        # Create mutation prompt
-        mutation_prompt = MUTATION_PROMPT.format(
-            current_instruction=current_prompt,
-            inputs_outputs_feedback=feedback_text
-        )
+    def mutate_many(self, current_prompt: str, eval_results: dict, count: int) -> list[str]:
+        """
+        Propose several mutations of a prompt from the same evaluation feedback.
 
-        # Get LLM response - the response itself is the new instruction
-        new_instruction = self.llm_client.generate(mutation_prompt)
+        The proposals are requested concurrently. Each one asks for a different
+        improvement, which also keeps identical requests from being answered by
+        a response cache.
+
+        Args:
+            current_prompt: The current prompt to mutate
+            eval_results: Dict with 'scores' and 'traces' from evaluate_with_traces()
+            count: Number of proposals
 
-        return new_instruction.strip()
+        Returns:
+            List of count mutated prompt strings
+        """
+        if count == 1:
+            return [self.mutate(current_prompt, eval_results)]
+
+        mutation_prompt = self._mutation_prompt(current_prompt, eval_results)
+        propose = bind_context(lambda index: self._generate(
+            current_prompt, mutation_prompt + MUTATION_VARIANT.format(index=index, count=count)
+        ))
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            return list(executor.map(propose, range(1, count + 1)))
@@ -1,63 +1,326 @@
 import random
+import numpy as np
 
 
 class ParetoHelper:
-    def __init__(self, base_prompt, sentences, base_subscores):
+    """
+    Tracks per-sentence Pareto fronts over a prompts x sentences score matrix.
+
+    Front membership is kept as a boolean matrix together with per-prompt and
+    per-sentence membership counts, all updated incrementally when a prompt is
+    added, so selection never has to rebuild them from the fronts.
+
+    Candidates can also carry costs (lower is better), e.g. prompt tokens or
+    sanitize latency. With cost objectives, candidates on the score/cost
+    trade-off front stay selectable as parents even when they are on no
+    sentence front, cost limits exclude candidates from selection and from
+    best_candidate(), and cost weights turn best_candidate() into a
+    score-minus-weighted-cost trade-off.
+    """
+
+    # Initial number of prompt rows; the matrices double in size when full
+    INITIAL_CAPACITY = 16
+
+    def __init__(
+        self,
+        base_prompt,
+        sentences,
+        base_subscores,
+        rng=None,
+        base_costs=None,
+        objectives=(),
+        cost_limits=None,
+        cost_weights=None,
+    ):
         """
         Args:
             base_prompt: Initial prompt
             sentences: Validation sentences
             base_subscores: Scores for base prompt on each sentence
+            rng: random.Random instance used for candidate selection
+                (default: a generator seeded with 42)
+            base_costs: Dict of cost values of the base prompt, e.g. {"prompt_tokens": 120}
+            objectives: Names of the costs that are objectives besides the score
+            cost_limits: Dict of maximum cost values; candidates above a limit are
+                neither selected as parents nor returned by best_candidate(),
+                unless no candidate is within the limits
+            cost_weights: Dict of score penalties per unit of cost used by
+                best_candidate(), e.g. {"prompt_tokens": 0.0005}
         """
+        num_sentences = len(sentences)
+        if len(base_subscores) != num_sentences:
+            raise ValueError("base_subscores must have one score per sentence")
+
         self.prompt_candidates = [base_prompt]
         self.per_prompt_scores = [sum(base_subscores) / len(base_subscores)]
+        self.costs = [dict(base_costs or {})]
+        self.objectives = tuple(objectives)
+        self.cost_limits = dict(cost_limits or {})
+        self.cost_weights = dict(cost_weights or {})
+
+        # scores[prompt_idx, sentence_idx] and on_front[prompt_idx, sentence_idx]
+        self._scores = np.zeros((self.INITIAL_CAPACITY, num_sentences), dtype=np.float64)
+        self._on_front = np.zeros((self.INITIAL_CAPACITY, num_sentences), dtype=bool)
+        self._scores[0] = base_subscores
+        self._on_front[0] = True
+
+        # Number of sentence fronts each prompt belongs to
+        self._front_counts = np.zeros(self.INITIAL_CAPACITY, dtype=np.int64)
+        self._front_counts[0] = num_sentences
 
-        # Track which prompts are Pareto-optimal for each sentence
-        # List of sets: prompt_at_pareto_front_sentences[sentence_idx] = {prompt_idx, ...}
-        self.prompt_at_pareto_front_sentences = [{0} for _ in range(len(sentences))]
+        # Number of prompts in each sentence front
+        self._front_sizes = np.ones(num_sentences, dtype=np.int64)
 
         # Track best score achieved on each sentence
-        self.pareto_front_sentences = base_subscores.copy()
+        self.front_scores = np.asarray(base_subscores, dtype=np.float64).copy()
+
+        # Prompts whose validation was stopped early. They never enter the
+        # Pareto fronts; their scores are kept for inspection only
+        self.partial_candidates = []
+
+        # Non-dominated candidates and their cumulative selection weights,
+        # rebuilt lazily after the fronts change
+        self._sampling_cache = None
+
+        # Dedicated generator for reproducibility
+        self.rng = rng if rng is not None else random.Random(42)
+
+    @property
+    def num_candidates(self):
+        return len(self.prompt_candidates)
+
+    @property
+    def scores(self):
+        """Score matrix of shape (num_candidates, num_sentences)."""
+        return self._scores[:self.num_candidates]
+
+    @property
+    def pareto_front_sentences(self):
+        """Best score achieved on each sentence."""
+        return self.front_scores
+
+    @property
+    def prompt_at_pareto_front_sentences(self):
+        """Prompt indices in each sentence front, as a list of sets (built on demand)."""
+        on_front = self._on_front[:self.num_candidates]
+        return [set(np.flatnonzero(on_front[:, sentence_idx]).tolist()) for sentence_idx in range(on_front.shape[1])]
 
-        # Set random seed for reproducibility
-        random.seed(42)
+    def front_counts(self):
+        """Number of sentence fronts each candidate belongs to."""
+        return self._front_counts[:self.num_candidates]
+
+    def front_sentences(self, prompt_idx):
+        """Indices of the sentences whose front contains the given prompt."""
+        return np.flatnonzero(self._on_front[prompt_idx]).tolist()
+
+    def _grow(self):
+        """Double the number of prompt rows of the matrices."""
+        capacity = 2 * self._scores.shape[0]
+        for name in ("_scores", "_on_front", "_front_counts"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+
+    def update_with_new_prompt(self, new_prompt, subscores, costs=None):
+        new_prompt_idx = self.num_candidates
+        if new_prompt_idx == self._scores.shape[0]:
+            self._grow()
+
+        new_scores = np.asarray(subscores, dtype=np.float64)
+        if new_scores.shape != self.front_scores.shape:
+            raise ValueError("subscores must have one score per sentence")
 
-    def update_with_new_prompt(self, new_prompt, subscores):
-        new_prompt_idx = len(self.prompt_candidates)
         self.prompt_candidates.append(new_prompt)
+        self.costs.append(dict(costs or {}))
 
         # Calculate overall score
         overall_score = sum(subscores) / len(subscores)
         self.per_prompt_scores.append(overall_score)
+        self._scores[new_prompt_idx] = new_scores
+
+        better = new_scores > self.front_scores
+        ties = new_scores == self.front_scores
+
+        # New prompt beats all previous ones on these sentences: they leave the front
+        if better.any():
+            previous = self._on_front[:new_prompt_idx]
+            self._front_counts[:new_prompt_idx] -= previous[:, better].sum(axis=1)
+            previous[:, better] = False
+            self.front_scores[better] = new_scores[better]
+            self._front_sizes[better] = 1
+
+        # Tie - add to the front
+        self._front_sizes[ties] += 1
+
+        self._on_front[new_prompt_idx] = better | ties
+        self._front_counts[new_prompt_idx] = int(better.sum() + ties.sum())
+        self._sampling_cache = None
+
+    def record_partial_prompt(self, prompt, partial_subscores):
+        """
+        Record a prompt that was only validated on some sentences.
+
+        Args:
+            prompt: The prompt
+            partial_subscores: Dict mapping validation sentence index to score
+        """
+        self.partial_candidates.append({
+            "prompt": prompt,
+            "subscores": dict(partial_subscores),
+            "score": sum(partial_subscores.values()) / len(partial_subscores),
+        })
+
+    def non_dominated_candidates(self):
+        """
+        Indices of the front candidates that are not dominated.
+
+        A prompt is dominated if every front it belongs to also contains another
+        non-dominated prompt. Candidates are examined from the lowest to the
+        highest overall score, so among interchangeable prompts the best survives.
+        """
+        counts = self.front_counts()
+        front_sizes = self._front_sizes.copy()
+
+        candidates = np.flatnonzero(counts > 0)
+        overall = np.asarray(self.per_prompt_scores)[candidates]
+
+        # Bit-packed front membership rows: testing a candidate against the
+        # sentences it is the only member of is then a short AND over bytes
+        num_sentences = len(front_sizes)
+        packed_fronts = np.packbits(self._on_front[candidates], axis=1)
+        sole_member = np.packbits(front_sizes == 1)
+
+        dominated = np.zeros(len(candidates), dtype=bool)
+        for position in np.argsort(overall, kind="stable"):
+            if np.any(packed_fronts[position] & sole_member):
+                continue
+
+            # Every front of this prompt has another member: drop it from all of them
+            dominated[position] = True
+            front_sizes -= np.unpackbits(packed_fronts[position], count=num_sentences)
+            sole_member = np.packbits(front_sizes == 1)
 
-        # Update per-sentence Pareto fronts
-        for sentence_idx, (old_score, new_score) in enumerate(zip(self.pareto_front_sentences, subscores)):
-            if new_score > old_score:
-                # New prompt beats all previous ones on this sentence
-                self.pareto_front_sentences[sentence_idx] = new_score
-                self.prompt_at_pareto_front_sentences[sentence_idx] = {new_prompt_idx}
-            elif new_score == old_score:
-                # Tie - add to the front
-                self.prompt_at_pareto_front_sentences[sentence_idx].add(new_prompt_idx)
+        return candidates[~dominated]
+
+    def _within_limits(self):
+        """Boolean mask of the candidates whose known costs respect every limit."""
+        within = np.ones(self.num_candidates, dtype=bool)
+        for name, limit in self.cost_limits.items():
+            for idx, costs in enumerate(self.costs):
+                if costs.get(name) is not None and costs[name] > limit:
+                    within[idx] = False
+        return within
+
+    def cost_front(self):
+        """
+        Indices of the candidates no other candidate beats on score and every objective.
+
+        A candidate is dominated if another one scores at least as well and costs
+        at most as much on every objective, and is strictly better on one of them.
+        Unknown costs never dominate nor are dominated on that objective.
+        """
+        scores = np.asarray(self.per_prompt_scores)
+        # Objectives to minimize: negated score, then the costs (NaN when unknown)
+        values = np.column_stack([-scores] + [
+            np.array([np.nan if costs.get(name) is None else costs[name] for costs in self.costs], dtype=np.float64)
+            for name in self.objectives
+        ])
+        with np.errstate(invalid="ignore"):
+            no_worse = np.all((values[:, None, :] <= values[None, :, :]) | np.isnan(values[None, :, :])
+                              | np.isnan(values[:, None, :]), axis=2)
+            better = np.any(values[:, None, :] < values[None, :, :], axis=2)
+        # dominates[i, j]: candidate i dominates candidate j
+        dominates = no_worse & better
+        return np.flatnonzero(~dominates.any(axis=0))
 
     def select_pareto_candidate(self):
         """Select a parent prompt from the Pareto fronts using weighted random sampling"""
-        # Count frequency of each prompt in sentence Pareto fronts
-        prompt_frequency = {}
-        for sentence_pareto_front in self.prompt_at_pareto_front_sentences:
-            for prompt_idx in sentence_pareto_front:
-                if prompt_idx not in prompt_frequency:
-                    prompt_frequency[prompt_idx] = 0
-                prompt_frequency[prompt_idx] += 1
-
-        # Create weighted sampling list (each prompt appears frequency times)
-        sampling_list = [prompt_idx for prompt_idx, freq in prompt_frequency.items() for _ in range(freq)]
-
-        # Randomly select from weighted list
-        parent_idx = random.choice(sampling_list)
+        if self._sampling_cache is None:
+            # Weight each non-dominated prompt by the number of fronts it belongs to
+            candidates = self.non_dominated_candidates()
+            weights = self._front_counts[candidates]
+            if self.objectives:
+                # Cheap candidates on the trade-off front stay selectable, with the minimum weight
+                extra = np.setdiff1d(self.cost_front(), candidates)
+                candidates = np.concatenate([candidates, extra])
+                weights = np.concatenate([weights, np.ones(len(extra), dtype=np.int64)])
+            if self.cost_limits:
+                within = self._within_limits()[candidates]
+                if within.any():
+                    candidates, weights = candidates[within], weights[within]
+            cumulative_weights = np.cumsum(weights)
+            self._sampling_cache = (candidates, cumulative_weights)
+
+        candidates, cumulative_weights = self._sampling_cache
+
+        # Sample by cumulative weight instead of expanding one entry per occurrence
+        target = self.rng.random() * cumulative_weights[-1]
+        parent_idx = int(candidates[np.searchsorted(cumulative_weights, target, side="right")])
         parent = self.prompt_candidates[parent_idx]
         return parent_idx, parent
 
+    def state_dict(self):
+        """Return the helper's state as JSON-serializable data."""
+        return {
+            "prompt_candidates": list(self.prompt_candidates),
+            "scores": self.scores.tolist(),
+            "costs": [dict(costs) for costs in self.costs],
+            "partial_candidates": [
+                {**partial, "subscores": {str(idx): score for idx, score in partial["subscores"].items()}}
+                for partial in self.partial_candidates
+            ],
+        }
+
+    @classmethod
+    def from_state_dict(cls, state, sentences, rng=None, **options):
+        """
+        Rebuild a helper from state_dict() output.
+
+        The fronts are rebuilt by replaying the candidates in their original
+        order, so every derived count matches the original helper exactly.
+
+        Args:
+            options: objectives, cost_limits and cost_weights, as for the constructor
+        """
+        prompts = state["prompt_candidates"]
+        scores = state["scores"]
+        costs = state.get("costs") or [{}] * len(prompts)
+
+        helper = cls(prompts[0], sentences, scores[0], rng=rng, base_costs=costs[0], **options)
+        for prompt, subscores, prompt_costs in zip(prompts[1:], scores[1:], costs[1:]):
+            helper.update_with_new_prompt(prompt, subscores, costs=prompt_costs)
+
+        helper.partial_candidates = [
+            {**partial, "subscores": {int(idx): score for idx, score in partial["subscores"].items()}}
+            for partial in state["partial_candidates"]
+        ]
+        return helper
+
+    def best_index(self):
+        """
+        Index of the best candidate: the highest score, or the highest score
+        minus the weighted costs when cost weights are set, among the candidates
+        within the cost limits.
+
+        A candidate with an unknown weighted cost is only picked when no candidate
+        within the limits has all of them known, rather than counting the cost as 0.
+        """
+        utility = np.asarray(self.per_prompt_scores, dtype=np.float64).copy()
+        known = np.ones(self.num_candidates, dtype=bool)
+        for name, weight in self.cost_weights.items():
+            values = np.array([np.nan if costs.get(name) is None else costs[name] for costs in self.costs],
+                              dtype=np.float64)
+            known &= ~np.isnan(values)
+            utility -= weight * np.nan_to_num(values)
+
+        within = self._within_limits()
+        for eligible in (within & known, within):
+            if eligible.any():
+                utility[~eligible] = -np.inf
+                break
+        # First maximum, like list.index(max(...))
+        return int(np.argmax(utility))
+
     def best_candidate(self):
-        best_idx = self.per_prompt_scores.index(max(self.per_prompt_scores))
-        return self.prompt_candidates[best_idx]
+        return self.prompt_candidates[self.best_index()]
@@ -0,0 +1,199 @@
+import hashlib
+import re
+import threading
+
+# Structured PII a regular expression can find reliably
+PII_PATTERNS = [
+    ("email address", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")),
+    ("identification number", re.compile(r"\b\d{3}-\d{2}-\d{4}\b|\b(?:\d{4}[-\s]){3}\d{4}\b")),
+    ("phone number", re.compile(r"(?:\+\d{1,3}[\s.-]?)?\(?\b\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b")),
+    ("date", re.compile(
+        r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b|"
+        r"\b(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|"
+        r"Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\.?\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s*\d{4})?\b"
+    )),
+    ("street address", re.compile(
+        r"\b\d+\s+(?:[A-Z][a-z]+\s)+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Way)\b\.?"
+    )),
+]
+
+# Capitalized words (including "McDonald" or "O'Brien"): possibly part of a name,
+# which only the judge can tell
+CAPITALIZED_WORD = re.compile(r"\b[A-Z][A-Za-z'\u2019-]+")
+
+# Abbreviations whose period does not end a sentence
+TITLES = {"Mr", "Mrs", "Ms", "Dr", "Prof", "Sr", "Jr", "St"}
+
+# Words that are capitalized only because they open a sentence, and are never names
+SENTENCE_OPENERS = {
+    "A", "An", "The", "My", "Our", "Your", "His", "Her", "Their", "Its", "This", "That", "These", "Those",
+    "I'm", "I've", "I'd", "I'll", "We", "You", "He", "She", "They", "It", "Please", "Call", "Contact",
+    "Reach", "Send", "Email", "Text", "Write", "Mail", "Visit", "Meet", "Ask", "Tell", "If", "When",
+    "In", "On", "At", "For", "From", "To", "Dear", "Hi", "Hello", "Thanks", "Thank",
+}
+
+
+class PreJudge:
+    """
+    Local first tier of the judge: settles clear failures with regular expressions.
+
+    PII spans (emails, phone numbers, dates, street addresses, ID numbers) are
+    located in the original sentence and looked up verbatim in the sanitized
+    output. A surviving span is a certain miss, scored like the judge scores it:
+    the fraction of PII removed, counting each removed run of capitalized words
+    as a removed name. Names cannot be recognized reliably, so the pair is
+    escalated to the LLM judge whenever a capitalized word survives, since it may
+    be a leaked name, even at the start of a sentence ("Sarah called..."). Only
+    common sentence openers such as "My" or "Please" are known not to be names.
+    Passes are never settled locally: an output with no detectable PII left may
+    still leak a name.
+
+    A deterministic sample of the settled pairs is also sent to the judge, to
+    measure how often the local verdict agrees with it.
+    """
+
+    # Local and judge scores this close count as agreeing
+    AGREEMENT_TOLERANCE = 0.2
+
+    def __init__(self, audit_rate: float = 0.05):
+        """
+        Args:
+            audit_rate: Fraction of locally settled pairs also sent to the LLM judge,
+                whose verdict is then used (default: 0.05)
+        """
+        if not 0.0 <= audit_rate <= 1.0:
+            raise ValueError("audit_rate must be between 0 and 1")
+
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self.failed = 0
+        self.escalated = 0
+        self.audited = 0
+        self.agreed = 0
+
+    @staticmethod
+    def _find_spans(sentence: str) -> list[tuple[str, str]]:
+        """Non-overlapping (category, text) PII spans of a sentence."""
+        spans = []
+        taken = [False] * len(sentence)
+        for category, pattern in PII_PATTERNS:
+            for match in pattern.finditer(sentence):
+                if any(taken[match.start():match.end()]):
+                    continue
+                taken[match.start():match.end()] = [True] * (match.end() - match.start())
+                spans.append((category, match.group(0)))
+        return spans
+
+    @staticmethod
+    def _capitalized_runs(text: str) -> list[list[str]]:
+        """
+        Runs of consecutive capitalized words of a text that may be names.
+
+        Titles and common words opening a sentence are left out.
+
+        Returns:
+            List of runs, each a list of words
+        """
+        runs = []
+        last_end = None
+        for match in CAPITALIZED_WORD.finditer(text):
+            word = match.group(0)
+            if word in TITLES:
+                continue
+            before = text[:match.start()].rstrip(" \t\"'(\u201c")
+            previous = re.search(r"(\w+)\.$", before)
+            starts_sentence = not before or (
+                before[-1] in ".!?:\n" and not (previous and previous.group(1) in TITLES)
+            )
+            if starts_sentence and word.replace("\u2019", "'") in SENTENCE_OPENERS:
+                continue
+            # Words separated by whitespace or a title ("Dr. Jane Smith") belong to the same run
+            gap = text[last_end:match.start()] if last_end is not None else None
+            if gap is not None and re.fullmatch(r"\s*(?:(?:" + "|".join(TITLES) + r")\.?\s*)*", gap):
+                runs[-1].append(word)
+            else:
+                runs.append([word])
+            last_end = match.end()
+        return runs
+
+    def check(self, original: str, sanitized: str):
+        """
+        Judge a pair locally.
+
+        Returns:
+            Evaluation result dict like the LLM judge's for a certain failure, or
+            None if the pair must go to the LLM judge
+        """
+        spans = self._find_spans(original)
+        if not spans or not sanitized.strip():
+            return None
+
+        missed = [(category, text) for category, text in spans if text in sanitized]
+        if not missed:
+            return None
+
+        # Possible names outside the detected spans: only the judge can score one that survives
+        rest = original
+        for _, text in spans:
+            rest = rest.replace(text, " ")
+        runs = self._capitalized_runs(rest)
+        survives = lambda word: re.search(r"\b" + re.escape(word) + r"\b", sanitized) is not None
+        if any(survives(word) for run in runs for word in run):
+            return None
+
+        removed = [text for _, text in spans if text not in sanitized]
+        removed += [" ".join(run) for run in runs]
+        return {
+            "score": len(removed) / (len(removed) + len(missed)),
+            "removed_pii": removed,
+            "missed_pii": [text for _, text in missed],
+            "feedback": " ".join(f"The {category} '{text}' still appears verbatim." for category, text in missed),
+        }
+
+    def _is_audited(self, original: str, sanitized: str) -> bool:
+        """Deterministic audit sample, so repeated evaluations make the same choice."""
+        if self.audit_rate == 0.0:
+            return False
+        digest = hashlib.sha256(f"{original}\x00{sanitized}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64 < self.audit_rate
+
+    def settle(self, original: str, sanitized: str):
+        """
+        Return the local verdict of a pair, or None if it must go to the LLM judge.
+
+        Pairs that are not certain failures and audited pairs are escalated.
+        """
+        verdict = self.check(original, sanitized)
+        with self._lock:
+            if verdict is None:
+                self.escalated += 1
+                return None
+            if self._is_audited(original, sanitized):
+                self.audited += 1
+                return None
+            self.failed += 1
+        return verdict
+
+    def record_judge(self, original: str, sanitized: str, eval_result: dict):
+        """Compare the LLM judge's verdict on an escalated pair with the local one, if it was audited."""
+        if not self._is_audited(original, sanitized):
+            return
+        verdict = self.check(original, sanitized)
+        if verdict is None:
+            return
+        with self._lock:
+            if abs(verdict["score"] - eval_result["score"]) <= self.AGREEMENT_TOLERANCE:
+                self.agreed += 1
+
+    def stats(self) -> dict:
+        """Return the settled, escalated and audited counts, the escalation rate and the audit agreement."""
+        with self._lock:
+            total = self.failed + self.escalated + self.audited
+            return {
+                "pairs": total,
+                "settled_fail": self.failed,
+                "escalated": self.escalated,
+                "escalation_rate": (self.escalated + self.audited) / total if total else 0.0,
+                "audited": self.audited,
+                "audit_agreement": self.agreed / self.audited if self.audited else None,
+            }
@@ -0,0 +1,118 @@
+import hashlib
+import re
+import numpy as np
+
+
+class NearDuplicateIndex:
+    """
+    MinHash index of prompts for finding near-duplicates without comparing texts.
+
+    Each prompt is reduced to the set of its word n-grams (shingles) and to a
+    MinHash signature whose agreement rate with another prompt's signature
+    estimates the Jaccard similarity of their shingle sets. Signatures are split
+    into bands, and only prompts sharing a band bucket (locality-sensitive
+    hashing) are compared, so lookups stay cheap as the index grows.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 3,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            threshold: Estimated Jaccard similarity from which prompts are near-duplicates
+            num_perm: Number of hash functions in a signature
+            bands: Number of LSH bands; must divide num_perm. More bands find
+                less similar candidates at the cost of more comparisons
+            shingle_size: Number of consecutive words per shingle
+            seed: Seed of the hash functions
+        """
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        if num_perm % bands != 0:
+            raise ValueError("bands must divide num_perm")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Multiply-shift hash functions: h(x) = (a * x + b) >> 32 with odd a
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+        self.keys = []
+        self.prompts = []
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(bands)]
+
+    def _shingles(self, text: str) -> set[str]:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text, as a uint32 array of num_perm values."""
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+             for shingle in self._shingles(text)],
+            dtype=np.uint64,
+        )
+        # uint64 arithmetic wraps around, as multiply-shift hashing expects
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, prompt: str, key=None):
+        """
+        Add a prompt to the index.
+
+        Args:
+            prompt: Prompt text
+            key: Value returned by find() for this prompt, e.g. a candidate index
+        """
+        signature = self.signature(prompt)
+        position = len(self.keys)
+        self.keys.append(key)
+        self.prompts.append(prompt)
+        self._signatures = np.vstack([self._signatures, signature])
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(position)
+
+    def find(self, prompt: str):
+        """
+        Find the indexed prompt most similar to prompt, if it is a near-duplicate.
+
+        Returns:
+            Tuple of (key, estimated similarity), or None if no indexed prompt
+            reaches the threshold
+        """
+        signature = self.signature(prompt)
+        positions = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            positions.update(buckets.get(band_key, ()))
+        if not positions:
+            return None
+
+        positions = sorted(positions)
+        similarities = (self._signatures[positions] == signature).mean(axis=1)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self.keys[positions[best]], float(similarities[best])
+
+    def similarity(self, prompt1: str, prompt2: str) -> float:
+        """Estimated Jaccard similarity of two prompts."""
+        return float((self.signature(prompt1) == self.signature(prompt2)).mean())
+
+    def __len__(self):
+        return len(self.keys)
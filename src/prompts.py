@@ -10,6 +10,25 @@ Output only the JSON object and nothing else.
 """
 
 
+# The fixed instructions of each call go in the system message and only the
+# per-call inputs in the user message, so providers can cache the shared prefix
+
+BATCH_INPUT_PROMPT = """{prompt}
+
+You will be given numbered input sentences. Apply the instructions above to each input sentence independently.
+
+Respond ONLY with a JSON array containing exactly one object per input sentence, in input order, in this format:
+[
+  {{"id": 1, "text": "Sanitized text here"}}
+]"""
+
+
+INPUT_SENTENCE = """Input sentence: {sentence}"""
+
+
+BATCH_INPUT_ITEM = """Input sentence {id}: {sentence}"""
+
+
 EVALUATION_PROMPT = """
 You are an expert evaluator for PII (Personally Identifiable Information) stripping tasks.
 
@@ -19,9 +38,6 @@ You will be given:
 
 Your task is to evaluate how well the PII was removed from the sentence.
 
-Original sentence: {original}
-Sanitized sentence: {sanitized}
-
 Evaluate the sanitization and provide:
 1. A score from 0.0 to 1.0 (where 1.0 means all PII was perfectly removed)
 2. List of PII that was successfully removed
@@ -29,12 +45,51 @@ Evaluate the sanitization and provide:
 4. Brief feedback on the quality
 
 Respond ONLY with a JSON object in this format:
-{{
+{
   "score": 0.0-1.0,
   "removed_pii": ["list", "of", "removed", "pii"],
   "missed_pii": ["list", "of", "missed", "pii"],
   "feedback": "brief explanation"
-}}
+}
+"""
+
+
+EVALUATION_INPUT = """Original sentence: {original}
+Sanitized sentence: {sanitized}
+"""
+
+
+EVALUATION_BATCH_PROMPT = """
+You are an expert evaluator for PII (Personally Identifiable Information) stripping tasks.
+
+You will be given numbered items. Each item has:
+1. An original sentence
+2. A sanitized version of that sentence
+
+Your task is to evaluate, for each item independently, how well the PII was removed from the sentence.
+
+For each item provide:
+1. A score from 0.0 to 1.0 (where 1.0 means all PII was perfectly removed)
+2. List of PII that was successfully removed
+3. List of PII that was missed (still present in sanitized version)
+4. Brief feedback on the quality
+
+Respond ONLY with a JSON array containing exactly one object per item, in item order, in this format:
+[
+  {
+    "id": 1,
+    "score": 0.0-1.0,
+    "removed_pii": ["list", "of", "removed", "pii"],
+    "missed_pii": ["list", "of", "missed", "pii"],
+    "feedback": "brief explanation"
+  }
+]
+"""
+
+
+EVALUATION_BATCH_ITEM = """Item {id}
+Original sentence: {original}
+Sanitized sentence: {sanitized}
 """
 
 
@@ -57,6 +112,12 @@ Read all the assistant responses and the corresponding feedback. Identify all ni
 Provide the new instructions within ``` blocks."""
 
 
+# Appended to MUTATION_PROMPT when several children are proposed for the same parent
+MUTATION_VARIANT = """
+
+This is proposal {index} of {count} for the same instruction. Make it a different improvement from the other proposals, for example by acting on other feedback or trying another strategy."""
+
+
 MERGE_PROMPT = """I have two different prompt instructions that both perform well at stripping PII (Personally Identifiable Information) from text. Each prompt has learned different strategies and strengths.
 
 Prompt 1:
@@ -82,3 +143,18 @@ Create a merged prompt that:
 - Is not simply a concatenation, but a thoughtful synthesis
 
 Provide the merged prompt within ``` blocks."""
+
+
+COMPRESSION_PROMPT = """I have a prompt instruction that performs well at stripping PII (Personally Identifiable Information) from text:
+```
+{prompt}
+```
+
+Your task is to rewrite it as a shorter instruction that makes the assistant behave exactly the same way.
+
+- Keep every rule about which information to remove and how to replace it
+- Keep the required output format
+- Remove repetitions, filler words and explanations the assistant does not need
+- Merge instructions that say the same thing
+
+Provide the shortened prompt within ``` blocks."""
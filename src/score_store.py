@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from src.instrumentation import current_tags
+
+
+class ScoreStore:
+    """
+    In-memory store of evaluation traces keyed by (prompt hash, sentence).
+
+    Each trace remembers the optimizer rollout that stored it. Inside a wave of
+    parallel rollouts, a rollout only sees its own traces and those of earlier
+    waves, never those of a concurrent rollout. Which sentences still need
+    evaluating, and so which LLM requests are sent, then does not depend on
+    timing. When several rollouts stored a pair, the earliest one's trace wins.
+
+    The optimizer saves the store in its checkpoints, so a resumed run reuses
+    the same traces as an uninterrupted one and sends the same requests.
+    """
+
+    def __init__(self):
+        self._traces = {}
+        self._lock = threading.Lock()
+
+        # Every stored trace stands for one model call and one judge call
+        self.hits = 0
+        self.misses = 0
+        self.model_calls_saved = 0
+        self.judge_calls_saved = 0
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        """Stable hash identifying a prompt text."""
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, sentence: str):
+        """
+        Look up the trace of a prompt on a sentence.
+
+        Args:
+            prompt: The PII stripping prompt
+            sentence: Input sentence
+
+        Returns:
+            A copy of the stored trace, or None if the pair was never evaluated
+        """
+        key = (self.prompt_hash(prompt), sentence)
+        rollout, wave = self._position()
+        with self._lock:
+            by_rollout = self._traces.get(key, {})
+            trace = by_rollout.get(rollout)
+            if trace is None:
+                visible = [stored for stored in by_rollout if wave is None or stored < wave]
+                trace = by_rollout[min(visible)] if visible else None
+            if trace is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.model_calls_saved += 1
+            self.judge_calls_saved += 1
+            return dict(trace)
+
+    def put(self, prompt: str, sentence: str, trace: dict):
+        """Store the trace of a prompt on a sentence."""
+        key = (self.prompt_hash(prompt), sentence)
+        rollout, _ = self._position()
+        with self._lock:
+            self._traces.setdefault(key, {}).setdefault(rollout, dict(trace))
+
+    def state_dict(self) -> list:
+        """Stored traces as [prompt hash, sentence, rollout, trace] entries, for checkpoints."""
+        with self._lock:
+            return [
+                [prompt_hash, sentence, rollout, trace]
+                for (prompt_hash, sentence), by_rollout in self._traces.items()
+                for rollout, trace in by_rollout.items()
+            ]
+
+    def load_state_dict(self, state: list):
+        """Add the traces recorded by state_dict() to the store."""
+        with self._lock:
+            for prompt_hash, sentence, rollout, trace in state:
+                self._traces.setdefault((prompt_hash, sentence), {}).setdefault(rollout, dict(trace))
+
+    @staticmethod
+    def _position():
+        """(rollout, first rollout of the wave) of the caller; (-1, None) outside optimizer rollouts."""
+        tags = current_tags()
+        return tags.get("rollout", -1), tags.get("wave")
+
+    def __len__(self):
+        return len(self._traces)
+
+    def stats(self) -> dict:
+        """Return lookup counters and the number of LLM calls saved."""
+        with self._lock:
+            return {
+                "entries": len(self._traces),
+                "hits": self.hits,
+                "misses": self.misses,
+                "model_calls_saved": self.model_calls_saved,
+                "judge_calls_saved": self.judge_calls_saved,
+            }
@@ -0,0 +1,381 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from src.instrumentation import get_instrumentation
+from src.transport import Transport, estimate_tokens
+
+
+# PII categories the simulated backend knows about: the keywords that make a
+# prompt "aware" of the category, a detector, and the rule the simulated
+# mutator adds to a prompt after the judge reports a miss
+PII_CATEGORIES = [
+    {
+        "name": "email address",
+        "keywords": ("email",),
+        "pattern": re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"),
+        "rule": "Replace every email address with [EMAIL].",
+    },
+    {
+        "name": "phone number",
+        "keywords": ("phone",),
+        "pattern": re.compile(r"\+?\(?\d{3}\)?[-.\s]\d{3}[-.\s]\d{4}\b"),
+        "rule": "Replace every phone number with [PHONE].",
+    },
+    {
+        "name": "date of birth",
+        "keywords": ("date", "birth"),
+        "pattern": re.compile(
+            r"\b\d{1,2}/\d{1,2}/\d{2,4}\b|\b(?:January|February|March|April|May|June|July|August|September|"
+            r"October|November|December)\s+\d{1,2}(?:,\s*\d{4})?"
+        ),
+        "rule": "Replace dates of birth and other personal dates with [DATE].",
+    },
+    {
+        "name": "street address",
+        "keywords": ("address", "street"),
+        "pattern": re.compile(
+            r"\b\d+\s+(?:[A-Z][a-z]+\s)+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr)\b\.?"
+        ),
+        "rule": "Replace street addresses with [ADDRESS].",
+    },
+    {
+        "name": "identification number",
+        "keywords": ("ssn", "social security", "credit card", "account", "identification"),
+        "pattern": re.compile(r"\b\d{3}-\d{2}-\d{4}\b|\b(?:\d{4}[-\s]){3}\d{4}\b"),
+        "rule": "Replace social security, credit card and account numbers with [ID].",
+    },
+    {
+        "name": "person name",
+        "keywords": ("name", "person"),
+        "pattern": re.compile(r"\b[A-Z][a-z]+(?:\s[A-Z][a-z]+)+\b"),
+        "rule": "Replace the full name of every person with [NAME].",
+    },
+]
+
+# Capitalized words that start sentences rather than names
+NAME_STOPWORDS = {"My", "Contact", "Call", "Please", "You", "Send", "Reach", "Email", "Dear", "Hi", "Hello", "The"}
+
+MALFORMED_RESPONSES = [
+    "I'm sorry, but I can't help with that request.",
+    "Here is the result:\n\n",
+]
+
+
+class SimulatedLLMError(Exception):
+    """Injected API failure. Carries the HTTP status code the transport retries on."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Simulated API error {status_code}")
+        self.status_code = status_code
+
+
+def _strip_fences(text: str) -> str:
+    """Return the content of the first ``` block, or the text itself."""
+    text = text.strip()
+    parts = text.split("```")
+    if len(parts) >= 3:
+        return parts[1].strip()
+    return text
+
+
+def find_pii(sentence: str) -> list[tuple[str, str]]:
+    """
+    Detect PII in a sentence with the simulated backend's detectors.
+
+    Args:
+        sentence: Text to scan
+
+    Returns:
+        Non-overlapping (category name, text) pairs, in order of appearance
+    """
+    spans = []
+    taken = [False] * len(sentence)
+    for category in PII_CATEGORIES:
+        for match in category["pattern"].finditer(sentence):
+            start, end, text = match.start(), match.end(), match.group(0)
+            if category["name"] == "person name":
+                # Drop sentence starters such as "Contact" in "Contact Emily Wilson"
+                words = text.split()
+                while words and words[0] in NAME_STOPWORDS:
+                    start += len(words[0]) + 1
+                    words = words[1:]
+                if len(words) < 2:
+                    continue
+                text = " ".join(words)
+            if any(taken[start:end]):
+                continue
+            taken[start:end] = [True] * (end - start)
+            spans.append((start, category["name"], text))
+    return [(name, text) for _, name, text in sorted(spans)]
+
+
+class SimulatedLLMClient:
+    """
+    Offline stand-in for LLMClient that needs no network access or API key.
+
+    Recognizes the model, judge, mutation and merge prompts of this project and
+    answers them with plausible responses. The sanitizer removes each piece of
+    PII with a probability that grows when the prompt mentions its category,
+    the judge scores the fraction of PII removed, and the mutator adds a rule
+    for every category the judge reported as missed, so optimization makes
+    real progress. Responses depend only on the seed and the prompt; latency,
+    errors and malformed responses are drawn per call from the same seed.
+    """
+
+    model = "simulated"
+    temperature = 0.0
+
+    def __init__(
+        self,
+        seed: int = 0,
+        latency: float = 0.0,
+        latency_distribution: str = "constant",
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        aware_recall: float = 0.95,
+        unaware_recall: float = 0.4,
+        transport: Transport = None,
+    ):
+        """
+        Args:
+            seed: Seed of every random choice the backend makes
+            latency: Mean response latency in seconds
+            latency_distribution: "constant", "uniform" (0 to twice the mean),
+                "exponential" or "lognormal" (long tail, sigma 1)
+            error_rate: Probability that a call fails with a 429 or 503
+            malformed_rate: Probability that a JSON response is truncated or replaced by prose
+            aware_recall: Probability of removing PII whose category the prompt mentions
+            unaware_recall: Probability of removing PII whose category the prompt does not mention
+            transport: Transport retrying the injected errors (default: a Transport
+                with no rate limits and short backoff delays)
+        """
+        if latency_distribution not in ("constant", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+
+        self.seed = seed
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.aware_recall = aware_recall
+        self.unaware_recall = unaware_recall
+        self.transport = transport if transport is not None else Transport(base_delay=0.01, max_delay=0.1)
+
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self.calls = {}
+        self.errors = 0
+        self.malformed = 0
+        self._seen_systems = set()
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def _hash(self, *parts) -> int:
+        data = "\x00".join(str(part) for part in (self.seed, *parts))
+        return int.from_bytes(hashlib.sha256(data.encode("utf-8")).digest()[:8], "big")
+
+    def _chance(self, *parts) -> float:
+        """Deterministic uniform draw in [0, 1) keyed by the parts."""
+        return self._hash(*parts) / 2 ** 64
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            return rng.uniform(0, 2 * self.latency)
+        if self.latency_distribution == "exponential":
+            return rng.expovariate(1 / self.latency)
+        if self.latency_distribution == "lognormal":
+            # mu chosen so the mean is self.latency with sigma = 1
+            return rng.lognormvariate(0, 1) * self.latency / 1.6487
+        return self.latency
+
+    def generate(self, prompt: str, system: str = None) -> str:
+        """
+        Generate a simulated response.
+
+        Repeated system messages are reported as cached prompt tokens, like a
+        provider's prompt prefix cache would.
+
+        Args:
+            prompt: Input prompt string, sent as the user message
+            system: Optional system message sent before the prompt
+
+        Returns:
+            Generated text response
+        """
+        text = f"{system}\n\n{prompt}" if system else prompt
+        kind, response = self._respond(text)
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+        instrumentation = get_instrumentation()
+        start = time.perf_counter()
+        try:
+            response = self.transport.call(lambda: self._attempt(text, kind, response))
+        except Exception:
+            instrumentation.record_call(
+                time.perf_counter() - start, retries=self.transport.last_retries, error=True, model=self.model
+            )
+            raise
+
+        prompt_tokens = estimate_tokens(text)
+        with self._lock:
+            cached_tokens = estimate_tokens(system) if system in self._seen_systems else 0
+            if system:
+                self._seen_systems.add(system)
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+        instrumentation.record_call(
+            time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=estimate_tokens(response),
+            cached_tokens=cached_tokens,
+            retries=self.transport.last_retries,
+            model=self.model,
+        )
+        return response
+
+    def _attempt(self, prompt: str, kind: str, response: str) -> str:
+        """One simulated API request: wait, then maybe fail or garble the response."""
+        with self._lock:
+            attempt = self._attempts.get(prompt, 0)
+            self._attempts[prompt] = attempt + 1
+        rng = random.Random(self._hash("attempt", prompt, attempt))
+
+        delay = self._sample_latency(rng)
+        if delay:
+            time.sleep(delay)
+
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise SimulatedLLMError(rng.choice((429, 503)))
+
+        if kind in ("model", "judge") and rng.random() < self.malformed_rate:
+            with self._lock:
+                self.malformed += 1
+            if rng.random() < 0.5:
+                return response[: rng.randrange(1, max(2, len(response)))]
+            return rng.choice(MALFORMED_RESPONSES)
+
+        return response
+
+    def _respond(self, prompt: str) -> tuple[str, str]:
+        """Return the kind of prompt and the well-formed response to it."""
+        if prompt.lstrip().startswith("You are an expert evaluator"):
+            items = re.findall(r"^Item (\d+)\nOriginal sentence: (.*)\nSanitized sentence: (.*)$", prompt, re.M)
+            if items:
+                verdicts = [{"id": int(idx), **self._judge(original, sanitized)} for idx, original, sanitized in items]
+                return "judge", json.dumps(verdicts, indent=2)
+            original = re.search(r"^Original sentence: (.*)$", prompt, re.M)
+            sanitized = re.search(r"^Sanitized sentence: (.*)$", prompt, re.M)
+            if original and sanitized:
+                return "judge", json.dumps(self._judge(original.group(1), sanitized.group(1)), indent=2)
+
+        if prompt.startswith("I provided an assistant with the following instructions"):
+            return "mutate", self._mutate(prompt)
+
+        if prompt.startswith("I have two different prompt instructions"):
+            return "merge", self._merge(prompt)
+
+        if prompt.startswith("I have a prompt instruction that performs well"):
+            return "compress", self._compress(prompt)
+
+        batch = re.search(r"\n\nYou will be given (?:\d+ )?numbered input sentences\.", prompt)
+        if batch:
+            instructions = prompt[: batch.start()]
+            inputs = re.findall(r"^Input sentence (\d+): (.*)$", prompt, re.M)
+            outputs = [{"id": int(idx), "text": self._sanitize(instructions, sentence)} for idx, sentence in inputs]
+            return "model", json.dumps(outputs, indent=2)
+
+        if "\n\nInput sentence: " in prompt:
+            instructions, sentence = prompt.rsplit("\n\nInput sentence: ", 1)
+            return "model", json.dumps({"text": self._sanitize(instructions, sentence)}, indent=2)
+
+        return "other", "OK"
+
+    def _sanitize(self, instructions: str, sentence: str) -> str:
+        lowered = instructions.lower()
+        instructions_hash = self._hash(instructions)
+        sanitized = sentence
+        for name, text in find_pii(sentence):
+            category = next(c for c in PII_CATEGORIES if c["name"] == name)
+            aware = any(keyword in lowered for keyword in category["keywords"])
+            recall = self.aware_recall if aware else self.unaware_recall
+            if self._chance("sanitize", instructions_hash, sentence, text) < recall:
+                sanitized = sanitized.replace(text, "[REDACTED]", 1)
+        return sanitized
+
+    def _judge(self, original: str, sanitized: str) -> dict:
+        pii = find_pii(original)
+        removed = [text for _, text in pii if text not in sanitized]
+        missed = [(name, text) for name, text in pii if text in sanitized]
+        if not pii:
+            return {"score": 1.0, "removed_pii": [], "missed_pii": [], "feedback": "The sentence contains no PII."}
+
+        score = round(len(removed) / len(pii), 1)
+        if missed:
+            feedback = " ".join(f"The {name} '{text}' was not removed." for name, text in missed)
+        else:
+            feedback = "All PII was removed."
+        return {
+            "score": score,
+            "removed_pii": removed,
+            "missed_pii": [text for _, text in missed],
+            "feedback": feedback,
+        }
+
+    def _mutate(self, prompt: str) -> str:
+        match = re.search(r"for me:\n```\n(.*?)\n```\n\nThe following are examples", prompt, re.S)
+        instruction = _strip_fences(match.group(1)) if match else ""
+        lines = instruction.splitlines()
+
+        missed = [c for c in PII_CATEGORIES if f"The {c['name']} '" in prompt and c["rule"] not in instruction]
+        if missed:
+            # Like a real model, only act on part of the feedback
+            rng = random.Random(self._hash("mutate", prompt))
+            rng.shuffle(missed)
+            lines.extend(f"- {category['rule']}" for category in missed[: rng.randint(1, 2)])
+        else:
+            lines.append(f"- Keep every word that is not PII unchanged (revision {self._hash(prompt) % 1000}).")
+
+        return "```\n" + "\n".join(lines).strip() + "\n```"
+
+    def _merge(self, prompt: str) -> str:
+        match = re.search(r"Prompt 1:\n```\n(.*?)\n```\n\nPrompt 2:\n```\n(.*?)\n```\n\nYour task", prompt, re.S)
+        if not match:
+            return "```\n\n```"
+
+        merged = []
+        for line in _strip_fences(match.group(1)).splitlines() + _strip_fences(match.group(2)).splitlines():
+            if not line.strip() or line not in merged:
+                merged.append(line)
+        return "```\n" + "\n".join(merged).strip() + "\n```"
+
+    def _compress(self, prompt: str) -> str:
+        match = re.search(r"from text:\n```\n(.*?)\n```\n\nYour task", prompt, re.S)
+        if not match:
+            return "```\n\n```"
+
+        # Keep the opening line and the lines mentioning a PII category, dropping the rest
+        lines = [line for line in _strip_fences(match.group(1)).splitlines() if line.strip()]
+        keywords = [keyword for category in PII_CATEGORIES for keyword in category["keywords"]]
+        kept = lines[:1] + [line for line in lines[1:] if any(keyword in line.lower() for keyword in keywords)]
+        return "```\n" + "\n".join(kept) + "\n```"
+
+    def stats(self) -> dict:
+        """Return call counts by prompt kind, injected failures and prompt cache usage."""
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "errors": self.errors,
+                "malformed": self.malformed,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "prompt_cache_hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+import numpy as np
+from src.instrumentation import current_tags
+
+# One index entry per stored trace; the trace itself stays on disk
+INDEX_DTYPE = np.dtype([
+    ("prompt", "<u8"),
+    ("sentence", "<u8"),
+    ("score", "<f4"),
+    ("segment", "<u4"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+])
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class TraceStore:
+    """
+    Append-only on-disk store of evaluation traces, for reflection over past runs.
+
+    Traces are zlib-compressed JSON records appended to segment files, which are
+    rotated once they reach segment_bytes. A fixed-size index entry per trace
+    (prompt hash, sentence hash, score and record location, 36 bytes) is kept in
+    memory and appended to an index file, so reopening a store does not read any
+    trace. Traces are only read and decoded when they are requested.
+
+    Like the ScoreStore, lookups made during a wave of parallel optimizer
+    rollouts only see traces of the same rollout, of earlier waves and of
+    earlier runs, so concurrent rollouts cannot change what a mutation sees.
+    """
+
+    INDEX_FILE = "index.bin"
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            directory: Directory holding the segments and the index (created if missing)
+            segment_bytes: Size from which a new segment file is started
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index = np.zeros(1024, dtype=INDEX_DTYPE)
+        # Rollout that stored each trace of this run, -1 for traces of earlier runs
+        self._rollouts = np.full(1024, -1, dtype=np.int64)
+        self._size = 0
+        self._load_index()
+
+        self._segment = int(self._index["segment"][:self._size].max()) if self._size else 0
+        self._segment_file = open(self._segment_path(self._segment), "ab")
+        self._index_file = open(os.path.join(directory, self.INDEX_FILE), "ab")
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"traces-{segment:05d}.seg")
+
+    def _load_index(self):
+        """Read the index file, dropping a torn last entry and entries a crash left without a complete record."""
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return
+
+        with open(path, "rb") as f:
+            data = f.read()
+        torn = len(data) % INDEX_DTYPE.itemsize != 0
+        entries = np.frombuffer(data[:len(data) - len(data) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+
+        segment_sizes = {}
+        for segment in np.unique(entries["segment"]):
+            segment_path = self._segment_path(int(segment))
+            segment_sizes[int(segment)] = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+        limits = np.array([segment_sizes[int(segment)] for segment in entries["segment"]], dtype=np.uint64)
+        complete = entries["offset"] + entries["length"] <= limits
+        entries = entries[complete]
+
+        self._ensure_capacity(len(entries))
+        self._index[:len(entries)] = entries
+        self._size = len(entries)
+
+        if torn or not complete.all():
+            # Rewrite the index without the dangling entries, so that new entries
+            # are appended at a whole-entry offset
+            with open(path, "wb") as f:
+                f.write(entries.tobytes())
+
+    def _ensure_capacity(self, size: int):
+        """Double the index capacity until it holds size entries. Must hold the lock."""
+        capacity = len(self._index)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        index = np.zeros(capacity, dtype=INDEX_DTYPE)
+        index[:self._size] = self._index[:self._size]
+        self._index = index
+        rollouts = np.full(capacity, -1, dtype=np.int64)
+        rollouts[:self._size] = self._rollouts[:self._size]
+        self._rollouts = rollouts
+
+    def append(self, prompt: str, sentence: str, trace: dict):
+        """
+        Store the trace of a prompt on a sentence.
+
+        Args:
+            prompt: The evaluated prompt
+            sentence: Input sentence
+            trace: Trace as built by the Evaluator
+        """
+        record = zlib.compress(json.dumps(trace, ensure_ascii=False).encode("utf-8"))
+        rollout = current_tags().get("rollout", -1)
+        with self._lock:
+            if self._segment_file.tell() >= self.segment_bytes:
+                self._segment_file.close()
+                self._segment += 1
+                self._segment_file = open(self._segment_path(self._segment), "ab")
+
+            offset = self._segment_file.tell()
+            self._segment_file.write(record)
+            # The record must reach the segment before the index entry pointing at it
+            self._segment_file.flush()
+
+            entry = np.array(
+                [(_hash64(prompt), _hash64(sentence), trace["score"], self._segment, offset, len(record))],
+                dtype=INDEX_DTYPE,
+            )
+            self._index_file.write(entry.tobytes())
+            self._index_file.flush()
+
+            self._ensure_capacity(self._size + 1)
+            self._index[self._size] = entry[0]
+            self._rollouts[self._size] = rollout
+            self._size += 1
+
+    def _read(self, entries):
+        """Read and decode the traces of index entries, opening each segment once per call."""
+        files = {}
+        try:
+            for entry in entries:
+                segment = int(entry["segment"])
+                if segment not in files:
+                    files[segment] = open(self._segment_path(segment), "rb")
+                f = files[segment]
+                f.seek(int(entry["offset"]))
+                yield json.loads(zlib.decompress(f.read(int(entry["length"]))))
+        finally:
+            for f in files.values():
+                f.close()
+
+    def _entries(self, prompt: str):
+        """Index entries of a prompt visible to the caller, with the rollout that stored each one."""
+        tags = current_tags()
+        rollout, wave = tags.get("rollout", -1), tags.get("wave")
+        with self._lock:
+            index = self._index[:self._size]
+            rollouts = self._rollouts[:self._size]
+            selected = index["prompt"] == _hash64(prompt)
+            if wave is not None:
+                selected &= (rollouts < wave) | (rollouts == rollout)
+            return index[selected].copy(), rollouts[selected].copy()
+
+    def traces(self, prompt: str):
+        """
+        Iterate over the stored traces of a prompt, oldest first.
+
+        Traces are read from disk one at a time as the iterator advances.
+        """
+        entries, _ = self._entries(prompt)
+        return self._read(entries)
+
+    def worst_traces(self, prompt: str, limit: int, exclude=()):
+        """
+        Iterate over the lowest-scoring stored traces of a prompt, one per sentence.
+
+        Args:
+            prompt: The evaluated prompt
+            limit: Maximum number of traces
+            exclude: Sentences to leave out, e.g. those already shown to the mutator
+
+        Returns:
+            Iterator of traces in increasing score order, read from disk lazily
+        """
+        entries, rollouts = self._entries(prompt)
+        excluded = {_hash64(sentence) for sentence in exclude}
+        if excluded:
+            kept = ~np.isin(entries["sentence"], np.array(list(excluded), dtype=np.uint64))
+            entries, rollouts = entries[kept], rollouts[kept]
+
+        # Keep the first trace stored for each sentence, by the earliest rollout when
+        # concurrent rollouts stored one in an order that depends on timing
+        order = np.argsort(rollouts, kind="stable")
+        _, first = np.unique(entries["sentence"][order], return_index=True)
+        entries, rollouts = entries[order[first]], rollouts[order[first]]
+        # Ties are broken by rollout and sentence rather than by storage position,
+        # which depends on the timing of concurrent evaluations
+        worst = entries[np.lexsort((entries["sentence"], rollouts, entries["score"]))[:limit]]
+        return self._read(worst)
+
+    def __len__(self):
+        return self._size
+
+    def stats(self) -> dict:
+        """Return the number of traces and segments and the bytes on disk."""
+        with self._lock:
+            segments = self._segment + 1
+            segment_bytes = sum(
+                os.path.getsize(self._segment_path(segment))
+                for segment in range(segments)
+                if os.path.exists(self._segment_path(segment))
+            )
+            return {
+                "traces": self._size,
+                "segments": segments,
+                "bytes": segment_bytes + self._size * INDEX_DTYPE.itemsize,
+            }
+
+    def close(self):
+        """Close the open segment and index files."""
+        with self._lock:
+            self._segment_file.close()
+            self._index_file.close()
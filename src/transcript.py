@@ -0,0 +1,242 @@
+"""
+Record/replay of LLM transcripts.
+
+RecordingLLMClient logs every request/response pair, with the stage, rollout
+and candidate tags of the call, to a JSONL transcript (gzip-compressed when the
+path ends in .gz). ReplayLLMClient serves the recorded responses back, so a run
+can be re-executed offline, at local speed and without an API key.
+"""
+import collections
+import gzip
+import hashlib
+import json
+import threading
+import time
+from src.instrumentation import current_tags, get_instrumentation
+from src.transport import estimate_tokens
+
+TRANSCRIPT_VERSION = 1
+
+# Instrumentation tags stored with each call
+RECORDED_TAGS = ("stage", "rollout", "candidate")
+
+
+def request_key(prompt: str, system: str = None) -> str:
+    """Content address of a request: its system message and prompt text."""
+    payload = json.dumps([system, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_transcript(path: str):
+    """
+    Iterate over the calls of a transcript, in recording order.
+
+    Yields:
+        Call dicts with seq, key, system, prompt, response, tags, latency and model
+    """
+    systems = {}
+    with _open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line of an interrupted recording
+                break
+            if record["type"] == "system":
+                systems[record["id"]] = record["text"]
+            elif record["type"] == "call":
+                system_id = record.pop("system")
+                yield {**record, "system": systems[system_id] if system_id is not None else None}
+
+
+class RecordingLLMClient:
+    """
+    LLM client wrapper writing every request and response to a transcript file.
+
+    System messages are written once and referenced by id, since most calls
+    share a few of them. Each record is flushed as soon as the call returns.
+    """
+
+    def __init__(self, llm_client, path: str):
+        """
+        Args:
+            llm_client: LLM client with a generate(prompt: str, system: str = None) -> str method
+            path: Transcript file, gzip-compressed if it ends in .gz. An existing
+                transcript is appended to
+        """
+        self.llm_client = llm_client
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._file = _open(path, "a")
+        self._systems = set()
+        self._seq = 0
+        self._write({"type": "header", "version": TRANSCRIPT_VERSION, "model": self.model,
+                     "temperature": self.temperature})
+
+    @property
+    def model(self):
+        return getattr(self.llm_client, "model", None)
+
+    @property
+    def temperature(self):
+        return getattr(self.llm_client, "temperature", None)
+
+    def _write(self, record: dict):
+        """Must hold the lock (or be called before the client is shared)."""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def generate(self, prompt: str, system: str = None) -> str:
+        """
+        Generate a response with the wrapped client and record it.
+
+        Args:
+            prompt: Input prompt string
+            system: Optional system message, passed on to the wrapped client
+
+        Returns:
+            Generated text response
+        """
+        start = time.perf_counter()
+        response = self.llm_client.generate(prompt, system=system)
+        latency = time.perf_counter() - start
+        tags = {name: value for name, value in current_tags().items() if name in RECORDED_TAGS}
+
+        system_id = hashlib.sha256(system.encode("utf-8")).hexdigest()[:16] if system is not None else None
+        with self._lock:
+            if system_id is not None and system_id not in self._systems:
+                self._systems.add(system_id)
+                self._write({"type": "system", "id": system_id, "text": system})
+            self._write({
+                "type": "call",
+                "seq": self._seq,
+                "key": request_key(prompt, system),
+                "system": system_id,
+                "prompt": prompt,
+                "response": response,
+                "tags": tags,
+                "latency": round(latency, 4),
+                "model": self.model,
+            })
+            self._seq += 1
+        return response
+
+    def stats(self) -> dict:
+        """Return the wrapped client's stats and the number of recorded calls."""
+        stats = self.llm_client.stats() if hasattr(self.llm_client, "stats") else {}
+        with self._lock:
+            return {**stats, "recorded_calls": self._seq}
+
+    def close(self):
+        """Close the transcript file."""
+        with self._lock:
+            self._file.close()
+
+
+class TranscriptMissError(Exception):
+    """Raised when a replayed run sends a request that is not in the transcript."""
+
+
+class ReplayLLMClient:
+    """
+    LLM client serving responses from a recorded transcript, without network access.
+
+    In "key" mode a request gets the recorded response of the same request;
+    identical requests recorded several times get their responses in recording
+    order, and the last one afterwards. This replays runs whose calls are
+    interleaved differently, e.g. with parallel rollouts. In "order" mode
+    responses are served in recording order whatever the request, which
+    replays sequential runs even when prompts changed slightly.
+    """
+
+    def __init__(self, path: str, mode: str = "key", fallback=None, latency: bool = False):
+        """
+        Args:
+            path: Transcript written by RecordingLLMClient
+            mode: "key" or "order"
+            fallback: Optional LLM client for requests missing from the transcript
+                (key mode). TranscriptMissError is raised when None
+            latency: Sleep for each call's recorded latency instead of answering at once
+        """
+        if mode not in ("key", "order"):
+            raise ValueError("mode must be 'key' or 'order'")
+
+        self.path = path
+        self.mode = mode
+        self.fallback = fallback
+        self.latency = latency
+
+        calls = list(read_transcript(path))
+        self.model = calls[0]["model"] if calls else None
+        self.temperature = 0.0
+
+        self._lock = threading.Lock()
+        self._ordered = collections.deque(calls)
+        self._by_key = {}
+        for call in calls:
+            self._by_key.setdefault(call["key"], collections.deque()).append(call)
+
+        self.served = 0
+        self.misses = 0
+
+    def _next_call(self, key: str):
+        """Must hold the lock."""
+        if self.mode == "order":
+            if not self._ordered:
+                return None
+            return self._ordered.popleft()
+
+        recorded = self._by_key.get(key)
+        if not recorded:
+            return None
+        return recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+    def generate(self, prompt: str, system: str = None) -> str:
+        """
+        Return the recorded response to a request.
+
+        Args:
+            prompt: Input prompt string
+            system: Optional system message
+
+        Returns:
+            Recorded text response
+        """
+        key = request_key(prompt, system)
+        with self._lock:
+            call = self._next_call(key)
+            if call is None:
+                self.misses += 1
+            else:
+                self.served += 1
+
+        if call is None:
+            if self.fallback is None:
+                raise TranscriptMissError(f"Request {key[:12]} is not in transcript {self.path}")
+            return self.fallback.generate(prompt, system=system)
+
+        if self.latency:
+            time.sleep(call["latency"])
+
+        text = f"{system}\n\n{prompt}" if system else prompt
+        get_instrumentation().record_call(
+            call["latency"] if self.latency else 0.0,
+            prompt_tokens=estimate_tokens(text),
+            completion_tokens=estimate_tokens(call["response"]),
+            model=self.model,
+        )
+        return call["response"]
+
+    def stats(self) -> dict:
+        """Return the number of served and missing requests."""
+        with self._lock:
+            return {"served": self.served, "misses": self.misses}
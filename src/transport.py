@@ -0,0 +1,269 @@
+import random
+import threading
+import time
+import openai
+
+# Status codes worth retrying besides 429
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        """
+        Args:
+            per_minute: Refill rate, in tokens per minute
+            capacity: Maximum burst size (default: one minute worth of tokens)
+        """
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Block until amount tokens are available, then take them."""
+        # Requests larger than the bucket would never fit; let them drain it instead
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount: float):
+        """Take (or give back, if negative) tokens without waiting. The bucket may go into debt."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit with additive increase and multiplicative decrease.
+
+    The limit grows by about one slot per window of successful calls and is cut
+    by decrease_factor when the provider reports a rate limit.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        """
+        Args:
+            initial: Starting number of calls allowed in flight
+            minimum: Lower bound of the limit
+            maximum: Upper bound of the limit
+            decrease_factor: Factor applied to the limit on a rate-limit error
+            cooldown: Minimum seconds between two decreases, so one burst of
+                429 responses only counts once
+        """
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("AIMDLimiter requires 1 <= minimum <= initial <= maximum")
+
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a slot is free, then take it."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, rate_limited: bool = False):
+        """Free a slot and adapt the limit to the call's outcome."""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+class Transport:
+    """
+    Sends LLM requests with rate limiting, adaptive concurrency and retries.
+
+    Requests first wait for the request and token buckets, then for a slot from
+    the AIMD limiter. Rate-limit and transient errors are retried with
+    exponential backoff and full jitter (or the server's Retry-After delay).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        limiter: AIMDLimiter = None,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        """
+        Args:
+            requests_per_minute: Request quota, None for unlimited
+            tokens_per_minute: Token quota, None for unlimited
+            limiter: Concurrency limiter (default: AIMDLimiter())
+            max_retries: Retries per request before giving up
+            base_delay: Backoff delay before the first retry, in seconds
+            max_delay: Upper bound of the backoff delay, in seconds
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.limiter = limiter if limiter is not None else AIMDLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    @staticmethod
+    def _status_code(error: BaseException):
+        return getattr(error, "status_code", None)
+
+    def _is_rate_limit(self, error: BaseException) -> bool:
+        return isinstance(error, openai.RateLimitError) or self._status_code(error) == 429
+
+    def _is_transient(self, error: BaseException) -> bool:
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, ConnectionError, TimeoutError)):
+            return True
+        return self._status_code(error) in TRANSIENT_STATUS_CODES
+
+    def _retry_after(self, error: BaseException):
+        """Delay requested by the server through a Retry-After header, if any."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        try:
+            return float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @property
+    def last_retries(self) -> int:
+        """Number of retries of the last call made on the current thread."""
+        return getattr(self._local, "retries", 0)
+
+    def call(self, request, estimated_tokens: int = 0, count_tokens=None):
+        """
+        Send a request under the transport's limits, retrying on failure.
+
+        Args:
+            request: Zero-argument callable performing the API call
+            estimated_tokens: Tokens reserved from the token bucket before sending
+            count_tokens: Optional callable mapping the response to the tokens it
+                actually used; the difference with the estimate is settled afterwards
+
+        Returns:
+            The request's return value
+        """
+        self._local.retries = 0
+        for attempt in range(self.max_retries + 1):
+            if self.request_bucket is not None:
+                self.request_bucket.acquire(1)
+            if self.token_bucket is not None and estimated_tokens:
+                self.token_bucket.acquire(estimated_tokens)
+
+            self.limiter.acquire()
+            rate_limited = False
+            try:
+                with self._lock:
+                    self.requests += 1
+                response = request()
+            except Exception as e:
+                rate_limited = self._is_rate_limit(e)
+                if not (rate_limited or self._is_transient(e)) or attempt == self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e)
+            else:
+                if self.token_bucket is not None and count_tokens is not None:
+                    used = count_tokens(response)
+                    if used is not None:
+                        self.token_bucket.adjust(used - estimated_tokens)
+                return response
+            finally:
+                self.limiter.release(rate_limited=rate_limited)
+
+            with self._lock:
+                self.retries += 1
+                self.rate_limited += int(rate_limited)
+            self._local.retries += 1
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        """Return request, retry and rate-limit counters."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "concurrency_limit": int(self.limiter.limit),
+            }
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_key: str, base_url: str = None, timeout: float = 60.0) -> openai.OpenAI:
+    """
+    Return a process-wide OpenAI client for the given credentials and endpoint.
+
+    The client is thread-safe and keeps a pool of keep-alive connections, so
+    every component reuses the same connections. Its built-in retries are
+    disabled because Transport handles them.
+    """
+    key = (api_key, base_url, timeout)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = openai.OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+            _shared_clients[key] = client
+        return client
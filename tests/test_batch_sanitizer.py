@@ -0,0 +1,64 @@
+import json
+import os
+import pytest
+from src.batch_sanitizer import BatchSanitizer, read_records
+
+
+class _UpperModel:
+    def run_batch(self, prompt, sentences):
+        return [sentence.upper() for sentence in sentences]
+
+
+def _write_input(path, texts):
+    with open(path, "w") as f:
+        for text in texts:
+            f.write(json.dumps({"text": text}) + "\n")
+
+
+def _run(input_path, output_path, progress_path, resume=False):
+    sanitizer = BatchSanitizer(_UpperModel(), "prompt", batch_size=2, concurrency=2, progress_every=1)
+    return sanitizer.run(
+        read_records(str(input_path)), str(output_path), progress_path=str(progress_path),
+        resume=resume, input_path=str(input_path),
+    )
+
+
+def test_resume_skips_the_records_already_written(tmp_path, monkeypatch):
+    monkeypatch.setenv("TQDM_DISABLE", "1")
+    input_path, output_path, progress_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl", tmp_path / "progress.json"
+    _write_input(input_path, [f"record {idx}" for idx in range(6)])
+
+    _run(input_path, output_path, progress_path)
+    stats = _run(input_path, output_path, progress_path, resume=True)
+
+    assert stats["records_skipped"] == 6
+    assert stats["records_written"] == 0
+    with open(output_path) as f:
+        assert [json.loads(line)["sanitized"] for line in f] == [f"RECORD {idx}" for idx in range(6)]
+
+
+def test_resume_with_a_changed_input_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setenv("TQDM_DISABLE", "1")
+    input_path, output_path, progress_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl", tmp_path / "progress.json"
+    _write_input(input_path, [f"record {idx}" for idx in range(6)])
+    _run(input_path, output_path, progress_path)
+
+    # Another file with the same size and modification time
+    other_path = tmp_path / "other.jsonl"
+    _write_input(other_path, [f"record {idx}" for idx in range(6)])
+    stat = os.stat(input_path)
+    os.utime(other_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    with pytest.raises(ValueError, match="another input file"):
+        _run(other_path, output_path, progress_path, resume=True)
+
+    # The same file, modified
+    _write_input(input_path, [f"changed {idx}" for idx in range(6)])
+    os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    with pytest.raises(ValueError, match="another input file"):
+        _run(input_path, output_path, progress_path, resume=True)
+
+
+def test_resume_needs_an_input_file(tmp_path):
+    sanitizer = BatchSanitizer(_UpperModel(), "prompt")
+    with pytest.raises(ValueError, match="input file"):
+        sanitizer.run([], str(tmp_path / "out.jsonl"), progress_path=str(tmp_path / "progress.json"), resume=True)
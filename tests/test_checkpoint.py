@@ -0,0 +1,60 @@
+import collections
+from src.dataset import load_dataset
+from src.evaluator import Evaluator
+from src.gepa_optimizer import GepaOptimizer
+from src.merger import Merger
+from src.model import Model
+from src.mutator import Mutator
+from src.prompts import original_prompt
+from src.score_store import ScoreStore
+from src.simulated_llm import SimulatedLLMClient
+
+
+class _RequestLog:
+    """Records every request sent to the wrapped client."""
+
+    def __init__(self, llm_client):
+        self.llm_client = llm_client
+        self.requests = collections.Counter()
+
+    def generate(self, prompt, system=None):
+        self.requests[(system, prompt)] += 1
+        return self.llm_client.generate(prompt, system=system)
+
+
+def _optimize(llm_client, checkpoint_path, rollouts_budget, resume=False):
+    """Optimize in a fresh process-like setup: a new evaluator with an empty score store."""
+    evaluator = Evaluator(
+        Model(llm_client),
+        llm_client,
+        max_concurrency=1,
+        score_store=ScoreStore(),
+        judge_batch_size=5,
+        model_batch_size=5,
+    )
+    optimizer = GepaOptimizer(max_merges=3, minibatch_size=5, checkpoint_path=checkpoint_path)
+    return optimizer.optimize(
+        original_prompt,
+        load_dataset("data/PII_train.json"),
+        load_dataset("data/PII_dev.json")[:10],
+        evaluator,
+        Mutator(llm_client),
+        Merger(llm_client),
+        rollouts_budget=rollouts_budget,
+        resume=resume,
+    )
+
+
+def test_resumed_run_sends_the_requests_of_an_uninterrupted_one(tmp_path, monkeypatch):
+    monkeypatch.setenv("TQDM_DISABLE", "1")
+
+    uninterrupted = _RequestLog(SimulatedLLMClient(seed=0))
+    expected = _optimize(uninterrupted, str(tmp_path / "full.json"), rollouts_budget=8)
+
+    interrupted = _RequestLog(SimulatedLLMClient(seed=0))
+    checkpoint_path = str(tmp_path / "resumed.json")
+    _optimize(interrupted, checkpoint_path, rollouts_budget=4)
+    resumed = _optimize(interrupted, checkpoint_path, rollouts_budget=8, resume=True)
+
+    assert resumed == expected
+    assert interrupted.requests == uninterrupted.requests
@@ -0,0 +1,51 @@
+import json
+import os
+from src.dataset import JsonlDataset, load_line_index
+
+
+def _write_jsonl(path, texts):
+    with open(path, "w") as f:
+        for text in texts:
+            f.write(json.dumps({"text": text}) + "\n")
+
+
+def test_indexes_go_to_the_index_dir(tmp_path):
+    data_path = tmp_path / "data" / "train.jsonl"
+    data_path.parent.mkdir()
+    _write_jsonl(data_path, ["first", "second", "third"])
+    index_dir = tmp_path / "indexes"
+
+    dataset = JsonlDataset(str(data_path), index_dir=str(index_dir))
+
+    assert list(dataset) == ["first", "second", "third"]
+    assert dataset[1] == "second"
+    assert os.listdir(data_path.parent) == ["train.jsonl"]
+    assert len(os.listdir(index_dir)) == 1
+
+    # Reopening uses the stored index
+    assert JsonlDataset(str(data_path), index_dir=str(index_dir))[2] == "third"
+
+
+def test_index_is_kept_in_memory_when_it_cannot_be_written(tmp_path):
+    data_path = tmp_path / "train.jsonl"
+    _write_jsonl(data_path, ["first", "second"])
+    # A directory that cannot be created, as on a read-only mount
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+
+    dataset = JsonlDataset(str(data_path), index_dir=str(blocker / "indexes"))
+
+    assert [dataset[0], dataset[1]] == ["first", "second"]
+    assert sorted(os.listdir(tmp_path)) == ["not-a-directory", "train.jsonl"]
+
+
+def test_unreadable_index_is_rebuilt(tmp_path):
+    data_path = tmp_path / "train.jsonl"
+    _write_jsonl(data_path, ["first", "second"])
+    with open(str(data_path) + ".idx.npy", "wb") as f:
+        f.write(b"truncated")
+
+    index = load_line_index(str(data_path))
+
+    assert len(index) == 2
+    assert JsonlDataset(str(data_path))[1] == "second"
@@ -0,0 +1,125 @@
+import functools
+import os
+import threading
+import time
+import pytest
+from src.distributed import DistributedBackend, make_evaluator
+
+SENTENCES = [
+    "My name is Christian McDonald and my phone is 555-901-2348",
+    "Andrea Cruz's email address is andrea.cruz@domain.com",
+    "Roger Marshall was born on 05/05/1977",
+    "Call Martha Gibson at 555-890-1237",
+]
+PROMPT = "Remove every name, phone number, email address and date."
+
+
+class _FaultyEvaluator:
+    """Simulated evaluator whose first job (across processes) crashes or stalls its worker."""
+
+    def __init__(self, marker, fault):
+        self.marker = marker
+        self.fault = fault
+        self.evaluator = make_evaluator(simulate=True, max_concurrency=2)
+
+    def iter_traces(self, prompt, sentences):
+        try:
+            os.close(os.open(self.marker, os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            return self.evaluator.iter_traces(prompt, sentences)
+        if self.fault == "exit":
+            # Dies right after taking the job, before reporting anything
+            os._exit(1)
+        time.sleep(3)
+        return self.evaluator.iter_traces(prompt, sentences)
+
+
+def _faulty_evaluator(marker, fault):
+    return _FaultyEvaluator(marker, fault)
+
+
+def _evaluate(backend):
+    items = list(enumerate(SENTENCES))
+    return dict(backend.evaluate(PROMPT, items))
+
+
+def test_job_of_killed_worker_is_resubmitted(tmp_path):
+    factory = functools.partial(_faulty_evaluator, str(tmp_path / "crashed"), "exit")
+    backend = DistributedBackend(factory, processes=1, chunk_size=2, job_timeout=60.0)
+    try:
+        traces = _evaluate(backend)
+        stats = backend.stats()
+    finally:
+        backend.close()
+
+    assert sorted(traces) == list(range(len(SENTENCES)))
+    assert stats["restarts"] == 1
+    assert stats["resubmitted_jobs"] == 1
+    assert stats["jobs_in_flight"] == 0
+
+
+def test_job_of_stalled_worker_times_out_from_when_it_was_taken(tmp_path):
+    factory = functools.partial(_faulty_evaluator, str(tmp_path / "stalled"), "stall")
+    backend = DistributedBackend(factory, processes=2, chunk_size=2, job_timeout=1.0)
+    try:
+        traces = _evaluate(backend)
+        stats = backend.stats()
+    finally:
+        backend.close()
+
+    assert sorted(traces) == list(range(len(SENTENCES)))
+    assert stats["resubmitted_jobs"] >= 1
+    assert stats["restarts"] == 0
+
+
+class _SlowEvaluator:
+    """Simulated evaluator logging every job it runs and taking delay seconds per job."""
+
+    def __init__(self, log, delay):
+        self.log = log
+        self.delay = delay
+        self.evaluator = make_evaluator(simulate=True, max_concurrency=2)
+
+    def iter_traces(self, prompt, sentences):
+        with open(self.log, "a") as f:
+            f.write(f"{prompt}\n")
+        time.sleep(self.delay)
+        return self.evaluator.iter_traces(prompt, sentences)
+
+
+def _slow_evaluator(log, delay):
+    return _SlowEvaluator(log, delay)
+
+
+def test_cancelled_jobs_are_skipped_by_workers(tmp_path):
+    log = tmp_path / "jobs.log"
+    backend = DistributedBackend(functools.partial(_slow_evaluator, str(log), 0.3), processes=1, chunk_size=1)
+    try:
+        results = backend.evaluate("cancelled prompt", list(enumerate(SENTENCES)))
+        next(results)
+        results.close()
+        traces = _evaluate(backend)
+        stats = backend.stats()
+    finally:
+        backend.close()
+
+    jobs = log.read_text().splitlines()
+    assert sorted(traces) == list(range(len(SENTENCES)))
+    assert stats["jobs_in_flight"] == 0
+    # The first job and at most the one running when the evaluation was closed
+    assert jobs.count("cancelled prompt") <= 2
+    assert jobs.count(PROMPT) == len(SENTENCES)
+
+
+def test_evaluation_fails_instead_of_hanging_when_the_broker_dies():
+    # No workers: the jobs stay queued until the broker goes away
+    backend = DistributedBackend(processes=0, chunk_size=2)
+    try:
+        results = backend.evaluate(PROMPT, list(enumerate(SENTENCES)))
+        threading.Timer(0.5, backend._broker._process.terminate).start()
+        start = time.monotonic()
+        with pytest.raises(RuntimeError, match="evaluation broker"):
+            next(results)
+        assert time.monotonic() - start < 10
+    finally:
+        backend.close()
@@ -0,0 +1,100 @@
+import random
+import threading
+import time
+from src.eval_pipeline import EvaluationPipeline
+from src.instrumentation import tags
+from src.score_store import ScoreStore
+
+
+def _run(prejudge=None, seed=0):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    judged = []
+
+    def sanitize(chunk):
+        # Chunks complete in a different order on every run
+        with lock:
+            delay = rng.uniform(0, 0.02)
+        time.sleep(delay)
+        return [sentence.upper() for sentence in chunk]
+
+    def judge(pairs):
+        with lock:
+            judged.append([original for original, _ in pairs])
+        return [{"score": 1.0} for _ in pairs]
+
+    pipeline = EvaluationPipeline(
+        sanitize,
+        judge,
+        sanitize_concurrency=4,
+        judge_concurrency=2,
+        sanitize_batch_size=2,
+        judge_batch_size=3,
+        prejudge=prejudge,
+    )
+    items = [(idx, f"s{idx}") for idx in range(10)]
+    results = {idx: result for idx, _, result in pipeline.run(items)}
+    return results, sorted(judged)
+
+
+def test_judge_batches_follow_input_order_whatever_the_completion_order():
+    for seed in range(5):
+        results, judged = _run(seed=seed)
+        assert sorted(results) == list(range(10))
+        assert judged == [["s0", "s1", "s2"], ["s3", "s4", "s5"], ["s6", "s7", "s8"], ["s9"]]
+
+
+def test_settled_pairs_are_left_out_of_judge_batches():
+    settled = {"s1", "s4"}
+    prejudge = lambda original, sanitized: {"score": 0.0} if original in settled else None
+    for seed in range(5):
+        results, judged = _run(prejudge=prejudge, seed=seed)
+        assert results[1] == {"score": 0.0}
+        assert judged == [["s0", "s2", "s3"], ["s5", "s6", "s7"], ["s8", "s9"]]
+
+
+def test_failed_calls_are_raised_after_the_other_results():
+    def sanitize(chunk):
+        if "s0" in chunk:
+            # The failing call completes before the others
+            raise RuntimeError("sanitize failed")
+        time.sleep(0.02)
+        return chunk
+
+    pipeline = EvaluationPipeline(
+        sanitize,
+        lambda pairs: [{"score": 1.0} for _ in pairs],
+        sanitize_concurrency=3,
+        sanitize_batch_size=2,
+        judge_batch_size=2,
+    )
+    items = [(idx, f"s{idx}") for idx in range(6)]
+
+    yielded = []
+    try:
+        for idx, _, _ in pipeline.run(items):
+            yielded.append(idx)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("the failure was not raised")
+    assert sorted(yielded) == [2, 3, 4, 5]
+
+    # A consumer that stops early on the other results never sees the failure
+    results = pipeline.run(items)
+    assert next(results)[0] in {2, 3, 4, 5}
+    results.close()
+
+
+def test_score_store_hides_traces_of_concurrent_rollouts():
+    store = ScoreStore()
+    with tags(rollout=1, wave=1):
+        store.put("prompt", "sentence", {"score": 0.5})
+    with tags(rollout=2, wave=1):
+        assert store.get("prompt", "sentence") is None
+        store.put("prompt", "sentence", {"score": 0.7})
+        assert store.get("prompt", "sentence")["score"] == 0.7
+    with tags(rollout=4, wave=4):
+        # The earliest rollout's trace wins
+        assert store.get("prompt", "sentence")["score"] == 0.5
+    assert store.get("prompt", "sentence")["score"] == 0.5
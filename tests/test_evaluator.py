@@ -0,0 +1,33 @@
+from src.evaluator import Evaluator
+from src.model import Model
+from src.prompts import original_prompt
+from src.score_store import ScoreStore
+from src.simulated_llm import SimulatedLLMClient
+
+SENTENCES = ["Call John Smith at 555-123-4567", "My email is jane.doe@mail.com"]
+
+
+def _evaluator(**options):
+    llm_client = SimulatedLLMClient(seed=0)
+    return Evaluator(Model(llm_client), llm_client, score_store=ScoreStore(), **options)
+
+
+def test_output_tokens_are_only_tracked_on_request(monkeypatch):
+    monkeypatch.setenv("TQDM_DISABLE", "1")
+    evaluator = _evaluator()
+    evaluator.evaluate_per_sentence(original_prompt, SENTENCES)
+    assert evaluator.output_tokens(original_prompt) is None
+    assert evaluator._output_tokens == {}
+
+
+def test_output_tokens_average_every_trace_including_reused_ones(monkeypatch):
+    monkeypatch.setenv("TQDM_DISABLE", "1")
+    evaluator = _evaluator(track_output_tokens=True)
+    first = evaluator.evaluate_with_traces(original_prompt, SENTENCES)
+    mean = evaluator.output_tokens(original_prompt)
+    assert mean == sum(max(1, len(trace["sanitized_output"]) // 4) for trace in first["traces"]) / 2
+
+    # Served from the score store, with the same outputs
+    evaluator.evaluate_per_sentence(original_prompt, SENTENCES)
+    assert evaluator.output_tokens(original_prompt) == mean
+    assert evaluator.output_tokens("another prompt") is None
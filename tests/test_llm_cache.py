@@ -0,0 +1,93 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src import llm_cache
+from src.llm_cache import CachedLLMClient
+
+
+class _CountingClient:
+    """Echoes prompts and counts calls, optionally blocking until released."""
+
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, system=None):
+        with self._lock:
+            self.calls.append(prompt)
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        return f"response to {prompt}"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    # Distinct access times, so the eviction order doesn't depend on the clock resolution
+    clock = itertools.count(1000)
+    monkeypatch.setattr(llm_cache.time, "time", lambda: next(clock))
+    client = _CountingClient()
+    cache = CachedLLMClient(client, path=str(tmp_path / "cache.sqlite"), max_entries=10)
+    try:
+        for idx in range(10):
+            cache.generate(f"p{idx}")
+        # p0 becomes the most recently used entry
+        cache.generate("p0")
+
+        # Growing past max_entries evicts down to 90% of capacity: 11 - 9 = 2 entries
+        cache.generate("p10")
+        assert cache.stats()["evictions"] == 2
+        assert cache.stats()["entries"] == 9
+
+        client.calls.clear()
+        for prompt in ("p0", "p3", "p10"):
+            cache.generate(prompt)
+        assert client.calls == []
+
+        # p1 and p2 were the least recently used
+        cache.generate("p1")
+        cache.generate("p2")
+        assert client.calls == ["p1", "p2"]
+    finally:
+        cache.close()
+
+
+def test_concurrent_identical_requests_share_one_call(tmp_path):
+    gate = threading.Event()
+    client = _CountingClient(gate)
+    cache = CachedLLMClient(client, path=str(tmp_path / "cache.sqlite"))
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(cache.generate, "same prompt", "system") for _ in range(8)]
+            # Give the other threads time to find the request in flight before it returns
+            while not client.calls:
+                time.sleep(0.001)
+            time.sleep(0.1)
+            gate.set()
+            responses = [future.result() for future in futures]
+
+        assert client.calls == ["same prompt"]
+        assert responses == ["response to same prompt"] * 8
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits"] == 7
+    finally:
+        cache.close()
+
+
+def test_entries_of_previous_runs_are_only_reused_when_deterministic(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = CachedLLMClient(_CountingClient(), path=path)
+    first.generate("prompt")
+    first.close()
+
+    client = _CountingClient()
+    sampling = CachedLLMClient(client, path=path)
+    sampling.generate("prompt")
+    sampling.close()
+    assert client.calls == ["prompt"]
+
+    client = _CountingClient()
+    deterministic = CachedLLMClient(client, path=path, deterministic=True)
+    deterministic.generate("prompt")
+    deterministic.close()
+    assert client.calls == []
@@ -0,0 +1,21 @@
+from src.mutator import Mutator
+from src.prompts import original_prompt
+from src.simulated_llm import SimulatedLLMClient
+
+
+def test_mutated_prompts_are_taken_out_of_their_code_block():
+    trace = {
+        "input": "Call John Smith at 555-123-4567",
+        "sanitized_output": "Call John Smith at [REDACTED]",
+        "score": 0.5,
+        "removed_pii": ["555-123-4567"],
+        "missed_pii": ["John Smith"],
+        "feedback": "The person name 'John Smith' was not removed.",
+    }
+    mutator = Mutator(SimulatedLLMClient(seed=0))
+
+    children = mutator.mutate_many(original_prompt, {"scores": [0.5], "traces": [trace]}, count=2)
+
+    for child in children:
+        assert "```" not in child
+        assert child.startswith(original_prompt.strip().splitlines()[0])
@@ -0,0 +1,84 @@
+import random
+import numpy as np
+from src.pareto_helper import ParetoHelper
+
+
+def _helper(candidates, **options):
+    """Helper over two sentences with (subscores, costs) candidates, the first being the base prompt."""
+    (base_scores, base_costs), *rest = candidates
+    helper = ParetoHelper("p0", ["s0", "s1"], base_scores, base_costs=base_costs, **options)
+    for idx, (subscores, costs) in enumerate(rest, start=1):
+        helper.update_with_new_prompt(f"p{idx}", subscores, costs=costs)
+    return helper
+
+
+def test_best_index_does_not_treat_unknown_weighted_costs_as_free():
+    helper = _helper(
+        [
+            ([0.8, 0.8], {"latency": 0.5}),
+            ([0.9, 0.9], {"latency": None}),
+        ],
+        cost_weights={"latency": 0.1},
+    )
+    assert helper.best_index() == 0
+
+
+def test_best_index_falls_back_to_unknown_costs_when_none_is_known():
+    helper = _helper(
+        [
+            ([0.8, 0.8], {"latency": None}),
+            ([0.9, 0.9], {"latency": None}),
+        ],
+        cost_weights={"latency": 0.1},
+    )
+    assert helper.best_index() == 1
+
+
+def test_best_index_prefers_known_costs_within_the_limits():
+    helper = _helper(
+        [
+            ([0.7, 0.7], {"prompt_tokens": 100, "output_tokens": 12.0}),
+            ([0.9, 0.9], {"prompt_tokens": 300, "output_tokens": 10.0}),
+            ([0.8, 0.8], {"prompt_tokens": 150, "output_tokens": None}),
+        ],
+        cost_limits={"prompt_tokens": 200},
+        cost_weights={"output_tokens": 0.001},
+    )
+    # The over-limit candidate is excluded, then the one with an unknown cost
+    assert helper.best_index() == 0
+
+
+def _brute_force_fronts(scores):
+    """Front membership recomputed from scratch: the prompts with the best score on each sentence."""
+    best = scores.max(axis=0)
+    return scores == best
+
+
+def test_incremental_fronts_match_a_brute_force_rebuild():
+    rng = random.Random(0)
+    num_sentences = 12
+    # Coarse scores, so that ties are common
+    draw = lambda: [rng.choice([0.0, 0.25, 0.5, 0.75, 1.0]) for _ in range(num_sentences)]
+    sentences = [f"s{idx}" for idx in range(num_sentences)]
+    helper = ParetoHelper("p0", sentences, draw())
+
+    # Past the initial capacity, so the matrices are grown along the way
+    for idx in range(1, 3 * ParetoHelper.INITIAL_CAPACITY):
+        helper.update_with_new_prompt(f"p{idx}", draw())
+
+        on_front = _brute_force_fronts(helper.scores)
+        assert np.array_equal(helper.front_scores, helper.scores.max(axis=0))
+        assert np.array_equal(helper.front_counts(), on_front.sum(axis=1))
+        assert np.array_equal(helper._front_sizes, on_front.sum(axis=0))
+        assert helper.prompt_at_pareto_front_sentences == [
+            set(np.flatnonzero(on_front[:, sentence_idx]).tolist()) for sentence_idx in range(num_sentences)
+        ]
+
+        # Non-dominated candidates are on a front, and together still cover every front
+        candidates = helper.non_dominated_candidates()
+        assert all(on_front[candidates].any(axis=1))
+        assert on_front[candidates].any(axis=0).all()
+
+    rebuilt = ParetoHelper.from_state_dict(helper.state_dict(), sentences)
+    assert np.array_equal(rebuilt.front_counts(), helper.front_counts())
+    assert np.array_equal(rebuilt.non_dominated_candidates(), helper.non_dominated_candidates())
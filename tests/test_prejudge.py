@@ -0,0 +1,59 @@
+import pytest
+from src.prejudge import PreJudge
+
+
+@pytest.fixture
+def prejudge():
+    return PreJudge(audit_rate=0.0)
+
+
+@pytest.mark.parametrize("original, sanitized", [
+    # Leaked names with every structured span removed
+    ("My name is Christian McDonald and my phone is 555-901-2348",
+     "My name is Christian McDonald and my phone is [PHONE]"),
+    ("Sarah called from 555-123-4567", "Sarah called from [PHONE]"),
+    ("Dr. Smith saw me on 01/02/2020", "Dr. Smith saw me on [DATE]"),
+    # Clean outputs
+    ("Sarah called from 555-123-4567", "[NAME] called from [PHONE]"),
+])
+def test_passes_are_never_settled(prejudge, original, sanitized):
+    assert prejudge.check(original, sanitized) is None
+
+
+@pytest.mark.parametrize("original, sanitized", [
+    ("My name is Christian McDonald and my phone is 555-901-2348",
+     "My name is Christian McDonald and my phone is 555-901-2348"),
+    ("Dr. Smith saw me on 01/02/2020", "Dr. Smith saw me on 01/02/2020"),
+    ("I saw Dr. Jane O'Brien on 01/02/2020", "I saw Dr. Jane O'Brien on 01/02/2020"),
+])
+def test_failures_with_a_surviving_name_are_escalated(prejudge, original, sanitized):
+    assert prejudge.check(original, sanitized) is None
+
+
+def test_certain_failure_is_scored_by_fraction_removed(prejudge):
+    verdict = prejudge.check(
+        "My name is Christian McDonald and my phone is 555-901-2348",
+        "My name is [NAME] and my phone is 555-901-2348",
+    )
+    assert verdict["score"] == 0.5
+    assert verdict["removed_pii"] == ["Christian McDonald"]
+    assert verdict["missed_pii"] == ["555-901-2348"]
+
+
+def test_surviving_name_at_sentence_start_is_escalated(prejudge):
+    assert prejudge.check("Sarah called from 555-123-4567", "Sarah called from 555-123-4567") is None
+    assert prejudge.check("Call me. Sarah speaking, 555-123-4567", "Call me. Sarah speaking, 555-123-4567") is None
+
+
+def test_common_sentence_openers_do_not_escalate(prejudge):
+    verdict = prejudge.check("My phone is 555-123-4567", "My phone is 555-123-4567")
+    assert verdict["score"] == 0.0
+    assert verdict["removed_pii"] == []
+
+
+def test_settle_counts_escalations(prejudge):
+    assert prejudge.settle("Sarah called from 555-123-4567", "[NAME] called from [PHONE]") is None
+    assert prejudge.settle("Please call 555-123-4567", "Please call 555-123-4567")["score"] == 0.0
+    stats = prejudge.stats()
+    assert stats["escalated"] == 1
+    assert stats["settled_fail"] == 1
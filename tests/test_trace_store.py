@@ -0,0 +1,33 @@
+import os
+from src.trace_store import TraceStore
+
+
+def _trace(sentence):
+    return {"input": sentence, "sanitized_output": sentence, "score": 0.5,
+            "removed_pii": [], "missed_pii": [], "feedback": ""}
+
+
+def _inputs(directory):
+    store = TraceStore(directory)
+    try:
+        return [trace["input"] for trace in store.traces("prompt")]
+    finally:
+        store.close()
+
+
+def test_traces_appended_after_a_torn_index_entry_survive_a_reopen(tmp_path):
+    directory = str(tmp_path / "traces")
+    store = TraceStore(directory)
+    for idx in range(3):
+        store.append("prompt", f"s{idx}", _trace(f"s{idx}"))
+    store.close()
+
+    # A crash in the middle of writing the last index entry
+    index_path = os.path.join(directory, TraceStore.INDEX_FILE)
+    os.truncate(index_path, os.path.getsize(index_path) - 10)
+
+    store = TraceStore(directory)
+    store.append("prompt", "s3", _trace("s3"))
+    store.close()
+
+    assert _inputs(directory) == ["s0", "s1", "s3"]
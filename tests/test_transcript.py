@@ -0,0 +1,64 @@
+import pytest
+from src.dataset import load_dataset
+from src.evaluator import Evaluator
+from src.gepa_optimizer import GepaOptimizer
+from src.merger import Merger
+from src.model import Model
+from src.mutator import Mutator
+from src.prejudge import PreJudge
+from src.prompts import original_prompt
+from src.score_store import ScoreStore
+from src.simulated_llm import SimulatedLLMClient
+from src.trace_store import TraceStore
+from src.transcript import RecordingLLMClient, ReplayLLMClient
+
+
+def _optimize(llm_client, trace_dir):
+    train_sentences = load_dataset("data/PII_train.json")
+    val_sentences = load_dataset("data/PII_dev.json")[:10]
+    trace_store = TraceStore(trace_dir)
+    evaluator = Evaluator(
+        Model(llm_client),
+        llm_client,
+        max_concurrency=8,
+        score_store=ScoreStore(),
+        judge_batch_size=5,
+        model_batch_size=5,
+        trace_store=trace_store,
+        prejudge=PreJudge(audit_rate=0.2),
+    )
+    optimizer = GepaOptimizer(max_merges=3, minibatch_size=5, parallel_rollouts=3, validation_chunk_size=3)
+    try:
+        return optimizer.optimize(
+            original_prompt,
+            train_sentences,
+            val_sentences,
+            evaluator,
+            Mutator(llm_client, trace_store=trace_store, history_examples=3),
+            Merger(llm_client),
+            rollouts_budget=9,
+        )
+    finally:
+        trace_store.close()
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_parallel_run_replays_from_its_transcript(tmp_path, monkeypatch, seed):
+    monkeypatch.setenv("TQDM_DISABLE", "1")
+    transcript = str(tmp_path / "run.jsonl.gz")
+
+    # Random latencies make calls complete in a different order than in the replay
+    simulated = SimulatedLLMClient(seed=seed, latency=0.002, latency_distribution="exponential")
+    recorder = RecordingLLMClient(simulated, transcript)
+    try:
+        recorded_prompt = _optimize(recorder, str(tmp_path / "recorded_traces"))
+    finally:
+        recorder.close()
+
+    replay = ReplayLLMClient(transcript)
+    replayed_prompt = _optimize(replay, str(tmp_path / "replayed_traces"))
+
+    # Calls cut short by early stopping may differ between the runs, but their
+    # results are dropped, so the replay still follows the recorded run
+    assert replayed_prompt == recorded_prompt
+    assert replay.stats()["served"] > 0
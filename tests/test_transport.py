@@ -0,0 +1,124 @@
+import time
+import pytest
+from benchmarks import fake_openai_server
+from src import transport
+from src.llm_client import LLMClient
+from src.transport import AIMDLimiter, TokenBucket, Transport
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(transport.time, "monotonic", clock)
+    return clock
+
+
+def test_token_bucket_refills_at_rate_up_to_capacity(clock):
+    bucket = TokenBucket(per_minute=60, capacity=10)
+    bucket.acquire(10)
+    assert bucket.tokens == 0
+
+    clock.now += 5
+    bucket.adjust(0)
+    assert bucket.tokens == pytest.approx(5)
+
+    clock.now += 100
+    bucket.adjust(0)
+    assert bucket.tokens == 10
+
+
+def test_token_bucket_adjust_can_go_into_debt(clock):
+    bucket = TokenBucket(per_minute=60, capacity=10)
+    bucket.adjust(15)
+    assert bucket.tokens == -5
+
+    clock.now += 6
+    bucket.adjust(0)
+    assert bucket.tokens == pytest.approx(1)
+
+
+def test_aimd_increases_additively_on_success(clock):
+    limiter = AIMDLimiter(initial=4, maximum=6)
+    limiter.acquire()
+    limiter.release()
+    assert limiter.limit == pytest.approx(4.25)
+
+    # About one slot per window of limit successful calls
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+    assert 5.0 < limiter.limit < 5.3
+
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 6
+
+
+def test_aimd_decreases_multiplicatively_once_per_cooldown(clock):
+    limiter = AIMDLimiter(initial=8, minimum=2, decrease_factor=0.5, cooldown=1.0)
+    limiter.acquire()
+    limiter.release(rate_limited=True)
+    assert limiter.limit == 4
+
+    # A burst of 429 responses within the cooldown only counts once
+    limiter.acquire()
+    limiter.release(rate_limited=True)
+    assert limiter.limit == 4
+
+    clock.now += 1.5
+    limiter.acquire()
+    limiter.release(rate_limited=True)
+    assert limiter.limit == 2
+
+    clock.now += 1.5
+    limiter.acquire()
+    limiter.release(rate_limited=True)
+    assert limiter.limit == 2
+
+
+class _ScriptedRandom:
+    """Stands in for the fake server's random module: rejects the first request only."""
+
+    def __init__(self):
+        self.draws = [0.0]
+
+    def random(self):
+        return self.draws.pop(0) if self.draws else 1.0
+
+    def uniform(self, a, b):
+        return 0.0
+
+
+def test_transport_retries_429_after_retry_after_delay(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    monkeypatch.setattr(fake_openai_server, "random", _ScriptedRandom())
+    server = fake_openai_server.start_server(latency=0.0, jitter=0.0, rate_limit_prob=0.5, retry_after=0.3)
+    try:
+        # A backoff delay this large would make the test slow if Retry-After were ignored
+        client_transport = Transport(base_delay=20.0, max_delay=30.0)
+        client = LLMClient(model="fake", transport=client_transport, base_url=server.base_url)
+
+        start = time.monotonic()
+        response = client.generate("Hello", system="Be brief")
+        elapsed = time.monotonic() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response == '{"text": "[REDACTED]"}'
+    assert server.rejected == 1
+    assert server.completed == 1
+    assert 0.3 <= elapsed < 5.0
+    stats = client_transport.stats()
+    assert stats["retries"] == 1
+    assert stats["rate_limited"] == 1
+    assert stats["failures"] == 0